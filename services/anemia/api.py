@@ -1,35 +1,75 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, Request
+from fastapi.responses import JSONResponse, Response
 import numpy as np
 import cv2
 from pathlib import Path
 import sys
+import asyncio
+import base64
 import logging
 
 # Add src to path so we can import the pipeline and its dependencies
 sys.path.append(str(Path(__file__).parent / "src"))
-from pipeline import get_pipeline
+from admission import AdmissionController, AdmissionRejected
+from executor import InferenceExecutor, InferenceTimeout
+from fingerprint import UploadFingerprint, fingerprint_bytes
+from config import UPLOAD_CHUNK_BYTES
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="NetraAI Anemia Service")
+admission = AdmissionController()
+executor = InferenceExecutor()
+
+
+def _decode_image(contents: bytes):
+    nparr = np.frombuffer(contents, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def _client_id(request: Request, payload: dict = None) -> str:
+    """Identify the caller for per-client rate limiting: API key > patient id > IP."""
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        return f"key:{api_key}"
+    if payload and payload.get("patient_id"):
+        return f"patient:{payload['patient_id']}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+async def _run_admitted(client_id: str, method: str, *args, **kwargs):
+    """
+    Admit the caller, then run `pipeline.<method>` on the executor. The slot
+    is released when the pool job finishes, not when the request gives up,
+    so timed-out jobs still count against the concurrency limit.
+    """
+    ticket = await admission.acquire_async(client_id)
+    return await executor.run(method, *args, release=lambda: admission.release(ticket), **kwargs)
+
 
 @app.post("/predict")
-async def predict(file: UploadFile = File(None), payload: dict = None):
+async def predict(request: Request, file: UploadFile = File(None), payload: dict = None):
     """
     Handle both File upload and JSON URL requests.
     """
+    client_id = _client_id(request, payload)
     try:
         img = None
+        fingerprint = None
         filename = "unknown.jpg"
 
         if file:
             logger.info(f"Received file upload prediction: {file.filename}")
-            contents = await file.read()
-            nparr = np.frombuffer(contents, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Hash the upload while reading it instead of the decoded pixels later
+            fp = UploadFingerprint()
+            chunks = []
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                fp.update(chunk)
+                chunks.append(chunk)
+            fingerprint = fp.hexdigest()
+            img = await asyncio.to_thread(_decode_image, b"".join(chunks))
             filename = file.filename
         elif payload and "image_url" in payload:
             image_url = payload["image_url"]
@@ -38,8 +78,8 @@ async def predict(file: UploadFile = File(None), payload: dict = None):
             async with httpx.AsyncClient() as client:
                 resp = await client.get(image_url)
                 if resp.status_code == 200:
-                    nparr = np.frombuffer(resp.content, np.uint8)
-                    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                    fingerprint = fingerprint_bytes(resp.content)
+                    img = await asyncio.to_thread(_decode_image, resp.content)
                     filename = Path(image_url).name
         
         if img is None:
@@ -48,13 +88,15 @@ async def predict(file: UploadFile = File(None), payload: dict = None):
                 content={"success": False, "error": "Invalid image or missing input"}
             )
         
-        pipeline = get_pipeline()
-        result = pipeline.predict(
+        result = await _run_admitted(
+            client_id,
+            "predict",
             img, 
             save_heatmap=False, 
             save_original=False, 
             save_cropped=False,
-            image_source=filename
+            image_source=filename,
+            fingerprint=fingerprint
         )
         
         if not result.get('success', False):
@@ -66,6 +108,7 @@ async def predict(file: UploadFile = File(None), payload: dict = None):
         # Standardize response format for the backend
         return {
             "success": True,
+            "prediction_id": result.get('prediction_id'),
             "prediction": result.get('diagnosis', 'INCONCLUSIVE').lower(),
             "is_anemic": result.get('is_anemic'),
             "probability": result.get('probability'),
@@ -75,6 +118,21 @@ async def predict(file: UploadFile = File(None), payload: dict = None):
             "recommendation": "Please consult a doctor for a definitive diagnosis." if result.get('is_anemic') else "Your results appear normal, but maintain a healthy diet."
         }
     
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected {client_id}: {e.reason}")
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "error": e.reason},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    except InferenceTimeout as e:
+        logger.error(f"Prediction timed out for {filename}: {e}")
+        return JSONResponse(
+            status_code=504,
+            content={"success": False, "error": str(e)}
+        )
+
     except Exception as e:
         logger.error(f"Error in prediction: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -82,9 +140,104 @@ async def predict(file: UploadFile = File(None), payload: dict = None):
             content={"success": False, "error": str(e)}
         )
 
+@app.get("/explain/{prediction_id}")
+async def explain(request: Request, prediction_id: str):
+    """
+    GradCAM overlay for an earlier prediction. Generated on the first request
+    and served from the artifact store after that.
+    """
+    client_id = _client_id(request)
+    try:
+        result = await _run_admitted(client_id, "explain", prediction_id)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "error": e.reason},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except InferenceTimeout as e:
+        return JSONResponse(status_code=504, content={"success": False, "error": str(e)})
+
+    if not result['success']:
+        return JSONResponse(status_code=404, content=result)
+    return Response(
+        content=result['image'],
+        media_type=result['media_type'],
+        headers={"X-Heatmap-Generated": "true" if result['generated'] else "false"}
+    )
+
+@app.get("/explain/{prediction_id}/review")
+async def review(request: Request, prediction_id: str):
+    """
+    Grad-CAM and Grad-CAM++ overlays of several conv layers (base64 images)
+    for clinician review, with the time each variant took.
+    """
+    client_id = _client_id(request)
+    try:
+        result = await _run_admitted(client_id, "review", prediction_id)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "error": e.reason},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except InferenceTimeout as e:
+        return JSONResponse(status_code=504, content={"success": False, "error": str(e)})
+
+    if not result['success']:
+        return JSONResponse(status_code=404, content=result)
+    result['overlays'] = {
+        layer: {variant: base64.b64encode(image).decode() for variant, image in variants.items()}
+        for layer, variants in result['overlays'].items()
+    }
+    return result
+
+PIPELINE_METRICS = ("batching", "gradcam_batching", "cache", "detectors", "artifacts", "audit")
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Runtime counters used to tune the service (batch occupancy, etc.).
+    Pipeline sections are null while the model is still loading.
+    """
+    try:
+        pipeline = await executor.pipeline_stats() or {}
+    except InferenceTimeout as e:
+        logger.warning(f"Metrics: {e}")
+        pipeline = {}
+    return {
+        "admission": admission.stats(),
+        "executor": executor.stats(),
+        **{section: pipeline.get(section) for section in PIPELINE_METRICS}
+    }
+
+@app.get("/health/live")
+async def liveness():
+    """Process is up and the event loop is responsive (model may still be loading)."""
+    return {"status": "alive", "service": "anemia-service"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Model loaded and warmed up — safe to route traffic here."""
+    if not executor.ready():
+        return JSONResponse(
+            status_code=503,
+            content={"status": "warming_up", "service": "anemia-service"}
+        )
+    return {"status": "healthy", "service": "anemia-service"}
+
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "service": "anemia-service"}
+    return await readiness()
+
+@app.on_event("startup")
+def load_pipeline():
+    # Load + warm up in the background so /health/live answers immediately
+    executor.start()
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    executor.shutdown(wait=True)
 
 if __name__ == "__main__":
     import uvicorn
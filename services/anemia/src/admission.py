@@ -0,0 +1,262 @@
+"""
+admission.py - Request admission control for the anemia service
+Per-client token buckets + a global concurrency limit with a bounded,
+deadline-aware wait queue. Safe to use from threads and coroutines.
+Path: src/admission.py
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+from contextlib import asynccontextmanager, contextmanager
+
+from config import (
+    ADMISSION_RATE_PER_CLIENT, ADMISSION_BURST, ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_MAX_CLIENTS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; maps to HTTP 429."""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec, holds at most `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_take(self, now: float):
+        """Take one token. Returns (ok, seconds until a token is available)."""
+        # `now` may predate a bucket created while handling this very request
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class AdmissionController:
+    """
+    Admits a request when its client has a token AND a worker slot is free.
+
+    Requests that find every slot busy wait in a bounded FIFO queue. A
+    request is shed (rejected without running) when the queue is full, when
+    its estimated wait already exceeds its deadline, or when its deadline
+    passes while queued.
+    """
+
+    def __init__(self, rate_per_client=ADMISSION_RATE_PER_CLIENT,
+                 burst=ADMISSION_BURST,
+                 max_concurrency=ADMISSION_MAX_CONCURRENCY,
+                 max_queue=ADMISSION_QUEUE_SIZE,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                 max_clients=ADMISSION_MAX_CLIENTS):
+        self.rate_per_client = rate_per_client
+        self.burst = burst
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()      # client_id -> TokenBucket (LRU)
+        self._waiters = deque()            # (deadline, Future)
+        self._active = 0
+        self._service_ewma = 0.5           # seconds a slot is typically held
+
+        self._admitted = 0
+        self._rejected_rate = 0
+        self._rejected_queue_full = 0
+        self._shed_deadline = 0
+
+        logger.info(
+            f"AdmissionController: {self.max_concurrency} slots, queue={self.max_queue}, "
+            f"{rate_per_client}/s per client (burst {burst})"
+        )
+
+    # =====================================================================
+    #  PUBLIC API
+    # =====================================================================
+
+    def acquire(self, client_id: str, timeout: float = None) -> float:
+        """Block until admitted. Returns a ticket to hand back to release()."""
+        fut, deadline = self._request(client_id, timeout)
+        try:
+            fut.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeout:
+            pass
+        return self._settle(fut)
+
+    async def acquire_async(self, client_id: str, timeout: float = None) -> float:
+        """Coroutine version of acquire(); never blocks the event loop."""
+        fut, deadline = self._request(client_id, timeout)
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(fut)),
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Caller went away: give the slot back if it was already granted
+            if not self._withdraw(fut) and fut.exception() is None:
+                self.release(fut.result())
+            raise
+        return self._settle(fut)
+
+    def release(self, ticket: float = None):
+        """Free a slot and hand it to the oldest waiter still within its deadline."""
+        with self._lock:
+            now = time.monotonic()
+            if ticket is not None:
+                self._service_ewma = 0.8 * self._service_ewma + 0.2 * (now - ticket)
+            while self._waiters:
+                deadline, fut = self._waiters.popleft()
+                if fut.done():
+                    continue
+                if deadline <= now:
+                    self._shed_deadline += 1
+                    fut.set_exception(AdmissionRejected(
+                        "Request deadline expired while queued", self._retry_after()
+                    ))
+                    continue
+                self._admitted += 1
+                fut.set_result(now)
+                return
+            self._active -= 1
+
+    @contextmanager
+    def admit(self, client_id: str, timeout: float = None):
+        ticket = self.acquire(client_id, timeout)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def admit_async(self, client_id: str, timeout: float = None):
+        ticket = await self.acquire_async(client_id, timeout)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'active': self._active,
+                'queue_depth': sum(1 for _, f in self._waiters if not f.done()),
+                'queue_capacity': self.max_queue,
+                'tracked_clients': len(self._buckets),
+                'admitted': self._admitted,
+                'rejected_rate_limited': self._rejected_rate,
+                'rejected_queue_full': self._rejected_queue_full,
+                'shed_deadline': self._shed_deadline,
+                'mean_service_seconds': round(self._service_ewma, 4),
+            }
+
+    # =====================================================================
+    #  INTERNALS
+    # =====================================================================
+
+    def _request(self, client_id, timeout):
+        """Rate-check and either grant a slot immediately or enqueue."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        fut = Future()
+        with self._lock:
+            now = time.monotonic()
+            deadline = now + timeout
+            must_wait = self._active >= self.max_concurrency or self._has_waiters()
+
+            if must_wait:
+                if len(self._waiters) >= self.max_queue:
+                    self._prune_expired(now)
+                if len(self._waiters) >= self.max_queue:
+                    self._rejected_queue_full += 1
+                    raise AdmissionRejected("Server busy: admission queue full", self._retry_after())
+                if self._estimated_wait() > timeout:
+                    self._shed_deadline += 1
+                    raise AdmissionRejected("Server busy: estimated wait exceeds deadline", self._retry_after())
+
+            self._take_token(client_id, now)
+
+            if must_wait:
+                self._waiters.append((deadline, fut))
+            else:
+                self._active += 1
+                self._admitted += 1
+                fut.set_result(now)
+        return fut, deadline
+
+    def _settle(self, fut):
+        """Resolve a wait: ticket if admitted, AdmissionRejected otherwise."""
+        if self._withdraw(fut):
+            with self._lock:
+                self._shed_deadline += 1
+            raise AdmissionRejected("Request deadline expired while queued", self._retry_after())
+        return fut.result()
+
+    def _withdraw(self, fut) -> bool:
+        """Remove a still-pending waiter. False if it was already resolved."""
+        with self._lock:
+            if fut.done():
+                return False
+            fut.cancel()
+            self._waiters = deque(w for w in self._waiters if w[1] is not fut)
+            return True
+
+    def _take_token(self, client_id, now):
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_per_client, self.burst)
+            self._buckets[client_id] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+
+        ok, wait = bucket.try_take(now)
+        if not ok:
+            self._rejected_rate += 1
+            raise AdmissionRejected("Rate limit exceeded for client", wait)
+
+    def _has_waiters(self):
+        return any(not f.done() for _, f in self._waiters)
+
+    def _prune_expired(self, now):
+        live = deque()
+        for deadline, fut in self._waiters:
+            if fut.done():
+                continue
+            if deadline <= now:
+                self._shed_deadline += 1
+                fut.set_exception(AdmissionRejected(
+                    "Request deadline expired while queued", self._retry_after()
+                ))
+                continue
+            live.append((deadline, fut))
+        self._waiters = live
+
+    def _estimated_wait(self):
+        queued = len(self._waiters) + 1
+        return self._service_ewma * queued / self.max_concurrency
+
+    def _retry_after(self):
+        return max(1.0, self._estimated_wait())
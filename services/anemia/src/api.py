@@ -14,6 +14,7 @@ import sys
 
 sys.path.append(str(Path(__file__).parent))
 from pipeline import get_pipeline
+from fingerprint import fingerprint_bytes
 
 app = FastAPI(title="NetraAI API")
 
@@ -32,7 +33,7 @@ async def predict_anemia(file: UploadFile = File(...)):
         pipeline = get_pipeline()
         
         # Predict
-        result = pipeline.predict(img, save_heatmap=False)
+        result = pipeline.predict(img, save_heatmap=False, fingerprint=fingerprint_bytes(contents))
         
         return {
             "success": True,
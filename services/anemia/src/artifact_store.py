@@ -0,0 +1,336 @@
+"""
+artifact_store.py - Content-addressed storage for saved images
+Images are stored once per content hash under sharded directories
+(<kind dir>/ab/cd/<sha256><ext>), so retried uploads do not create copies
+and no directory grows past a few hundred entries. A SQLite manifest maps
+scans / sessions to the hashes they used and drives retention.
+Path: src/artifact_store.py
+
+Usage:
+    python artifact_store.py stats
+    python artifact_store.py gc --max-age-days 90 --max-total-gb 20 [--dry-run]
+    python artifact_store.py lookup --scan <prediction_id> | --session <session_id>
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from config import (
+    ORIGINALS_DIR, CROPPED_DIR, HEATMAPS_DIR, TISSUE_DIR, ARTIFACT_MANIFEST,
+    ARTIFACT_RETENTION_DAYS, ARTIFACT_MAX_TOTAL_GB, ARTIFACT_GC_GRACE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+KIND_DIRS = {
+    'originals': ORIGINALS_DIR,
+    'cropped': CROPPED_DIR,
+    'heatmaps': HEATMAPS_DIR,
+    'tissue': TISSUE_DIR,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    PRIMARY KEY (hash, kind)
+);
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    scan_id TEXT,
+    session_id TEXT,
+    label TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_scan ON refs(scan_id);
+CREATE INDEX IF NOT EXISTS refs_session ON refs(session_id);
+CREATE INDEX IF NOT EXISTS refs_blob ON refs(hash, kind);
+CREATE INDEX IF NOT EXISTS refs_created ON refs(created_at);
+CREATE INDEX IF NOT EXISTS blobs_lru ON blobs(last_used_at);
+"""
+
+
+def content_hash(image) -> str:
+    """SHA-256 of the pixel buffer (crops / heatmaps; originals use the upload fingerprint)."""
+    return hashlib.sha256(image.tobytes()).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Deduplicating image store. Writes go through an ArtifactWriter so put()
+    never encodes on the caller's thread.
+    """
+
+    def __init__(self, writer=None, manifest_path=ARTIFACT_MANIFEST, kind_dirs=None):
+        self.writer = writer
+        self.kind_dirs = {k: Path(v) for k, v in (kind_dirs or KIND_DIRS).items()}
+        self.manifest_path = Path(manifest_path)
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.manifest_path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._stored = 0
+        self._deduplicated = 0
+
+    def blob_path(self, digest: str, kind: str, extension: str) -> Path:
+        return self.kind_dirs[kind] / digest[:2] / digest[2:4] / f"{digest}{extension}"
+
+    # =====================================================================
+    #  WRITE
+    # =====================================================================
+
+    def put(self, image, kind, extension, scan_id=None, session_id=None, label=None, digest=None):
+        """
+        Store `image` (BGR) unless identical content is already stored, and
+        record a reference for scan_id / session_id.
+
+        Args:
+            digest: content identity if the caller has one (content_hash(image)
+                    or, for originals, the upload fingerprint)
+            label: human-readable name (source file, eye, diagnosis) kept in the manifest
+
+        Returns:
+            Path of the stored image (None if the writer dropped it)
+        """
+        digest = digest or content_hash(image)
+        path = self.blob_path(digest, kind, extension)
+        relative = str(path.relative_to(self.kind_dirs[kind]))
+        now = time.time()
+
+        # The manifest row, not the file, decides who writes: checking
+        # path.exists() races with images still queued in the writer.
+        # Blob and ref are inserted together so gc never sees the blob unreferenced.
+        with self._lock, self._db:
+            new_blob = self._db.execute(
+                "INSERT OR IGNORE INTO blobs (hash, kind, path, size, created_at, last_used_at) "
+                "VALUES (?, ?, ?, NULL, ?, ?)", (digest, kind, relative, now, now)
+            ).rowcount == 1
+            if not new_blob:
+                (created_at,) = self._db.execute(
+                    "SELECT created_at FROM blobs WHERE hash = ? AND kind = ?", (digest, kind)
+                ).fetchone()
+                self._db.execute("UPDATE blobs SET last_used_at = ? WHERE hash = ? AND kind = ?",
+                                 (now, digest, kind))
+            ref_id = self._db.execute(
+                "INSERT INTO refs (hash, kind, scan_id, session_id, label, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, kind, scan_id, session_id, label, now)
+            ).lastrowid
+            # A row past the grace period without its file lost it (crash, manual delete): rewrite
+            lost = not new_blob and created_at < now - ARTIFACT_GC_GRACE_SECONDS and not path.exists()
+            if lost:
+                self._db.execute("UPDATE blobs SET created_at = ?, size = NULL WHERE hash = ? AND kind = ?",
+                                 (now, digest, kind))
+            elif not new_blob:
+                self._deduplicated += 1
+                return path
+
+        if path.exists():
+            # Left on disk by an earlier manifest
+            with self._lock:
+                self._deduplicated += 1
+            return path
+        if self.writer is None:
+            raise RuntimeError("ArtifactStore has no writer")
+        if self.writer.submit(image, path) is None:
+            with self._lock, self._db:
+                self._db.execute("DELETE FROM refs WHERE id = ?", (ref_id,))
+                if new_blob:
+                    self._db.execute("DELETE FROM blobs WHERE hash = ? AND kind = ?", (digest, kind))
+            return None
+        with self._lock:
+            self._stored += 1
+        return path
+
+    def link(self, source_scan_id, scan_id, session_id=None) -> int:
+        """
+        Reference every blob of an earlier scan from a new scan (a duplicate
+        upload served from the prediction cache). No file is copied.
+
+        Returns:
+            Number of references added
+        """
+        now = time.time()
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT hash, kind, label FROM refs WHERE scan_id = ? ORDER BY created_at", (source_scan_id,)
+            ).fetchall()
+            self._db.executemany(
+                "INSERT INTO refs (hash, kind, scan_id, session_id, label, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(digest, kind, scan_id, session_id, label, now) for digest, kind, label in rows]
+            )
+            self._db.executemany(
+                "UPDATE blobs SET last_used_at = ? WHERE hash = ? AND kind = ?",
+                [(now, digest, kind) for digest, kind, _ in rows]
+            )
+            self._deduplicated += len(rows)
+        return len(rows)
+
+    # =====================================================================
+    #  READ
+    # =====================================================================
+
+    def lookup(self, scan_id=None, session_id=None) -> list:
+        """References (with blob paths) for a scan and/or session."""
+        clauses, params = [], []
+        if scan_id is not None:
+            clauses.append("r.scan_id = ?")
+            params.append(scan_id)
+        if session_id is not None:
+            clauses.append("r.session_id = ?")
+            params.append(session_id)
+        if not clauses:
+            raise ValueError("lookup needs scan_id and/or session_id")
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT r.kind, r.hash, b.path, r.scan_id, r.session_id, r.label, r.created_at "
+                "FROM refs r JOIN blobs b ON b.hash = r.hash AND b.kind = r.kind "
+                f"WHERE {' AND '.join(clauses)} ORDER BY r.created_at", params
+            ).fetchall()
+        return [
+            {'kind': kind, 'hash': digest, 'path': str(self.kind_dirs[kind] / path),
+             'scan_id': scan, 'session_id': session, 'label': label, 'created_at': created}
+            for kind, digest, path, scan, session, label, created in rows
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            blobs, refs = self._db.execute(
+                "SELECT (SELECT COUNT(*) FROM blobs), (SELECT COUNT(*) FROM refs)"
+            ).fetchone()
+            return {
+                'blobs': blobs,
+                'refs': refs,
+                'stored': self._stored,
+                'deduplicated': self._deduplicated,
+            }
+
+    # =====================================================================
+    #  RETENTION
+    # =====================================================================
+
+    def gc(self, max_age_days=ARTIFACT_RETENTION_DAYS, max_total_gb=ARTIFACT_MAX_TOTAL_GB, dry_run=False,
+           grace_seconds=ARTIFACT_GC_GRACE_SECONDS) -> dict:
+        """
+        Enforce retention:
+            1. drop references older than max_age_days
+            2. delete blobs no reference points to (and rows whose file is gone)
+            3. while the store exceeds max_total_gb, delete least recently used blobs
+
+        Step 2 skips blobs used within grace_seconds: their file may still be
+        queued in a writer (this process's is flushed first; other processes'
+        are not visible here).
+        """
+        summary = {'expired_refs': 0, 'deleted_blobs': 0, 'freed_bytes': 0, 'total_bytes': 0, 'pending_blobs': 0}
+        if self.writer is not None and not dry_run:
+            self.writer.flush(timeout=30)
+        grace_cutoff = time.time() - grace_seconds
+        with self._lock:
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                summary['expired_refs'] = self._db.execute(
+                    "SELECT COUNT(*) FROM refs WHERE created_at < ?", (cutoff,)
+                ).fetchone()[0]
+                if not dry_run:
+                    with self._db:
+                        self._db.execute("DELETE FROM refs WHERE created_at < ?", (cutoff,))
+
+            # Sizes are recorded lazily (files are written asynchronously)
+            blobs = []
+            for digest, kind, path, size, used in self._db.execute(
+                "SELECT hash, kind, path, size, last_used_at FROM blobs ORDER BY last_used_at"
+            ).fetchall():
+                full = self.kind_dirs[kind] / path
+                exists = full.exists()
+                if size is None and exists:
+                    size = full.stat().st_size
+                    if not dry_run:
+                        self._db.execute("UPDATE blobs SET size = ? WHERE hash = ? AND kind = ?", (size, digest, kind))
+                blobs.append((digest, kind, full, size or 0, exists, used))
+            self._db.commit()
+
+            referenced = set(self._db.execute("SELECT DISTINCT hash, kind FROM refs").fetchall())
+            if dry_run and max_age_days is not None:
+                referenced = set(self._db.execute(
+                    "SELECT DISTINCT hash, kind FROM refs WHERE created_at >= ?", (cutoff,)
+                ).fetchall())
+
+            total = sum(size for _, _, _, size, _, _ in blobs)
+            quota = None if max_total_gb is None else max_total_gb * 1024 ** 3
+            doomed = []
+            for digest, kind, full, size, exists, used in blobs:   # least recently used first
+                if used >= grace_cutoff:
+                    # Too recent to judge: the file may not be written yet
+                    summary['pending_blobs'] += not exists
+                    orphan = False
+                else:
+                    orphan = (digest, kind) not in referenced or not exists
+                over_quota = quota is not None and total > quota
+                if orphan or over_quota:
+                    doomed.append((digest, kind, full))
+                    total -= size
+                    summary['freed_bytes'] += size
+            summary['deleted_blobs'] = len(doomed)
+            summary['total_bytes'] = total
+
+            if not dry_run:
+                for digest, kind, full in doomed:
+                    full.unlink(missing_ok=True)
+                with self._db:
+                    self._db.executemany("DELETE FROM blobs WHERE hash = ? AND kind = ?",
+                                         [(d, k) for d, k, _ in doomed])
+                    self._db.executemany("DELETE FROM refs WHERE hash = ? AND kind = ?",
+                                         [(d, k) for d, k, _ in doomed])
+        return summary
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NetraAI artifact store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gc_parser = sub.add_parser("gc", help="Enforce age and total-size retention")
+    gc_parser.add_argument("--max-age-days", type=float, default=ARTIFACT_RETENTION_DAYS)
+    gc_parser.add_argument("--max-total-gb", type=float, default=ARTIFACT_MAX_TOTAL_GB)
+    gc_parser.add_argument("--grace-seconds", type=float, default=ARTIFACT_GC_GRACE_SECONDS,
+                           help="Leave blobs used this recently alone")
+    gc_parser.add_argument("--dry-run", action="store_true")
+    sub.add_parser("stats", help="Blob / reference counts")
+    lookup_parser = sub.add_parser("lookup", help="Images of a scan or session")
+    lookup_parser.add_argument("--scan")
+    lookup_parser.add_argument("--session")
+    args = parser.parse_args()
+
+    store = ArtifactStore()
+    if args.command == "gc":
+        summary = store.gc(args.max_age_days, args.max_total_gb, dry_run=args.dry_run,
+                           grace_seconds=args.grace_seconds)
+        print(("DRY RUN " if args.dry_run else "") + json.dumps(summary, indent=2))
+    elif args.command == "stats":
+        print(json.dumps(store.stats(), indent=2))
+    else:
+        print(json.dumps(store.lookup(scan_id=args.scan, session_id=args.session), indent=2))
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+artifact_writer.py - Background writer for saved images (originals, crops, heatmaps)
+Encoding and writing happen on a worker thread behind a bounded queue, so
+requests only pay for choosing a filename. Files are written to a temporary
+name and renamed, so a path is either complete or absent.
+Path: src/artifact_writer.py
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+from config import (
+    ARTIFACT_QUEUE_SIZE, ARTIFACT_QUEUE_POLICY, ARTIFACT_BLOCK_TIMEOUT,
+    ARTIFACT_JPEG_QUALITY, ARTIFACT_PNG_COMPRESSION
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactWriter:
+    """
+    Bounded-queue image writer with a drop / block backpressure policy.
+
+    submit() returns the path the image will be written to. Images must not
+    be modified by the caller after they are submitted.
+
+    Policies when the queue is full:
+        'block' - wait up to block_timeout seconds for space, then drop
+        'drop'  - drop the image immediately (counted in stats()['dropped'])
+    """
+
+    def __init__(self, max_queue=ARTIFACT_QUEUE_SIZE, policy=ARTIFACT_QUEUE_POLICY,
+                 block_timeout=ARTIFACT_BLOCK_TIMEOUT, jpeg_quality=ARTIFACT_JPEG_QUALITY,
+                 png_compression=ARTIFACT_PNG_COMPRESSION, name="artifacts"):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown artifact queue policy: {policy}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.encode_params = {
+            '.jpg': [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)],
+            '.jpeg': [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)],
+            '.png': [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)],
+        }
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._bytes = 0
+        self._write_seconds = 0.0
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name=f"{name}-writer", daemon=True)
+        self._worker.start()
+        # Scripts that never call close() still get their images on disk
+        atexit.register(self.close)
+
+    # =====================================================================
+    #  PUBLIC API
+    # =====================================================================
+
+    def submit(self, image, path):
+        """
+        Queue `image` (BGR uint8) to be written to `path`; the extension
+        selects the encoder. Returns the path, or None if the image was dropped.
+        """
+        path = Path(path)
+        if self._closed:
+            raise RuntimeError("ArtifactWriter is closed")
+        try:
+            if self.policy == "block":
+                self._queue.put((image, path), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((image, path))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            logger.warning(f"Artifact queue full ({self._queue.maxsize}) — dropped {path.name}")
+            return None
+        return path
+
+    def flush(self, timeout=None) -> bool:
+        """Wait until every queued image is on disk. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout=None):
+        """Flush pending images and stop the writer thread (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush(timeout)
+        self._queue.put((None, None))
+        self._worker.join(timeout)
+        atexit.unregister(self.close)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue': self._queue.maxsize,
+                'policy': self.policy,
+                'written': self._written,
+                'dropped': self._dropped,
+                'failed': self._failed,
+                'bytes_written': self._bytes,
+                'mean_write_ms': self._write_seconds * 1000 / self._written if self._written else 0.0,
+            }
+
+    # =====================================================================
+    #  WORKER
+    # =====================================================================
+
+    def _run(self):
+        while True:
+            image, path = self._queue.get()
+            try:
+                if image is None:
+                    return
+                self._write(image, path)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, image, path):
+        start = time.perf_counter()
+        try:
+            ok, buf = cv2.imencode(path.suffix, image, self.encode_params.get(path.suffix.lower(), []))
+            if not ok:
+                raise ValueError(f"could not encode {path.suffix}")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(buf.tobytes())
+            os.replace(tmp, path)
+        except Exception as e:
+            with self._lock:
+                self._failed += 1
+            logger.error(f"Failed to write artifact {path}: {e}")
+            return
+        with self._lock:
+            self._written += 1
+            self._bytes += len(buf)
+            self._write_seconds += time.perf_counter() - start
+        logger.debug(f"Saved: {path}")
@@ -0,0 +1,321 @@
+"""
+audit_analytics.py - Columnar copy of the audit log and pilot / drift metrics
+Each run converts only the audit rows added since the previous run into
+Parquet (outputs/analytics/rows/), folds them into per-day aggregates, and
+reports:
+    - probability-distribution drift of the recent window vs. a baseline
+    - low-confidence rate and ANEMIC rate (and their change)
+    - extraction-method mix
+    - sensitivity / specificity against lab-confirmed Hb, once PILOT_QUORUM
+      confirmed cases (ANEMIA_QUORUM of them anemic) are available
+Drift beyond DRIFT_ALERT_THRESHOLD is logged, appended to alerts.jsonl and
+reflected in the exit code, so the job can run from cron.
+Path: src/audit_analytics.py
+
+Usage:
+    python audit_analytics.py                 # incremental update + report
+    python audit_analytics.py --env PRODUCTION
+    python audit_analytics.py --rebuild       # reconvert everything
+
+Writes the Parquet files with pyarrow (in requirements.txt).
+"""
+
+import argparse
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+from audit_logger import AUDIT_FILE, AUDIT_COLUMNS
+from audit_segments import segment_files
+from config import (
+    ANALYTICS_DIR, ANALYTICS_WINDOW_DAYS, ANALYTICS_BASELINE_DAYS, ANALYTICS_HIST_BINS,
+    ANALYTICS_MIN_ROWS, PILOT_QUORUM, ANEMIA_QUORUM, DRIFT_ALERT_THRESHOLD
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "state.json"
+ROWS_DIR = "rows"
+ALERTS_FILE = "alerts.jsonl"
+REPORT_FILE = "report.json"
+
+
+# =====================================================================
+#  INCREMENTAL CONVERSION
+# =====================================================================
+
+def file_id(path):
+    """
+    Identity of a log file that survives rotation and compression: the
+    record_hash of its first row (None while it has no rows).
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, 'rb') as f:
+        f.readline()
+        first = f.readline()
+    return first.rstrip(b"\r\n")[-64:].decode() if first.endswith(b"\r\n") else None
+
+
+def read_new_rows(path, done):
+    """
+    Rows of `path` after the `done` = {'rows', 'offset'} already converted.
+    Plain files are read from the byte offset (up to the last complete row,
+    the writer may be appending); gzip segments are closed, so rows are skipped.
+    Columns follow the file's own header; columns added later are 'N/A'.
+
+    Returns:
+        (DataFrame, new offset or None)
+    """
+    gz = str(path).endswith(".gz")
+    with (gzip.open(path, 'rb') if gz else open(path, 'rb')) as f:
+        names = f.readline().decode().strip().split(",")
+        if gz:
+            raw, offset = pd.read_csv(f, skiprows=done['rows'], header=None, names=names,
+                                      dtype=str, keep_default_na=False), None
+        else:
+            if done['offset'] is not None:
+                f.seek(done['offset'])
+            start = f.tell()
+            data = f.read()
+            cut = data.rfind(b"\r\n") + 2 if b"\r\n" in data else 0
+            raw = pd.read_csv(io.BytesIO(data[:cut]), header=None, names=names, dtype=str,
+                              keep_default_na=False) if cut else pd.DataFrame(columns=names)
+            offset = start + cut
+    return raw.reindex(columns=AUDIT_COLUMNS, fill_value="N/A"), offset
+
+
+def to_columnar(raw: pd.DataFrame) -> pd.DataFrame:
+    """Typed columns for analysis ('N/A' -> missing)."""
+    df = raw.replace("N/A", np.nan)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format="ISO8601")
+    for col in ('probability', 'mean_luminance', 'subject_age', 'hb_lab_value', 'time_delta_seconds'):
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in ('is_low_confidence', 'hb_confirmed_anemia'):
+        df[col] = df[col].map({'True': True, 'False': False}).astype('boolean')
+    return df
+
+
+def aggregate_days(df: pd.DataFrame) -> dict:
+    """Per-day counters that can be added to the aggregates of earlier runs."""
+    days = {}
+    bins = np.clip((df['probability'].fillna(0) * ANALYTICS_HIST_BINS).astype(int), 0, ANALYTICS_HIST_BINS - 1)
+    predicted_pos = df['classification'] == 'ANEMIC'
+    predicted_neg = df['classification'] == 'NORMAL'
+    confirmed = df['hb_confirmed_anemia']
+
+    for day, idx in df.groupby(df['timestamp'].dt.date.astype(str)).groups.items():
+        sub_conf, sub_pos, sub_neg = confirmed.loc[idx], predicted_pos.loc[idx], predicted_neg.loc[idx]
+        lab_pos, lab_neg = sub_conf.eq(True).fillna(False), sub_conf.eq(False).fillna(False)
+        days[day] = {
+            'rows': len(idx),
+            'low_confidence': int(df.loc[idx, 'is_low_confidence'].fillna(False).sum()),
+            'anemic': int(sub_pos.sum()),
+            'histogram': np.bincount(bins.loc[idx], minlength=ANALYTICS_HIST_BINS).tolist(),
+            'methods': df.loc[idx, 'extraction_method'].value_counts().to_dict(),
+            # Lab-confirmed outcomes; INCONCLUSIVE predictions are counted separately
+            'tp': int((lab_pos & sub_pos).sum()),
+            'fn': int((lab_pos & sub_neg).sum()),
+            'tn': int((lab_neg & sub_neg).sum()),
+            'fp': int((lab_neg & sub_pos).sum()),
+            'confirmed_inconclusive': int(((lab_pos | lab_neg) & ~sub_pos & ~sub_neg).sum()),
+        }
+    return days
+
+
+def merge_days(total: dict, new: dict):
+    for day, agg in new.items():
+        if day not in total:
+            total[day] = agg
+            continue
+        cur = total[day]
+        for key, value in agg.items():
+            if key == 'histogram':
+                cur[key] = [a + b for a, b in zip(cur[key], value)]
+            elif key == 'methods':
+                for method, n in value.items():
+                    cur[key][method] = cur[key].get(method, 0) + n
+            else:
+                cur[key] += value
+
+
+def update(log_path=AUDIT_FILE, out_dir=ANALYTICS_DIR, env=None, rebuild=False) -> dict:
+    """Convert new audit rows and fold them into the aggregates. Returns the state."""
+    out_dir = Path(out_dir)
+    if rebuild and out_dir.exists():
+        shutil.rmtree(out_dir / ROWS_DIR, ignore_errors=True)
+        (out_dir / STATE_FILE).unlink(missing_ok=True)
+    (out_dir / ROWS_DIR).mkdir(parents=True, exist_ok=True)
+
+    state_path = out_dir / STATE_FILE
+    state = json.loads(state_path.read_text()) if state_path.exists() else {'files': {}, 'days': {}, 'env': env}
+    if state.get('env') != env:
+        raise SystemExit(f"Analytics in {out_dir} were built for env={state.get('env')}; rerun with --rebuild")
+
+    new_rows = 0
+    for path in segment_files(log_path):
+        fid = file_id(path)
+        if fid is None:
+            continue
+        done = state['files'].get(fid, {'rows': 0, 'offset': None})
+        if str(path).endswith(".gz") and done.get('complete'):
+            continue
+        raw, offset = read_new_rows(path, done)
+        if str(path).endswith(".gz"):
+            done['complete'] = True
+        done['offset'] = offset if offset is not None else done['offset']
+        if len(raw):
+            df = to_columnar(raw)
+            if env is not None:
+                df = df[df['environment'] == env]
+            if len(df):
+                # Deterministic name: a rerun after a crash overwrites the same part
+                df.to_parquet(out_dir / ROWS_DIR / f"part-{fid[:16]}-{done['rows']:09d}.parquet", index=False)
+                merge_days(state['days'], aggregate_days(df))
+            done['rows'] += len(raw)
+            new_rows += len(raw)
+        state['files'][fid] = done
+
+    state['updated_at'] = datetime.utcnow().isoformat()
+    tmp = state_path.with_name(f".{STATE_FILE}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, state_path)
+    logger.info(f"Converted {new_rows} new audit rows")
+    state['new_rows'] = new_rows
+    return state
+
+
+# =====================================================================
+#  METRICS
+# =====================================================================
+
+def summarize(days: dict, first: date, last: date) -> dict:
+    """Totals of the daily aggregates for first <= day <= last."""
+    rows = low_confidence = anemic = 0
+    histogram = np.zeros(ANALYTICS_HIST_BINS, dtype=int)
+    methods = {}
+    for day, agg in days.items():
+        if first.isoformat() <= day <= last.isoformat():
+            rows += agg['rows']
+            low_confidence += agg['low_confidence']
+            anemic += agg['anemic']
+            histogram += agg['histogram']
+            for method, n in agg['methods'].items():
+                methods[method] = methods.get(method, 0) + n
+    return {
+        'from': first.isoformat(),
+        'to': last.isoformat(),
+        'rows': rows,
+        'low_confidence_rate': low_confidence / rows if rows else None,
+        'anemic_rate': anemic / rows if rows else None,
+        'method_mix': {m: n / rows for m, n in sorted(methods.items())} if rows else {},
+        'histogram': histogram.tolist(),
+    }
+
+
+def drift_metrics(window, baseline) -> dict:
+    """Total-variation distance of the probability histograms and rate changes."""
+    p = np.array(window['histogram'], dtype=float)
+    q = np.array(baseline['histogram'], dtype=float)
+    methods = set(window['method_mix']) | set(baseline['method_mix'])
+    return {
+        'probability_tv_distance': 0.5 * float(np.abs(p / p.sum() - q / q.sum()).sum()),
+        'low_confidence_rate_delta': window['low_confidence_rate'] - baseline['low_confidence_rate'],
+        'anemic_rate_delta': window['anemic_rate'] - baseline['anemic_rate'],
+        'method_mix_tv_distance': 0.5 * sum(abs(window['method_mix'].get(m, 0) - baseline['method_mix'].get(m, 0))
+                                           for m in methods),
+    }
+
+
+def pilot_metrics(days: dict) -> dict:
+    counts = {k: sum(agg[k] for agg in days.values()) for k in ('tp', 'fn', 'tn', 'fp', 'confirmed_inconclusive')}
+    confirmed = sum(counts.values())
+    confirmed_anemic = counts['tp'] + counts['fn']
+    result = {**counts, 'confirmed_cases': confirmed, 'confirmed_anemic': confirmed_anemic}
+    if confirmed < PILOT_QUORUM or confirmed_anemic < ANEMIA_QUORUM:
+        result['status'] = f"quorum not met ({confirmed}/{PILOT_QUORUM} cases, {confirmed_anemic}/{ANEMIA_QUORUM} anemic)"
+        return result
+    result['status'] = "ok"
+    result['sensitivity'] = counts['tp'] / confirmed_anemic
+    result['specificity'] = counts['tn'] / (counts['tn'] + counts['fp']) if counts['tn'] + counts['fp'] else None
+    return result
+
+
+def report(state, out_dir=ANALYTICS_DIR, as_of=None) -> dict:
+    """Window vs. baseline metrics, pilot metrics and drift alerts."""
+    days = state['days']
+    last = as_of or (date.fromisoformat(max(days)) if days else date.today())
+    window_start = last - timedelta(days=ANALYTICS_WINDOW_DAYS - 1)
+    window = summarize(days, window_start, last)
+    baseline = summarize(days, window_start - timedelta(days=ANALYTICS_BASELINE_DAYS), window_start - timedelta(days=1))
+
+    result = {'generated_at': datetime.utcnow().isoformat(), 'window': window, 'baseline': baseline,
+              'pilot': pilot_metrics(days), 'drift': None, 'alerts': []}
+    if window['rows'] >= ANALYTICS_MIN_ROWS and baseline['rows'] >= ANALYTICS_MIN_ROWS:
+        result['drift'] = drift_metrics(window, baseline)
+        for metric, value in result['drift'].items():
+            if abs(value) > DRIFT_ALERT_THRESHOLD:
+                result['alerts'].append({'metric': metric, 'value': round(value, 4),
+                                         'threshold': DRIFT_ALERT_THRESHOLD, 'window_to': window['to']})
+
+    out_dir = Path(out_dir)
+    (out_dir / REPORT_FILE).write_text(json.dumps(result, indent=2))
+    if result['alerts']:
+        with open(out_dir / ALERTS_FILE, 'a') as f:
+            for alert in result['alerts']:
+                logger.warning(f"DRIFT ALERT: {alert['metric']} = {alert['value']} (> {DRIFT_ALERT_THRESHOLD})")
+                f.write(json.dumps({**alert, 'generated_at': result['generated_at']}) + "\n")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NetraAI audit analytics and drift monitoring")
+    parser.add_argument("--log", default=str(AUDIT_FILE), help="Active audit log (default: logs/audit.csv)")
+    parser.add_argument("--out", default=str(ANALYTICS_DIR))
+    parser.add_argument("--env", help="Only rows from this environment (e.g. PRODUCTION)")
+    parser.add_argument("--rebuild", action="store_true", help="Discard converted rows and start over")
+    args = parser.parse_args()
+
+    state = update(args.log, args.out, env=args.env, rebuild=args.rebuild)
+    result = report(state, args.out)
+    window, baseline, pilot = result['window'], result['baseline'], result['pilot']
+
+    def pct(x):
+        return "n/a" if x is None else f"{x:.1%}"
+
+    print("=" * 60)
+    print("NETRA AI - AUDIT ANALYTICS")
+    print("=" * 60)
+    print(f"  new rows            {state['new_rows']:,}")
+    print(f"  window              {window['from']} .. {window['to']} ({window['rows']:,} rows)")
+    print(f"  baseline            {baseline['from']} .. {baseline['to']} ({baseline['rows']:,} rows)")
+    print(f"  low-confidence      {pct(window['low_confidence_rate'])} (baseline {pct(baseline['low_confidence_rate'])})")
+    print(f"  ANEMIC rate         {pct(window['anemic_rate'])} (baseline {pct(baseline['anemic_rate'])})")
+    print("  methods             " + ", ".join(f"{m} {pct(v)}" for m, v in window['method_mix'].items()))
+    if result['drift'] is None:
+        print(f"  drift               not computed (< {ANALYTICS_MIN_ROWS} rows in a window)")
+    else:
+        for metric, value in result['drift'].items():
+            print(f"  {metric:<28}{value:+.4f}")
+    if pilot['status'] == "ok":
+        print(f"  sensitivity         {pct(pilot['sensitivity'])} ({pilot['confirmed_anemic']} confirmed anemic)")
+        print(f"  specificity         {pct(pilot['specificity'])}")
+    else:
+        print(f"  pilot metrics       {pilot['status']}")
+    print(f"  alerts              {len(result['alerts'])}")
+    print("=" * 60)
+    return 2 if result['alerts'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,65 @@
+"""
+audit_logger.py - Append-only audit log of every inference
+log_inference() only formats a row and queues it; a single writer thread
+per process appends rows to logs/audit.csv in batches (on size or age),
+fsyncs at a configurable cadence and drains the queue on close() / exit.
+
+Tamper evidence: every row ends with record_hash = sha256(previous
+record_hash + row), and HMAC-signed checkpoints (byte offset + record_hash)
+are appended to logs/audit.checkpoints every AUDIT_CHECKPOINT_BYTES.
+Check a log with audit_verify.py.
+
+Rotation: the active log is closed into logs/segments/ once it reaches
+AUDIT_ROTATE_BYTES or a new (UTC) day starts; see audit_segments.py. The
+chain continues across segments through a signed link checkpoint at the
+start of each new segment.
+Path: src/audit_logger.py
+"""
+
 import os
+import io
 import csv
+import atexit
 import hashlib
+import logging
+import queue
+import threading
+import time
 import cv2
-import numpy as np
+import fcntl
+import hmac
+import json
 from datetime import datetime
 from pathlib import Path
 
+from config import (
+    AUDIT_QUEUE_SIZE, AUDIT_FLUSH_ROWS, AUDIT_FLUSH_INTERVAL, AUDIT_FSYNC_INTERVAL,
+    AUDIT_CHECKPOINT_BYTES, AUDIT_HMAC_KEY, AUDIT_ROTATE_BYTES, AUDIT_ROTATE_DAILY
+)
+from audit_segments import SegmentCompressor, segment_dir, segment_name, pending_segments
+
+logger = logging.getLogger(__name__)
+
 LOG_DIR = Path("logs")
 AUDIT_FILE = LOG_DIR / "audit.csv"
 
+AUDIT_COLUMNS = [
+    "timestamp", "image_hash_sha256", "model_version", 
+    "probability", "classification", "is_low_confidence",
+    "extraction_method", "environment",
+    "device_type", "resolution", "mean_luminance",
+    "subject_age", "subject_sex", "capture_environment",
+    "hb_lab_value", "hb_confirmed_anemia", "time_delta_seconds",
+    "clinician_decision", "override_reason", "perceptual_hash", "cache_hit", "record_hash"
+]
+HEADER_LINE = (",".join(AUDIT_COLUMNS) + "\r\n").encode()
+
+# previous record_hash of the first row
+GENESIS_HASH = "0" * 64
+
+# BGR weights of cv2.COLOR_BGR2GRAY
+_LUMA_WEIGHTS = (0.114, 0.587, 0.299)
+
 def calculate_anemia_status(hb_value, sex):
     """
     Calculate anemic status based on sex-specific Hb thresholds.
@@ -25,35 +76,67 @@ def calculate_anemia_status(hb_value, sex):
         return hb_value < 13.0
     return None
 
-def init_logger():
+def hash_image(image_bgr):
+    """
+    SHA-256 of the raw pixel buffer. Fallback identity for callers that only
+    have a decoded array; the service passes fingerprint.UploadFingerprint
+    of the uploaded bytes instead.
+    """
+    return hashlib.sha256(image_bgr.tobytes()).hexdigest()
+
+def chain_hash(prev_hash, payload):
+    """record_hash of a row: sha256 over the previous hash and the row's CSV bytes."""
+    return hashlib.sha256(prev_hash.encode() + payload).hexdigest()
+
+def checkpoint_path(log_path):
+    """audit.csv -> audit.checkpoints, segments/audit-X.csv.gz -> segments/audit-X.checkpoints"""
+    log_path = Path(log_path)
+    return log_path.with_name(log_path.name.split(".")[0] + ".checkpoints")
+
+def sign_checkpoint(offset, record_hash, signed_at, key=AUDIT_HMAC_KEY):
+    """HMAC-SHA256 of a checkpoint (None without a key)."""
+    if not key:
+        return None
+    message = f"{offset}:{record_hash}:{signed_at}".encode()
+    return hmac.new(key.encode(), message, hashlib.sha256).hexdigest()
+
+def init_logger(path=AUDIT_FILE):
     """Ensure log directory and audit file exist with headers."""
-    if not LOG_DIR.exists():
-        LOG_DIR.mkdir(parents=True)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
     
-    if not AUDIT_FILE.exists():
-        with open(AUDIT_FILE, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                "timestamp", "image_hash_sha256", "model_version", 
-                "probability", "classification", "is_low_confidence",
-                "extraction_method", "environment",
-                "device_type", "resolution", "mean_luminance",
-                "subject_age", "subject_sex", "capture_environment",
-                "hb_lab_value", "hb_confirmed_anemia", "time_delta_seconds",
-                "clinician_decision", "override_reason"
-            ])
+    if not path.exists():
+        # Write the header aside and link it into place, so other processes
+        # never see a half-written header
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(HEADER_LINE)
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            pass        # another process created it first
+        finally:
+            tmp.unlink()
+
+def mean_luminance(image_bgr):
+    """Mean of the grayscale image, from per-channel means (no gray copy)."""
+    means = cv2.mean(image_bgr)
+    if image_bgr.ndim == 2:
+        return means[0]
+    return sum(w * m for w, m in zip(_LUMA_WEIGHTS, means))
 
 def log_inference(image_bgr, probability, classification, is_low_confidence, extraction_method, 
-                  version="v1.0.0", env="PRODUCTION", metadata=None):
+                  version="v1.0.0", env="PRODUCTION", metadata=None, image_hash=None,
+                  perceptual_hash=None, cache_hit=False):
     """
     Log inference details with expanded clinical metadata.
+    image_hash: SHA-256 of the uploaded bytes (pixels are hashed if omitted)
+    perceptual_hash: dHash for near-duplicate search (fingerprint.perceptual_hash)
+    cache_hit: the result was reused from the prediction cache, not recomputed
+    The row is queued and written by the background writer (see flush()).
     """
-    init_logger()
-    
     metadata = metadata or {}
     
-    # Generate SHA-256 hash of image pixels
-    img_hash = hashlib.sha256(image_bgr.tobytes()).hexdigest()
+    img_hash = image_hash or hash_image(image_bgr)
     timestamp = datetime.utcnow().isoformat()
     
     # Calculate Hb status if ground truth is provided
@@ -64,26 +147,446 @@ def log_inference(image_bgr, probability, classification, is_low_confidence, ext
     # Image stats
     h, w = image_bgr.shape[:2]
     res = f"{w}x{h}"
-    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-    mean_lum = float(np.mean(gray))
-
-    with open(AUDIT_FILE, 'a', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            timestamp, img_hash, version, 
-            f"{probability:.4f}", classification, 
-            is_low_confidence, extraction_method, env,
-            metadata.get('device_type', 'unknown'),
-            res, f"{mean_lum:.2f}",
-            metadata.get('subject_age', 'N/A'),
-            sex or 'N/A',
-            metadata.get('capture_environment', 'unknown'),
-            hb_v if hb_v is not None else 'N/A',
-            hb_anemic if hb_anemic is not None else 'N/A',
-            metadata.get('time_delta_seconds', 'N/A'),
-            metadata.get('clinician_decision', 'N/A'),
-            metadata.get('override_reason', 'N/A')
-        ])
+    mean_lum = mean_luminance(image_bgr)
+
+    get_writer().write([
+        timestamp, img_hash, version, 
+        f"{probability:.4f}", classification, 
+        is_low_confidence, extraction_method, env,
+        metadata.get('device_type', 'unknown'),
+        res, f"{mean_lum:.2f}",
+        metadata.get('subject_age', 'N/A'),
+        sex or 'N/A',
+        metadata.get('capture_environment', 'unknown'),
+        hb_v if hb_v is not None else 'N/A',
+        hb_anemic if hb_anemic is not None else 'N/A',
+        metadata.get('time_delta_seconds', 'N/A'),
+        metadata.get('clinician_decision', 'N/A'),
+        metadata.get('override_reason', 'N/A'),
+        perceptual_hash or 'N/A',
+        bool(cache_hit)
+    ])
+
+
+class AuditWriter:
+    """
+    Single background writer for audit rows.
+
+    Rows are written in batches of up to flush_rows, or once the oldest
+    queued row is flush_interval seconds old. Each batch is one write() on an
+    O_APPEND descriptor, so worker processes sharing the file never interleave
+    partial rows. write() blocks (rather than dropping) when the queue is
+    full; close() writes everything queued before returning. Rows written
+    after close() (e.g. a request finishing during shutdown) are dropped
+    with a warning and counted in stats()['dropped_rows'].
+
+    The hash chain spans processes: batches are chained and written under an
+    exclusive flock, and the previous record_hash is re-read from the end of
+    the file whenever another process appended since our last batch.
+    """
+
+    def __init__(self, path=AUDIT_FILE, max_queue=AUDIT_QUEUE_SIZE, flush_rows=AUDIT_FLUSH_ROWS,
+                 flush_interval=AUDIT_FLUSH_INTERVAL, fsync_interval=AUDIT_FSYNC_INTERVAL,
+                 checkpoint_bytes=AUDIT_CHECKPOINT_BYTES, key=AUDIT_HMAC_KEY,
+                 rotate_bytes=AUDIT_ROTATE_BYTES, rotate_daily=AUDIT_ROTATE_DAILY):
+        self.path = Path(path)
+        self.checkpoint_file = checkpoint_path(self.path)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.checkpoint_bytes = checkpoint_bytes
+        self.key = key
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        if not key:
+            logger.warning("NETRA_AUDIT_KEY is not set — audit checkpoints will be unsigned")
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._fd = None
+        self._end = None               # file size after our last batch
+        self._last_hash = None         # record_hash of the row ending at _end
+        self._checkpoint_offset = None
+        self._checkpoint_size = None   # checkpoint file size when _checkpoint_offset was read
+        self._first_timestamp = None   # first row of the open file (daily rotation)
+        self._header_len = len(HEADER_LINE)
+        self._schema_current = True    # open file has the current AUDIT_COLUMNS
+        self._compressor = None
+        self._checkpoints = 0
+        self._rotations = 0
+        self._rows = 0
+        self._batches = 0
+        self._fsyncs = 0
+        self._failed_writes = 0
+        self._dropped_rows = 0
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._submit_lock = threading.Lock()   # orders write() / flush() against close()'s stop marker
+
+        self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._worker.start()
+        # Rows queued by scripts that never call close() are still written
+        atexit.register(self.close)
+
+    # =====================================================================
+    #  PUBLIC API
+    # =====================================================================
+
+    def write(self, row) -> bool:
+        """Queue one CSV row (list of values). Returns False if dropped (writer closed)."""
+        with self._submit_lock:
+            if not self._closed:
+                self._queue.put(row)
+                return True
+        with self._lock:
+            self._dropped_rows += 1
+        logger.warning(f"Audit writer is closed — dropped row for image {row[1] if len(row) > 1 else '?'}")
+        return False
+
+    def flush(self, timeout=None) -> bool:
+        """Block until every row queued so far is written and fsynced."""
+        done = threading.Event()
+        with self._submit_lock:
+            if self._closed:
+                # close() already wrote (or is writing) everything queued
+                self._worker.join(timeout)
+                return not self._worker.is_alive()
+            self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Write all queued rows and stop the writer thread (idempotent)."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join(timeout)
+        if self._compressor is not None:
+            self._compressor.close(timeout)
+        atexit.unregister(self.close)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'rows_written': self._rows,
+                'batches': self._batches,
+                'mean_batch_rows': round(self._rows / self._batches, 1) if self._batches else 0.0,
+                'fsyncs': self._fsyncs,
+                'checkpoints': self._checkpoints,
+                'rotations': self._rotations,
+                'failed_writes': self._failed_writes,
+                'dropped_rows': self._dropped_rows,
+            }
+
+    # =====================================================================
+    #  WORKER
+    # =====================================================================
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False        # oldest row reached flush_interval
+
+            if isinstance(item, list):
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.flush_rows:
+                    continue
+
+            if batch and self._write_batch(batch):
+                batch = []
+            elif batch:
+                # Write failed: keep the rows and retry after another interval
+                deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, threading.Event):
+                self._sync()
+                item.set()
+            elif item is None:
+                if self._fd is not None:
+                    try:
+                        self._seal()
+                    except OSError as e:
+                        logger.error(f"Final audit checkpoint failed: {e}")
+                self._sync()
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                return
+
+    def _open(self):
+        if self._fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._retire_legacy_log()
+            if not self.path.exists():
+                init_logger(self.path)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            self._end = None
+            self._checkpoint_size = None
+            self._first_timestamp = None
+            header = os.pread(self._fd, 4096, 0)
+            self._header_len = header.find(b"\n") + 1
+            # A log with an older column set is rotated out before the next write
+            self._schema_current = header[:self._header_len] == HEADER_LINE
+            if self._compressor is None and pending_segments(self.path):
+                # Segments closed by a process that stopped before compressing
+                for segment in pending_segments(self.path):
+                    self._compress(segment)
+        return self._fd
+
+    def _acquire(self):
+        """Open the active log and flock it, following rotations by other processes."""
+        while True:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+            self._fd = None
+
+    def _release(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _retire_legacy_log(self):
+        """Move aside a log written before rows were hash-chained (no link possible)."""
+        if not self.path.exists():
+            return
+        with open(self.path, 'rb') as f:
+            first = f.readline()
+        if first and not first.endswith(b",record_hash\r\n"):
+            legacy = self.path.with_name(f"{self.path.stem}.legacy-{int(time.time())}{self.path.suffix}")
+            try:
+                os.rename(self.path, legacy)
+                logger.warning(f"Audit log without hash chain moved to {legacy}")
+            except FileNotFoundError:
+                pass        # another process moved it first
+
+    def _format(self, batch):
+        """CSV bytes of each row (no terminator); newlines in free text become spaces."""
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        payloads = []
+        for row in batch:
+            writer.writerow([v.replace("\r", " ").replace("\n", " ") if isinstance(v, str) else v for v in row])
+            payloads.append(buf.getvalue()[:-1].encode('utf-8'))
+            buf.seek(0)
+            buf.truncate()
+        return payloads
+
+    def _write_batch(self, batch) -> bool:
+        payloads = self._format(batch)
+        try:
+            fd = self._acquire()
+            try:
+                end = os.fstat(fd).st_size
+                if not self._schema_current or self._should_rotate(fd, end, batch[0][0][:10]):
+                    fd = self._rotate(fd, end)
+                    end = os.fstat(fd).st_size
+                prev = self._last_hash if end == self._end else self._read_last_hash(fd, end)
+                lines = []
+                for payload in payloads:
+                    prev = chain_hash(prev, payload)
+                    lines.append(payload + b"," + prev.encode() + b"\r\n")
+                data = b"".join(lines)
+                os.write(fd, data)
+                self._end, self._last_hash = end + len(data), prev
+                if self._end - self._last_checkpoint_offset() >= self.checkpoint_bytes:
+                    self._write_checkpoint()
+            finally:
+                self._release(fd)
+        except OSError as e:
+            with self._lock:
+                self._failed_writes += 1
+            logger.error(f"Audit write of {len(batch)} rows failed (will retry): {e}")
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            return False
+        with self._lock:
+            self._rows += len(batch)
+            self._batches += 1
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._sync()
+        return True
+
+    # =====================================================================
+    #  HASH CHAIN / CHECKPOINTS (called with the flock held)
+    # =====================================================================
+
+    def _read_last_hash(self, fd, end):
+        """
+        record_hash of the last row in the file; for a file with no rows, the
+        previous segment's hash from the link checkpoint (or GENESIS_HASH).
+        """
+        if end <= self._header_len:
+            if self.checkpoint_file.exists():
+                with open(self.checkpoint_file, 'rb') as f:
+                    first = f.readline()
+                if first:
+                    return json.loads(first)['record_hash']
+            return GENESIS_HASH
+        size = 1024
+        while True:
+            start = max(self._header_len, end - size)
+            tail = os.pread(fd, end - start, start).rstrip(b"\r\n")
+            if b"\n" in tail or start == self._header_len:
+                return tail.rsplit(b"\n", 1)[-1][-64:].decode()
+            size *= 4
+
+    def _last_checkpoint_offset(self):
+        size = self.checkpoint_file.stat().st_size if self.checkpoint_file.exists() else 0
+        if size != self._checkpoint_size:
+            self._checkpoint_offset = self._header_len
+            if size:
+                with open(self.checkpoint_file, 'rb') as f:
+                    f.seek(max(0, size - 4096))
+                    last = f.read().rstrip(b"\n").rsplit(b"\n", 1)[-1]
+                self._checkpoint_offset = json.loads(last)['offset']
+            self._checkpoint_size = size
+        return self._checkpoint_offset
+
+    def _checkpoint_record(self, offset, record_hash, **extra):
+        signed_at = datetime.utcnow().isoformat()
+        return {
+            'offset': offset,
+            'record_hash': record_hash,
+            'signed_at': signed_at,
+            'hmac': sign_checkpoint(offset, record_hash, signed_at, self.key),
+            **extra
+        }
+
+    def _write_checkpoint(self):
+        record = self._checkpoint_record(self._end, self._last_hash)
+        with open(self.checkpoint_file, 'ab') as f:
+            f.write((json.dumps(record) + "\n").encode())
+            f.flush()
+            os.fsync(f.fileno())
+        self._checkpoint_offset = self._end
+        self._checkpoint_size = self.checkpoint_file.stat().st_size
+        with self._lock:
+            self._checkpoints += 1
+
+    def _seal(self):
+        """Checkpoint the rows after the last checkpoint (on shutdown)."""
+        fd = self._acquire()
+        try:
+            self._seal_locked(fd, os.fstat(fd).st_size)
+        finally:
+            self._release(fd)
+
+    def _seal_locked(self, fd, end):
+        if end != self._end:
+            self._end, self._last_hash = end, self._read_last_hash(fd, end)
+        if end > self._last_checkpoint_offset():
+            self._write_checkpoint()
+
+    # =====================================================================
+    #  ROTATION (called with the flock held)
+    # =====================================================================
+
+    def _first_row_timestamp(self, fd):
+        if self._first_timestamp is None:
+            first = os.pread(fd, 64, self._header_len)
+            # A log with no rows (only closed for a schema change) is named by the current time
+            self._first_timestamp = first.split(b",", 1)[0].decode() or datetime.utcnow().isoformat()
+        return self._first_timestamp
+
+    def _should_rotate(self, fd, end, batch_day):
+        """Size reached, or the batch starts a later day than the file's first row."""
+        if end <= self._header_len:
+            return False
+        if end >= self.rotate_bytes:
+            return True
+        return self.rotate_daily and self._first_row_timestamp(fd)[:10] < batch_day
+
+    def _rotate(self, fd, end):
+        """
+        Close the active log into the segment directory and start a new one.
+        The new log's checkpoint file is put in place before the log itself,
+        so a process that creates or opens the new log always finds the link
+        to the previous segment. Returns the new log's descriptor, locked.
+        """
+        self._seal_locked(fd, end)
+
+        directory = segment_dir(self.path)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = segment_name(self._first_row_timestamp(fd))
+        dest, n = directory / f"{name}.csv", 1
+        while dest.exists() or dest.with_name(dest.name + ".gz").exists():
+            n += 1
+            dest = directory / f"{name}-{n:03d}.csv"     # zero-padded: names sort in chain order
+
+        link = self._checkpoint_record(len(HEADER_LINE), self._last_hash, previous_segment=dest.name.split(".")[0])
+        tmp = self.checkpoint_file.with_name(f".{self.checkpoint_file.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(link) + "\n")
+        if self.checkpoint_file.exists():
+            os.replace(self.checkpoint_file, checkpoint_path(dest))
+        os.link(tmp, self.checkpoint_file)
+        tmp.unlink()
+        os.replace(self.path, dest)
+        init_logger(self.path)
+
+        with self._lock:
+            self._rotations += 1
+        logger.info(f"Audit log rotated to {dest}")
+        self._compress(dest)
+
+        os.fsync(fd)
+        self._release(fd)
+        os.close(fd)
+        self._fd = None
+        return self._acquire()
+
+    def _compress(self, segment):
+        if self._compressor is None:
+            self._compressor = SegmentCompressor()
+        self._compressor.submit(segment)
+
+    def _sync(self):
+        if self._fd is None:
+            return
+        os.fsync(self._fd)
+        self._last_fsync = time.monotonic()
+        with self._lock:
+            self._fsyncs += 1
+
+
+# Global instance (one per process)
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter()
+    return _writer
+
+def flush(timeout=None) -> bool:
+    """Wait until every queued audit row is on disk."""
+    return _writer.flush(timeout) if _writer is not None else True
+
+def close(timeout=None):
+    """Drain the audit queue and stop the writer (call on shutdown)."""
+    if _writer is not None:
+        _writer.close(timeout)
+
+def stats():
+    """Queue depth and write / fsync counters (None before the first row)."""
+    return _writer.stats() if _writer is not None else None
 
 if __name__ == "__main__":
     init_logger()
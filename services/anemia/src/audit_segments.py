@@ -0,0 +1,348 @@
+"""
+audit_segments.py - Closed audit log segments: compression, index and queries
+When the active audit log rotates (size or day), the closed file moves to
+logs/segments/audit-<first row time>.csv. A background thread then writes a
+sidecar index (time range, row count, chain hashes, bloom filter of image
+hashes) and gzips the segment, so time-window and image-hash queries only
+open the segments that can match.
+Path: src/audit_segments.py
+
+Usage:
+    python audit_segments.py list
+    python audit_segments.py window --from 2026-01-01 --to 2026-02-01
+    python audit_segments.py find --hash <image_hash_sha256>
+    python audit_segments.py similar --phash <perceptual_hash> [--max-distance 6]
+    python audit_segments.py compress          # finish segments left uncompressed
+"""
+
+import argparse
+import atexit
+import base64
+import csv
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from config import AUDIT_BLOOM_FP_RATE
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_DIR_NAME = "segments"
+INDEX_SUFFIX = ".index.json"
+
+
+def segment_dir(log_path) -> Path:
+    return Path(log_path).parent / SEGMENT_DIR_NAME
+
+
+def segment_name(first_timestamp: str) -> str:
+    """audit-20261018T035248 for a first row at 2026-10-18T03:52:48.xxx"""
+    compact = first_timestamp[:19].replace("-", "").replace(":", "")
+    return f"audit-{compact}"
+
+
+# =====================================================================
+#  BLOOM FILTER
+# =====================================================================
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter over hex digests (double hashing on the digest
+    itself, so image hashes are not hashed again). Other strings are
+    hashed with SHA-256 first.
+    """
+
+    def __init__(self, capacity, fp_rate=AUDIT_BLOOM_FP_RATE, bits=None, num_hashes=None, data=None):
+        capacity = max(1, capacity)
+        self.bits = bits or max(64, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = num_hashes or max(1, round(self.bits / capacity * math.log(2)))
+        self.data = bytearray(data) if data is not None else bytearray((self.bits + 7) // 8)
+
+    def _positions(self, value):
+        try:
+            h1, h2 = int(value[:16], 16), int(value[16:32], 16) | 1
+        except ValueError:
+            digest = hashlib.sha256(value.encode()).hexdigest()
+            h1, h2 = int(digest[:16], 16), int(digest[16:32], 16) | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.num_hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.data[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value):
+        return all(self.data[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    def to_dict(self):
+        return {'bits': self.bits, 'num_hashes': self.num_hashes,
+                'data': base64.b64encode(bytes(self.data)).decode()}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(1, bits=d['bits'], num_hashes=d['num_hashes'], data=base64.b64decode(d['data']))
+
+
+# =====================================================================
+#  INDEX + COMPRESSION
+# =====================================================================
+
+def open_segment(path):
+    """Text stream of a segment, compressed or not."""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, 'rt', newline='')
+    return open(path, 'r', newline='')
+
+
+def build_index(path, fp_rate=AUDIT_BLOOM_FP_RATE) -> dict:
+    """
+    Stream a segment once and summarise it for the sidecar index. Rows from
+    several worker processes interleave, so the time range is min / max.
+    """
+    hashes = []
+    first_ts = last_ts = last_hash = None
+    with open_segment(path) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        ts_col = header.index("timestamp")
+        img_col = header.index("image_hash_sha256")
+        chain_col = header.index("record_hash")
+        for row in reader:
+            ts = row[ts_col]
+            if first_ts is None or ts < first_ts:
+                first_ts = ts
+            if last_ts is None or ts > last_ts:
+                last_ts = ts
+            last_hash = row[chain_col]
+            hashes.append(row[img_col])
+
+    bloom = BloomFilter(len(set(hashes)), fp_rate)
+    for h in hashes:
+        bloom.add(h)
+    return {
+        'segment': Path(path).name.split(".")[0],
+        'rows': len(hashes),
+        'first_timestamp': first_ts,
+        'last_timestamp': last_ts,
+        'last_record_hash': last_hash,
+        'image_bloom': bloom.to_dict(),
+    }
+
+
+def compress_segment(path, fp_rate=AUDIT_BLOOM_FP_RATE):
+    """
+    Index and gzip a closed segment (<name>.csv -> <name>.csv.gz +
+    <name>.index.json). Safe to call from several processes: the first one
+    to lock the file does the work.
+    """
+    path = Path(path)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if not path.exists():
+            return None     # finished by another process while we waited
+        index = build_index(path, fp_rate)
+
+        gz_path = path.with_name(path.name + ".gz")
+        tmp = path.with_name(f".{gz_path.name}.{os.getpid()}.tmp")
+        with open(path, 'rb') as src, gzip.open(tmp, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp, gz_path)
+
+        index['size_bytes'] = os.fstat(fd).st_size
+        index['compressed_bytes'] = gz_path.stat().st_size
+        index_path = path.with_name(index['segment'] + INDEX_SUFFIX)
+        index_path.write_text(json.dumps(index))
+        path.unlink()
+        logger.info(f"Audit segment {gz_path.name}: {index['rows']} rows, "
+                    f"{index['size_bytes'] >> 10} KB -> {index['compressed_bytes'] >> 10} KB")
+        return index
+    finally:
+        os.close(fd)
+
+
+def pending_segments(log_path) -> list:
+    """Closed segments not yet compressed (e.g. the process stopped first)."""
+    directory = segment_dir(log_path)
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("audit-*.csv"), key=lambda p: p.name.split(".")[0])
+
+
+class SegmentCompressor:
+    """Background thread that indexes and gzips closed segments."""
+
+    def __init__(self, fp_rate=AUDIT_BLOOM_FP_RATE):
+        self.fp_rate = fp_rate
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="audit-compressor", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def submit(self, path):
+        self._queue.put(Path(path))
+
+    def close(self, timeout=None):
+        """Finish queued segments and stop (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout)
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                return
+            try:
+                compress_segment(path, self.fp_rate)
+            except Exception as e:
+                # Left as .csv; picked up again by the next writer or `compress`
+                logger.error(f"Failed to compress audit segment {path}: {e}")
+
+
+# =====================================================================
+#  QUERIES
+# =====================================================================
+
+def load_indexes(log_path) -> list:
+    directory = segment_dir(log_path)
+    if not directory.exists():
+        return []
+    paths = sorted(directory.glob("audit-*" + INDEX_SUFFIX), key=lambda p: p.name.split(".")[0])
+    return [json.loads(p.read_text()) for p in paths]
+
+
+def segment_files(log_path) -> list:
+    """Every segment in chain order (oldest first), ending with the active log."""
+    directory = segment_dir(log_path)
+    closed = []
+    if directory.exists():
+        closed = sorted(list(directory.glob("audit-*.csv.gz")) + list(directory.glob("audit-*.csv")),
+                        key=lambda p: p.name.split(".")[0])
+    return closed + ([Path(log_path)] if Path(log_path).exists() else [])
+
+
+def _indexed_path(log_path, index):
+    return segment_dir(log_path) / f"{index['segment']}.csv.gz"
+
+
+def segments_for_window(log_path, start=None, end=None) -> list:
+    """Segments that may hold rows with start <= timestamp < end (ISO strings)."""
+    indexes = load_indexes(log_path)
+    indexed = {i['segment'] for i in indexes}
+    paths = []
+    for index in indexes:
+        if start is not None and index['last_timestamp'] is not None and index['last_timestamp'] < start:
+            continue
+        if end is not None and index['first_timestamp'] is not None and index['first_timestamp'] >= end:
+            continue
+        paths.append(_indexed_path(log_path, index))
+    # Unindexed segments (not compressed yet) and the active log are always scanned
+    return paths + [p for p in segment_files(log_path)
+                    if p.name.split(".")[0] not in indexed and p not in paths]
+
+
+def segments_with_image(log_path, image_hash) -> list:
+    """Segments whose bloom filter may contain image_hash (plus unindexed ones)."""
+    indexes = load_indexes(log_path)
+    indexed = {i['segment'] for i in indexes}
+    paths = [_indexed_path(log_path, index) for index in indexes
+             if image_hash in BloomFilter.from_dict(index['image_bloom'])]
+    return paths + [p for p in segment_files(log_path) if p.name.split(".")[0] not in indexed]
+
+
+def iter_rows(paths, start=None, end=None, image_hash=None):
+    """Rows (dicts) of the given segments, filtered by time window / image hash."""
+    for path in paths:
+        with open_segment(path) as f:
+            for row in csv.DictReader(f):
+                ts = row['timestamp']
+                if start is not None and ts < start:
+                    continue
+                if end is not None and ts >= end:
+                    continue
+                if image_hash is not None and row['image_hash_sha256'] != image_hash:
+                    continue
+                yield row
+
+
+def similar_rows(paths, phash, max_distance):
+    """Rows whose perceptual hash is within max_distance bits of phash (full scan)."""
+    from fingerprint import hamming_distance
+
+    for path in paths:
+        with open_segment(path) as f:
+            for row in csv.DictReader(f):
+                other = row.get('perceptual_hash', 'N/A')
+                if other != 'N/A' and hamming_distance(phash, other) <= max_distance:
+                    yield row
+
+
+def main():
+    from audit_logger import AUDIT_FILE
+
+    parser = argparse.ArgumentParser(description="NetraAI audit log segments")
+    parser.add_argument("--log", default=str(AUDIT_FILE))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Closed segments and their index")
+    window = sub.add_parser("window", help="Rows in a time window")
+    window.add_argument("--from", dest="start")
+    window.add_argument("--to", dest="end")
+    find = sub.add_parser("find", help="Rows for an image hash")
+    find.add_argument("--hash", required=True)
+    similar = sub.add_parser("similar", help="Rows for near-duplicate images")
+    similar.add_argument("--phash", required=True)
+    similar.add_argument("--max-distance", type=int, default=6)
+    sub.add_parser("compress", help="Index and gzip segments left uncompressed")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for index in load_indexes(args.log):
+            print(f"{index['segment']}  {index['rows']:>9,} rows  "
+                  f"{index['first_timestamp']} .. {index['last_timestamp']}  "
+                  f"{index['compressed_bytes'] >> 10} KB")
+        for path in pending_segments(args.log):
+            print(f"{path.stem}  (not compressed)")
+    elif args.command == "compress":
+        for path in pending_segments(args.log):
+            index = compress_segment(path)
+            print(f"{path.name}: " + (f"{index['rows']:,} rows" if index else "already compressed"))
+    else:
+        if args.command == "window":
+            paths = segments_for_window(args.log, args.start, args.end)
+            rows = iter_rows(paths, args.start, args.end)
+        elif args.command == "similar":
+            paths = segment_files(args.log)
+            rows = similar_rows(paths, args.phash, args.max_distance)
+        else:
+            paths = segments_with_image(args.log, args.hash)
+            rows = iter_rows(paths, image_hash=args.hash)
+        print(f"# scanning {len(paths)} segment(s): " + ", ".join(p.name for p in paths), file=sys.stderr)
+        out = None
+        for row in rows:
+            if out is None:
+                out = csv.DictWriter(sys.stdout, fieldnames=list(row))
+                out.writeheader()
+            out.writerow(row)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+audit_verify.py - Verify the hash chain and signed checkpoints of the audit log
+The active log is split at its checkpoints and each part is streamed and
+re-hashed in a separate process, starting from the checkpointed hash of the
+previous part; compressed segments (logs/segments/*.csv.gz) are streamed one
+process per file. Links between consecutive segments are checked, and the
+first broken link (file, row number and byte offset) is reported. Rows after
+the last checkpoint of the active log are chained but not yet signed.
+Path: src/audit_verify.py
+
+Usage:
+    NETRA_AUDIT_KEY=... python audit_verify.py [--workers 8]       # all segments + active log
+    NETRA_AUDIT_KEY=... python audit_verify.py --file logs/segments/audit-20261018T000000.csv.gz
+
+Exit code 0 if the log verifies, 1 if it was modified, truncated or a
+checkpoint signature does not match.
+"""
+
+import argparse
+import gzip
+import hmac
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from audit_logger import (
+    AUDIT_FILE, GENESIS_HASH, chain_hash, checkpoint_path, sign_checkpoint
+)
+from audit_segments import segment_files
+from config import AUDIT_HMAC_KEY, AUDIT_VERIFY_WORKERS
+
+CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def load_checkpoints(log_path):
+    path = checkpoint_path(log_path)
+    if not path.exists():
+        return []
+    with open(path, 'rb') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check_signature(checkpoint, key):
+    """True / False, or None when there is no key or the checkpoint is unsigned."""
+    if not key or checkpoint.get('hmac') is None:
+        return None
+    expected = sign_checkpoint(checkpoint['offset'], checkpoint['record_hash'], checkpoint['signed_at'], key)
+    return hmac.compare_digest(expected, checkpoint['hmac'])
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if str(path).endswith(".gz") else open(path, 'rb')
+
+
+def verify_segment(path, start, end, prev_hash, marks):
+    """
+    Re-hash rows in bytes [start, end) of a log (end=None: to EOF), checking
+    the chain against `marks`, an ordered list of (offset, record_hash)
+    checkpoints inside the range.
+
+    Returns:
+        {'rows', 'last_hash', 'error': None | {'row', 'offset', 'reason'}}
+        where 'row' is 0-based within the range.
+    """
+    rows, offset, pending = 0, start, b""
+    marks = list(marks)
+
+    def broken(reason):
+        return {'rows': rows, 'last_hash': prev_hash,
+                'error': {'row': rows, 'offset': offset, 'reason': reason}}
+
+    with _open(path) as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK_BYTES if remaining is None else min(CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            lines = (pending + chunk).split(b"\r\n")
+            pending = lines.pop()
+            for line in lines:
+                payload, _, record_hash = line.rpartition(b",")
+                if chain_hash(prev_hash, payload) != record_hash.decode('ascii', 'replace'):
+                    return broken("record_hash does not match row contents / previous row")
+                prev_hash = record_hash.decode()
+                rows += 1
+                offset += len(line) + 2
+                if marks and offset >= marks[0][0]:
+                    mark_offset, mark_hash = marks.pop(0)
+                    if offset != mark_offset or prev_hash != mark_hash:
+                        return broken(f"chain does not match the checkpoint at byte {mark_offset}")
+
+    if remaining:
+        return broken(f"log truncated: {remaining} bytes missing before checkpoint")
+    if pending:
+        return broken("incomplete last row")
+    if marks:
+        return broken(f"log truncated before the checkpoint at byte {marks[0][0]}")
+    return {'rows': rows, 'last_hash': prev_hash, 'error': None}
+
+
+def plan_file(path, checkpoints, header):
+    """
+    Split one log file into verification tasks (`header` = header line length;
+    segments written before a column was added have a shorter one).
+
+    Returns:
+        (link, tasks) - link is the previous segment's hash from the file's
+        link checkpoint (None if it has none); tasks are verify_segment args.
+    """
+    link = None
+    if checkpoints and checkpoints[0]['offset'] == header and 'previous_segment' in checkpoints[0]:
+        link, checkpoints = checkpoints[0]['record_hash'], checkpoints[1:]
+    genesis = link or GENESIS_HASH
+    marks = [(c['offset'], c['record_hash']) for c in checkpoints]
+
+    if str(path).endswith(".gz"):
+        # Seeking inside gzip means decompressing up to the offset: stream it once
+        return link, [(str(path), header, None, genesis, marks)]
+
+    tasks, start, prev = [], header, genesis
+    for offset, record_hash in marks:
+        tasks.append((str(path), start, offset, prev, [(offset, record_hash)]))
+        start, prev = offset, record_hash
+    tasks.append((str(path), start, None, prev, []))
+    return link, tasks
+
+
+def verify_files(paths, workers=AUDIT_VERIFY_WORKERS, key=AUDIT_HMAC_KEY) -> dict:
+    """
+    Verify consecutive log files (oldest first) as one chain. Returns a
+    summary with 'ok', row / checkpoint counts and, on failure, 'first_error'.
+    """
+    summary = {'ok': True, 'files': len(paths), 'rows': 0, 'checkpoints': 0, 'unsigned_checkpoints': 0,
+               'unsigned_rows': 0, 'first_error': None}
+
+    def fail(path, row, offset, reason):
+        if summary['first_error'] is None:
+            summary['first_error'] = {'file': str(path), 'row': row, 'offset': offset, 'reason': reason}
+
+    plans = []
+    for path in paths:
+        with _open(path) as f:
+            header = f.readline()
+        if not header.endswith(b",record_hash\r\n"):
+            fail(path, 0, 0, "unexpected header (not a hash-chained audit log)")
+            break
+        checkpoints = load_checkpoints(path)
+        for i, checkpoint in enumerate(checkpoints):
+            signature = check_signature(checkpoint, key)
+            summary['checkpoints'] += 1
+            if signature is None:
+                summary['unsigned_checkpoints'] += 1
+            elif not signature:
+                fail(path, None, checkpoint['offset'], f"checkpoint {i} signature does not match")
+            if i and checkpoint['offset'] < checkpoints[i - 1]['offset']:
+                fail(path, None, checkpoint['offset'], f"checkpoint {i} offset goes backwards")
+        plans.append((path, len(header), *plan_file(path, checkpoints, len(header))))
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [[pool.submit(verify_segment, *task) for task in tasks] for *_, tasks in plans]
+
+        previous_hash = None
+        for (path, header, link, tasks), file_futures in zip(plans, futures):
+            if previous_hash is not None and link != previous_hash:
+                fail(path, 1, header, "segment does not continue the previous segment's chain")
+            file_rows = 0
+            for (_, start, _, _, _), future in zip(tasks, file_futures):
+                if summary['first_error'] is not None:
+                    future.cancel()
+                    continue
+                result = future.result()
+                if result['error'] is not None:
+                    err = result['error']
+                    # Row numbers count data rows from 1 (file line = row + 1)
+                    fail(path, file_rows + err['row'] + 1, err['offset'], err['reason'])
+                file_rows += result['rows']
+                previous_hash = result['last_hash']
+            summary['rows'] += file_rows
+            if tasks and tasks[-1][2] is None and not tasks[-1][4] and summary['first_error'] is None:
+                summary['unsigned_rows'] = result['rows']
+
+    summary['ok'] = summary['first_error'] is None
+    return summary
+
+
+def verify_log(log_path=AUDIT_FILE, workers=AUDIT_VERIFY_WORKERS, key=AUDIT_HMAC_KEY) -> dict:
+    """Verify every closed segment of `log_path` and the active log itself."""
+    return verify_files(segment_files(log_path), workers, key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the NetraAI audit log hash chain")
+    parser.add_argument("--log", default=str(AUDIT_FILE), help="Active audit log (default: logs/audit.csv)")
+    parser.add_argument("--file", help="Verify a single segment / log file only")
+    parser.add_argument("--workers", type=int, default=AUDIT_VERIFY_WORKERS)
+    args = parser.parse_args()
+
+    paths = [Path(args.file)] if args.file else segment_files(args.log)
+    if not paths or not paths[0].exists():
+        print(f"No audit log at {args.file or args.log}")
+        return 1
+
+    start = time.perf_counter()
+    summary = verify_files(paths, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print("=" * 60)
+    print("NETRA AI - AUDIT LOG VERIFICATION")
+    print("=" * 60)
+    print(f"  files               {summary['files']}")
+    print(f"  rows verified       {summary['rows']:,}")
+    print(f"  checkpoints         {summary['checkpoints']} ({summary['unsigned_checkpoints']} unsigned)")
+    print(f"  rows after last ckpt {summary['unsigned_rows']:,}")
+    print(f"  time                {elapsed:.2f} s")
+    if not AUDIT_HMAC_KEY:
+        print("  WARNING: NETRA_AUDIT_KEY not set — checkpoint signatures not checked")
+    if summary['ok']:
+        print("  result              OK")
+    else:
+        err = summary['first_error']
+        where = f"row {err['row']:,}" if err['row'] is not None else "checkpoint"
+        print(f"  result              BROKEN in {err['file']} at {where} (byte {err['offset']:,})")
+        print(f"  reason              {err['reason']}")
+    print("=" * 60)
+    return 0 if summary['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
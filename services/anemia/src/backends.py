@@ -0,0 +1,184 @@
+"""
+backends.py - Selectable inference backends for the anemia classifier
+All backends take a float32 batch (N,64,64,3) in [0,1] and return (N,)
+probabilities of the Anemic class.
+Path: src/backends.py
+"""
+
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from config import (
+    MODEL_PATH, TFLITE_MODEL_PATH, ONNX_MODEL_PATH, INT8_MODEL_PATH, INFERENCE_BACKEND,
+    INPUT_SIZE, BATCH_MAX_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+
+class KerasBackend:
+    """Full TensorFlow / Keras model (required for GradCAM)."""
+
+    name = "keras"
+
+    def __init__(self, model_path=MODEL_PATH):
+        import tensorflow as tf
+
+        self.model_path = Path(model_path)
+        if not self.model_path.exists():
+            raise FileNotFoundError(f"Model not found at {self.model_path}")
+        self.model = tf.keras.models.load_model(str(self.model_path))
+
+        # Compiled, fixed-signature forward pass. The batch dimension is left
+        # open so every micro-batch size reuses the same traced graph.
+        self._forward = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec([None, INPUT_SIZE, INPUT_SIZE, 3], tf.float32)]
+        )
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        probs = self._forward(np.asarray(batch, dtype=np.float32))
+        return probs.numpy().astype(np.float32).reshape(-1)
+
+
+class TFLiteBackend:
+    """
+    TFLite interpreter. Uses the standalone `tflite_runtime` package when
+    installed so full TensorFlow is never imported; falls back to tf.lite.
+    Handles both float and fully-quantized (int8/uint8) models.
+
+    Resizing an interpreter re-plans its tensors, so instead of resizing per
+    call, batches are zero-padded to the next power of two (capped at
+    BATCH_MAX_SIZE) and each padded size gets its own allocated interpreter.
+    Micro-batching therefore needs at most log2(BATCH_MAX_SIZE) + 1 of them.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path=TFLITE_MODEL_PATH, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.model_path = Path(model_path)
+        if not self.model_path.exists():
+            raise FileNotFoundError(
+                f"TFLite model not found at {self.model_path} (run export_model.py first)"
+            )
+        self._Interpreter = Interpreter
+        self._num_threads = num_threads
+        interpreter = Interpreter(model_path=str(self.model_path), num_threads=num_threads)
+        interpreter.allocate_tensors()
+        self._input = interpreter.get_input_details()[0]
+        self._output = interpreter.get_output_details()[0]
+        # Interpreters hold mutable tensor buffers: one invocation at a time each
+        self._interpreters = {int(self._input['shape'][0]): (interpreter, threading.Lock())}
+        self._interpreters_lock = threading.Lock()
+
+    @property
+    def is_quantized(self) -> bool:
+        return self._input['dtype'] in (np.int8, np.uint8)
+
+    @property
+    def batch_sizes(self):
+        """Padded batch sizes that currently have an allocated interpreter."""
+        with self._interpreters_lock:
+            return sorted(self._interpreters)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.asarray(batch, dtype=np.float32)
+        n = batch.shape[0]
+        size = self._padded_size(n)
+        if size > n:
+            batch = np.concatenate([batch, np.zeros((size - n,) + batch.shape[1:], np.float32)])
+
+        interpreter, lock = self._interpreter_for(size, batch.shape)
+        with lock:
+            interpreter.set_tensor(self._input['index'], self._quantize(batch))
+            interpreter.invoke()
+            raw = interpreter.get_tensor(self._output['index'])
+        return self._dequantize(raw).reshape(-1)[:n]
+
+    @staticmethod
+    def _padded_size(n):
+        """Next power of two >= n, capped at BATCH_MAX_SIZE (larger batches run as-is)."""
+        return min(1 << max(0, n - 1).bit_length(), max(n, BATCH_MAX_SIZE))
+
+    def _interpreter_for(self, size, shape):
+        with self._interpreters_lock:
+            entry = self._interpreters.get(size)
+            if entry is None:
+                interpreter = self._Interpreter(model_path=str(self.model_path), num_threads=self._num_threads)
+                interpreter.resize_tensor_input(self._input['index'], list(shape))
+                interpreter.allocate_tensors()
+                entry = self._interpreters[size] = (interpreter, threading.Lock())
+                logger.info(f"TFLite: allocated interpreter for batch size {size}")
+            return entry
+
+    def _quantize(self, batch):
+        if not self.is_quantized:
+            return batch
+        scale, zero_point = self._input['quantization']
+        info = np.iinfo(self._input['dtype'])
+        q = np.round(batch / scale + zero_point)
+        return np.clip(q, info.min, info.max).astype(self._input['dtype'])
+
+    def _dequantize(self, raw):
+        if self._output['dtype'] not in (np.int8, np.uint8):
+            return raw.astype(np.float32)
+        scale, zero_point = self._output['quantization']
+        return (raw.astype(np.float32) - zero_point) * scale
+
+
+class TFLiteInt8Backend(TFLiteBackend):
+    """INT8 model published by quantize.py (only written if it passed the accuracy gate)."""
+
+    name = "tflite-int8"
+
+    def __init__(self, model_path=INT8_MODEL_PATH, num_threads=None):
+        super().__init__(model_path, num_threads=num_threads)
+
+
+class ONNXBackend:
+    """ONNX Runtime (CPU) session."""
+
+    name = "onnx"
+
+    def __init__(self, model_path=ONNX_MODEL_PATH):
+        import onnxruntime as ort
+
+        self.model_path = Path(model_path)
+        if not self.model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found at {self.model_path} (run export_model.py --onnx first)"
+            )
+        self.session = ort.InferenceSession(str(self.model_path), providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.asarray(batch, dtype=np.float32)
+        (probs,) = self.session.run(None, {self._input_name: batch})
+        return np.asarray(probs, dtype=np.float32).reshape(-1)
+
+
+BACKENDS = {
+    KerasBackend.name: KerasBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    TFLiteInt8Backend.name: TFLiteInt8Backend,
+    ONNXBackend.name: ONNXBackend,
+}
+
+
+def create_backend(name=INFERENCE_BACKEND, model_path=None):
+    """Instantiate a backend by name ('keras', 'tflite', 'tflite-int8', 'onnx')."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Options: {sorted(BACKENDS)}")
+    backend_cls = BACKENDS[name]
+    backend = backend_cls(model_path) if model_path else backend_cls()
+    logger.info(f"Inference backend: {name} ({backend.model_path})")
+    return backend
@@ -0,0 +1,193 @@
+"""
+batcher.py - Dynamic micro-batching for model inference
+Collects single-sample requests from concurrent callers for a short window,
+runs ONE batched forward pass and scatters the results back.
+Path: src/batcher.py
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from config import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BatcherClosed(RuntimeError):
+    """Raised for items submitted to (or left in) a closed MicroBatcher."""
+
+
+class MicroBatcher:
+    """
+    Groups items submitted from many threads/coroutines into batches.
+
+    A batch is dispatched as soon as it holds `max_batch_size` items or the
+    first item in it has waited `max_wait_ms`, whichever comes first.
+    `process_batch` receives a list of items and must return a list of
+    results in the same order. After close(), submit() raises
+    BatcherClosed; items already queued are still processed.
+    """
+
+    def __init__(self, process_batch, max_batch_size=BATCH_MAX_SIZE,
+                 max_wait_ms=BATCH_MAX_WAIT_MS, name="inference"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._submit_lock = threading.Lock()     # orders submit() against close()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._failed_batches = 0
+        self._failed_items = 0
+        self._size_histogram = Counter()
+        self._busy_seconds = 0.0
+
+        self._thread = threading.Thread(
+            target=self._worker, name=f"{name}-batcher", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"MicroBatcher '{name}' started "
+            f"(max_batch_size={self.max_batch_size}, max_wait_ms={max_wait_ms})"
+        )
+
+    # =====================================================================
+    #  PUBLIC API
+    # =====================================================================
+
+    def submit(self, item) -> Future:
+        """Queue a single item; returns a Future resolved with its result."""
+        future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise BatcherClosed(f"MicroBatcher '{self.name}' is closed")
+            self._queue.put((item, future))
+        return future
+
+    def run(self, item, timeout=None):
+        """Blocking helper for thread callers."""
+        return self.submit(item).result(timeout=timeout)
+
+    async def run_async(self, item):
+        """Awaitable helper for coroutine callers."""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def stats(self) -> dict:
+        """
+        Per-batch occupancy counters for tuning size / wait window. Failed
+        batches occupied the model too, so they are included (and also
+        counted on their own).
+        """
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            return {
+                'name': self.name,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': batches,
+                'items': items,
+                'failed_batches': self._failed_batches,
+                'failed_items': self._failed_items,
+                'queue_depth': self._queue.qsize(),
+                'mean_batch_size': items / batches if batches else 0.0,
+                'mean_occupancy': items / (batches * self.max_batch_size) if batches else 0.0,
+                'mean_batch_ms': 1000.0 * self._busy_seconds / batches if batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._size_histogram.items())),
+            }
+
+    def close(self, timeout=5.0):
+        """Stop the worker after processing items already queued (idempotent)."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+
+    # =====================================================================
+    #  WORKER
+    # =====================================================================
+
+    def _worker(self):
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+
+            # Wait for company until the batch is full or the window closes
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._dispatch(batch)
+
+        # Nothing is accepted after _STOP, but never leave a caller blocked
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP and entry[1].set_running_or_notify_cancel():
+                entry[1].set_exception(BatcherClosed(f"MicroBatcher '{self.name}' is closed"))
+
+    def _dispatch(self, batch):
+        # Drop items whose caller already gave up
+        live = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+        if not live:
+            return
+
+        start = time.perf_counter()
+        try:
+            results = self.process_batch([item for item, _ in live])
+            if len(results) != len(live):
+                raise RuntimeError(
+                    f"process_batch returned {len(results)} results for {len(live)} items"
+                )
+        except Exception as e:
+            self._record(len(live), time.perf_counter() - start, failed=True)
+            logger.error(f"[{self.name}] batch of {len(live)} failed: {e}", exc_info=True)
+            for _, fut in live:
+                fut.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        self._record(len(live), elapsed)
+
+        for (_, fut), res in zip(live, results):
+            fut.set_result(res)
+
+        logger.debug(
+            f"[{self.name}] batch {len(live)}/{self.max_batch_size} "
+            f"({len(live) / self.max_batch_size:.0%} occupancy) in {elapsed * 1000:.1f} ms"
+        )
+
+    def _record(self, size, elapsed, failed=False):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._size_histogram[size] += 1
+            self._busy_seconds += elapsed
+            if failed:
+                self._failed_batches += 1
+                self._failed_items += size
@@ -0,0 +1,81 @@
+"""
+benchmark_data_loader.py - Training input throughput: ImageDataGenerator vs tf.data
+Iterates the training split with the legacy create_generators() and with
+create_datasets() (parallel decode, cache, batched augmentation, prefetch)
+and reports images/sec. tf.data is timed for the first epoch (decode +
+fill cache) and the following ones (served from the cache).
+Path: src/benchmark_data_loader.py
+
+Usage:
+    python benchmark_data_loader.py                    # data/train, 2 epochs
+    python benchmark_data_loader.py --epochs 3 --cache /tmp/netra_cache
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from config import TRAIN_DIR, DATA_CACHE
+from data_loader import DataLoader
+
+
+def time_generator(loader, epochs):
+    """Images/sec per epoch of the ImageDataGenerator path."""
+    train_gen, _ = loader.create_generators()
+    steps = len(train_gen)
+    rates = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        images = 0
+        for i in range(steps):
+            x, _ = train_gen[i]
+            images += len(x)
+        rates.append(images / (time.perf_counter() - start))
+        train_gen.on_epoch_end()
+    return rates
+
+
+def time_dataset(loader, epochs, cache):
+    """Images/sec per epoch of the tf.data path."""
+    train_ds, _, _, _ = loader.create_datasets(cache=cache)
+    rates = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        images = 0
+        for x, _ in train_ds:
+            images += int(x.shape[0])
+        rates.append(images / (time.perf_counter() - start))
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the training input pipelines")
+    parser.add_argument("--train-dir", default=str(TRAIN_DIR))
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--cache", default=DATA_CACHE, help='"memory", a file path prefix, or "" for none')
+    args = parser.parse_args()
+
+    loader = DataLoader()
+    loader.train_dir = Path(args.train_dir)
+    loader.val_dir = Path(args.train_dir)     # only the training split is timed
+    if not loader.train_dir.exists():
+        print(f"No training data at {loader.train_dir}")
+        return 1
+
+    generator_rates = time_generator(loader, args.epochs)
+    dataset_rates = time_dataset(loader, args.epochs, args.cache)
+
+    print("=" * 60)
+    print("NETRA AI - TRAINING INPUT PIPELINE BENCHMARK")
+    print("=" * 60)
+    for epoch, (gen, ds) in enumerate(zip(generator_rates, dataset_rates), 1):
+        print(f"  epoch {epoch}             generator {gen:,.0f} img/s, tf.data {ds:,.0f} img/s ({ds / gen:.1f}x)")
+    print(f"  tf.data cache       {args.cache or 'off'}")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
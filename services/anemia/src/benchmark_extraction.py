@@ -0,0 +1,190 @@
+"""
+benchmark_extraction.py - Micro-benchmark of the ROI refinement / validation step
+Compares the previous implementation (separate _refine_with_color_mask,
+_validate_conjunctiva and _tight_crop, reproduced below as the reference)
+with the fused EyeExtractor._analyze_roi + _crop_tissue, checks that both
+produce the same tissue crop, and reports per-ROI timings.
+Path: src/benchmark_extraction.py
+
+Usage:
+    python benchmark_extraction.py                        # synthetic ROIs
+    python benchmark_extraction.py --roi-dir outputs/intermediate_rois
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent))
+from eye_extractor import EyeExtractor
+
+ROI_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+# =====================================================================
+#  REFERENCE (pre-fusion) IMPLEMENTATION
+# =====================================================================
+
+def reference_refine(ex, roi, initial_mask):
+    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+    mask_hsv = cv2.bitwise_or(cv2.inRange(hsv, np.array([0, 50, 60]), np.array([15, 255, 255])),
+                              cv2.inRange(hsv, np.array([160, 50, 60]), np.array([179, 255, 255])))
+    lab = cv2.cvtColor(roi, cv2.COLOR_BGR2Lab)
+    _, mask_lab = cv2.threshold(lab[:, :, 1], 130, 255, cv2.THRESH_BINARY)
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    _, bright_mask = cv2.threshold(gray, ex.dark_pixel_threshold + 5, 255, cv2.THRESH_BINARY)
+
+    refined = cv2.bitwise_and(mask_hsv, mask_lab)
+    refined = cv2.bitwise_and(refined, bright_mask)
+    refined = cv2.bitwise_and(refined, initial_mask)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    refined = cv2.morphologyEx(refined, cv2.MORPH_OPEN, kernel, iterations=1)
+
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(refined, connectivity=8)
+    if num_labels < 2:
+        return refined
+    best_label, max_score = -1, -1
+    for i in range(1, num_labels):
+        area = stats[i, cv2.CC_STAT_AREA]
+        w_blob, h_blob = stats[i, cv2.CC_STAT_WIDTH], stats[i, cv2.CC_STAT_HEIGHT]
+        aspect = w_blob / h_blob if h_blob > 0 else 1
+        if area > 100:
+            score = area * min(aspect, 5.0)
+            if score > max_score:
+                max_score, best_label = score, i
+    final_mask = np.zeros_like(refined)
+    if best_label != -1:
+        final_mask[labels == best_label] = 255
+    return final_mask
+
+
+def reference_validate(ex, segmented, mask):
+    gray = cv2.cvtColor(segmented, cv2.COLOR_BGR2GRAY)
+    tissue_pixels = gray[mask > 0]
+    if len(tissue_pixels) == 0:
+        return False
+    coords = cv2.findNonZero(mask)
+    if coords is not None:
+        _, _, w, h = cv2.boundingRect(coords)
+        if w < ex.min_roi_width or h < ex.min_roi_height:
+            return False
+    if np.sum(tissue_pixels < ex.dark_pixel_threshold) / len(tissue_pixels) > ex.max_dark_ratio:
+        return False
+    if np.sum(tissue_pixels > ex.overexposed_threshold) / len(tissue_pixels) > ex.max_overexposed_ratio:
+        return False
+    return len(tissue_pixels) >= 200
+
+
+def reference_tight_crop(segmented):
+    gray = cv2.cvtColor(segmented, cv2.COLOR_BGR2GRAY)
+    mask_pts = np.column_stack(np.where(gray > 5))
+    if len(mask_pts) == 0:
+        return None
+    y_min, x_min = mask_pts.min(axis=0)
+    y_max, x_max = mask_pts.max(axis=0)
+    return segmented[y_min:y_max + 1, x_min:x_max + 1]
+
+
+def reference_step(ex, roi, mask):
+    mask = reference_refine(ex, roi, mask)
+    segmented = cv2.bitwise_and(roi, roi, mask=mask)
+    if not reference_validate(ex, segmented, mask):
+        return None
+    return reference_tight_crop(segmented)
+
+
+def fused_step(ex, roi, mask):
+    stats = ex._analyze_roi(roi, mask)
+    if stats['failure']:
+        return None
+    return ex._crop_tissue(roi, stats)
+
+
+# =====================================================================
+#  INPUTS
+# =====================================================================
+
+def synthetic_rois(count=50, seed=0):
+    """Skin-toned crops with a noisy pink crescent, sizes typical of real ROIs."""
+    rng = np.random.default_rng(seed)
+    rois = []
+    for _ in range(count):
+        w = int(rng.integers(80, 512))
+        h = max(40, int(w * rng.uniform(0.3, 0.6)))
+        roi = np.empty((h, w, 3), np.uint8)
+        roi[:] = (rng.integers(90, 140), rng.integers(120, 170), rng.integers(170, 220))  # skin (BGR)
+        crescent = np.zeros((h, w), np.uint8)
+        cv2.ellipse(crescent, (w // 2, int(h * 0.2)), (int(w * 0.4), int(h * 0.6)), 0, 0, 180, 255, -1)
+        roi[crescent > 0] = (rng.integers(60, 110), rng.integers(50, 90), rng.integers(170, 230))  # tissue
+        noise = rng.normal(0, 12, roi.shape)
+        rois.append(np.clip(roi + noise, 0, 255).astype(np.uint8))
+    return rois
+
+
+def load_rois(directory):
+    paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in ROI_EXTENSIONS)
+    return [img for img in (cv2.imread(str(p)) for p in paths) if img is not None]
+
+
+def crescent_mask(roi):
+    """Initial mask as drawn by the Haar strategy."""
+    rh, rw = roi.shape[:2]
+    mask = np.zeros((rh, rw), dtype=np.uint8)
+    cv2.ellipse(mask, (rw // 2, int(rh * 0.2)), (int(rw * 0.45), int(rh * 0.7)), 0, 0, 180, 255, -1)
+    return mask
+
+
+# =====================================================================
+#  MAIN
+# =====================================================================
+
+def time_step(step, ex, rois, masks, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for roi, mask in zip(rois, masks):
+            step(ex, roi, mask)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(rois))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fused ROI analysis against the reference implementation")
+    parser.add_argument("--roi-dir", help="Directory of ROI crops (default: synthetic ROIs)")
+    parser.add_argument("--count", type=int, default=50, help="Synthetic ROIs to generate")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rois = load_rois(args.roi_dir) if args.roi_dir else synthetic_rois(args.count)
+    if not rois:
+        print(f"No ROIs found in {args.roi_dir}")
+        return 1
+    masks = [crescent_mask(roi) for roi in rois]
+    ex = EyeExtractor()
+
+    mismatches = 0
+    for roi, mask in zip(rois, masks):
+        ref, new = reference_step(ex, roi, mask), fused_step(ex, roi, mask)
+        if (ref is None) != (new is None) or (ref is not None and not np.array_equal(ref, new)):
+            mismatches += 1
+
+    ref_ms = time_step(reference_step, ex, rois, masks, args.repeats)
+    new_ms = time_step(fused_step, ex, rois, masks, args.repeats)
+    mean_px = np.mean([roi.shape[0] * roi.shape[1] for roi in rois])
+
+    print("=" * 60)
+    print("NETRA AI - ROI ANALYSIS BENCHMARK")
+    print("=" * 60)
+    print(f"  ROIs                {len(rois)} (mean {mean_px / 1000:.0f}k px)")
+    print(f"  reference           {ref_ms:.3f} ms / ROI")
+    print(f"  fused               {new_ms:.3f} ms / ROI")
+    print(f"  speedup             {ref_ms / new_ms:.2f}x")
+    print(f"  output mismatches   {mismatches}")
+    print("=" * 60)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+benchmark_gradcam.py - Latency of a heatmap request: two passes vs one fused pass
+Compares the previous flow (backend inference, then a second forward +
+backward pass for GradCAM) with GradCAM.infer(), which takes the probability
+and the heatmap from one pass, at batch size 1 and a full micro-batch.
+Checks that both give the same probabilities and heatmaps.
+Path: src/benchmark_gradcam.py
+
+Usage:
+    python benchmark_gradcam.py                         # synthetic inputs
+    python benchmark_gradcam.py --crop-dir outputs/cropped --repeats 50
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent))
+from backends import KerasBackend
+from config import MODEL_PATH, INPUT_SIZE, BATCH_MAX_SIZE
+
+CROP_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+
+# =====================================================================
+#  INPUTS
+# =====================================================================
+
+def synthetic_inputs(count=64, seed=0):
+    """Pink / pale tissue-like crops in [0, 1], like _preprocess_tissue output."""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform([0.55, 0.25, 0.3], [0.9, 0.5, 0.55], (count, 1, 1, 3))
+    noise = rng.normal(0, 0.05, (count, INPUT_SIZE, INPUT_SIZE, 3))
+    return np.clip(base + noise, 0, 1).astype(np.float32)
+
+
+def load_crops(directory):
+    """Saved crops (any size, BGR on disk) -> (N,64,64,3) RGB float32 in [0, 1]."""
+    paths = sorted(p for p in Path(directory).rglob("*") if p.suffix.lower() in CROP_EXTENSIONS)
+    crops = []
+    for p in paths:
+        img = cv2.imread(str(p))
+        if img is None:
+            continue
+        img = cv2.resize(img, (INPUT_SIZE, INPUT_SIZE))
+        crops.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0)
+    return np.stack(crops) if crops else None
+
+
+# =====================================================================
+#  MAIN
+# =====================================================================
+
+def two_pass(backend, gradcam, batch):
+    return backend.predict(batch), gradcam.generate_heatmaps(batch)
+
+
+def fused(backend, gradcam, batch):
+    out = gradcam.infer(batch)
+    return out['probability'], out['heatmaps']
+
+
+def time_mode(mode, backend, gradcam, inputs, batch_size, repeats):
+    """Mean ms per image."""
+    batches = [inputs[i:i + batch_size] for i in range(0, len(inputs), batch_size)]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            mode(backend, gradcam, batch)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(inputs))
+
+
+def main():
+    from gradcam import GradCAM
+
+    parser = argparse.ArgumentParser(description="Benchmark fused inference + GradCAM against two passes")
+    parser.add_argument("--model", default=str(MODEL_PATH))
+    parser.add_argument("--crop-dir", help="Directory of saved crops (default: synthetic inputs)")
+    parser.add_argument("--count", type=int, default=64, help="Synthetic inputs to generate")
+    parser.add_argument("--batch-size", type=int, default=BATCH_MAX_SIZE)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    inputs = load_crops(args.crop_dir) if args.crop_dir else synthetic_inputs(args.count)
+    if inputs is None:
+        print(f"No crops found in {args.crop_dir}")
+        return 1
+
+    backend = KerasBackend(args.model)
+    gradcam = GradCAM(backend.model)
+    sizes = sorted({1, args.batch_size})
+    for size in sizes:
+        backend.predict(inputs[:size])
+    gradcam.warmup(batch_sizes=sizes)
+
+    ref_probs, ref_maps = two_pass(backend, gradcam, inputs)
+    new_probs, new_maps = fused(backend, gradcam, inputs)
+    max_prob_diff = float(np.max(np.abs(ref_probs - new_probs)))
+    map_mismatches = int(np.sum(np.any(ref_maps != new_maps, axis=(1, 2))))
+
+    print("=" * 60)
+    print("NETRA AI - FUSED GRADCAM BENCHMARK")
+    print("=" * 60)
+    print(f"  inputs              {len(inputs)}")
+    for size in sizes:
+        ref_ms = time_mode(two_pass, backend, gradcam, inputs, size, args.repeats)
+        new_ms = time_mode(fused, backend, gradcam, inputs, size, args.repeats)
+        print(f"  batch {size:<3}           two-pass {ref_ms:.3f} ms / image, fused {new_ms:.3f} ms / image "
+              f"(saved {ref_ms - new_ms:.3f} ms, {ref_ms / new_ms:.2f}x)")
+    print(f"  max |prob diff|     {max_prob_diff:.2e}")
+    print(f"  heatmap mismatches  {map_mismatches}")
+    print("=" * 60)
+    return 1 if max_prob_diff > 1e-5 or map_mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
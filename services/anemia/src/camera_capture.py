@@ -119,6 +119,13 @@ class CameraCaptureApp:
                                   padx=20, pady=8, state=tk.DISABLED)
         self.stop_btn.pack(side=tk.LEFT, padx=5)
         
+        # Heatmaps are only generated when asked for
+        self.explain_btn = tk.Button(button_frame, text="Show Heatmap", 
+                                     command=self.explain_result,
+                                     bg='#8e44ad', fg='white', font=("Arial", 11, "bold"),
+                                     padx=20, pady=8, state=tk.DISABLED)
+        self.explain_btn.pack(side=tk.LEFT, padx=5)
+        
         # Instructions for proper capture
         tip_frame = tk.LabelFrame(self.root, text="Tips for Best Results", 
                                   font=("Arial", 10), bg='#f0f0f0')
@@ -214,7 +221,7 @@ class CameraCaptureApp:
         """Run prediction in background"""
         try:
             # Pass save_original=False because we already saved it manually
-            result = self.pipeline.predict_from_file(str(image_path), save_heatmap=True, save_original=False)
+            result = self.pipeline.predict_from_file(str(image_path), save_heatmap=False, save_original=False)
             
             # Update UI
             self.root.after(0, lambda: self.display_result(result))
@@ -228,6 +235,9 @@ class CameraCaptureApp:
         """Display prediction results"""
         self.result_text.delete(1.0, tk.END)
         
+        self.last_result = result
+        self.explain_btn.config(state=tk.NORMAL if result['success'] else tk.DISABLED)
+        
         if not result['success']:
             self.result_text.insert(tk.END, f"Error: {result['error']}")
             return
@@ -254,14 +264,32 @@ class CameraCaptureApp:
         self.result_text.insert(tk.END, "Image saved to:\n")
         self.result_text.insert(tk.END, f"{result.get('input_image_path', 'N/A')}\n\n")
         
-        self.result_text.insert(tk.END, "Heatmap saved to:\n")
-        self.result_text.insert(tk.END, f"{result.get('heatmap_path', 'N/A')}\n")
+        self.result_text.insert(tk.END, "Heatmap:\n")
+        self.result_text.insert(tk.END, f"{result.get('heatmap_path') or 'press Show Heatmap'}\n")
         
         # Configure text tags
         self.result_text.tag_configure("bold", font=("Arial", 11, "bold"))
         self.result_text.tag_configure("red", foreground="red", font=("Arial", 11, "bold"))
         self.result_text.tag_configure("green", foreground="green", font=("Arial", 11, "bold"))
     
+    def explain_result(self):
+        """Generate the GradCAM heatmap of the last result (in background)"""
+        if not self.last_result or not self.last_result.get('prediction_id'):
+            return
+        prediction_id = self.last_result['prediction_id']
+        self.explain_btn.config(state=tk.DISABLED)
+        self.status_label.config(text="Generating heatmap...", fg="#e67e22")
+        
+        def run():
+            explanation = self.pipeline.explain(prediction_id)
+            if explanation['success']:
+                self.root.after(0, lambda: self.result_text.insert(tk.END, f"{explanation['heatmap_path']}\n"))
+                self.root.after(0, lambda: self.status_label.config(text="Heatmap ready.", fg="#2980b9"))
+            else:
+                self.root.after(0, lambda: self.status_label.config(text=explanation['error'], fg="red"))
+        
+        threading.Thread(target=run, daemon=True).start()
+    
     def stop_camera(self):
         """Stop the camera"""
         self.is_running = False
@@ -2,6 +2,7 @@
 config.py - Configuration settings for NetraAI
 """
 
+import os
 from pathlib import Path
 
 # ===== Base Directories =====
@@ -14,28 +15,109 @@ OUTPUT_DIR = BASE_DIR / 'outputs'                # new root for all outputs
 ORIGINALS_DIR = OUTPUT_DIR / 'originals'         # user original images
 CROPPED_DIR = OUTPUT_DIR / 'cropped'             # extracted 64x64 conjunctiva
 HEATMAPS_DIR = OUTPUT_DIR / 'heatmaps'           # GradCAM visualizations
+TISSUE_DIR = OUTPUT_DIR / 'tissue'               # lossless model input kept for on-demand heatmaps
 
 # Create directories automatically (optional, but convenient)
 ORIGINALS_DIR.mkdir(parents=True, exist_ok=True)
 CROPPED_DIR.mkdir(parents=True, exist_ok=True)
 HEATMAPS_DIR.mkdir(parents=True, exist_ok=True)
+TISSUE_DIR.mkdir(parents=True, exist_ok=True)
 
 # ===== Model Settings =====
 MODEL_PATH = MODELS_DIR / 'best_enhanced.h5'
 INPUT_SIZE = 64
 USE_DIP = False
 LAST_CONV_LAYER = 'conv2d_2'
+MODEL_VERSION = "v1.0.0"     # recorded in results / audit log and part of the cache key
+
+# ===== Inference Backend =====
+# "keras" (full TF), "tflite", "tflite-int8" or "onnx"
+# Export artifacts with export_model.py (float) / quantize.py (INT8)
+INFERENCE_BACKEND = os.getenv("NETRA_BACKEND", "keras")
+TFLITE_MODEL_PATH = MODELS_DIR / 'best_enhanced.tflite'
+ONNX_MODEL_PATH = MODELS_DIR / 'best_enhanced.onnx'
+PARITY_TOLERANCE = 1e-4   # max |Δprob| allowed between an exported backend and Keras
+
+# ===== INT8 Quantization (quantize.py) =====
+INT8_MODEL_PATH = MODELS_DIR / 'best_enhanced_int8.tflite'
+QUANT_CALIBRATION_SAMPLES = 200      # representative images drawn from VAL_DIR
+QUANT_MIN_AGREEMENT = 0.98           # min final_diagnosis / low-confidence-band agreement with float
+QUANT_MAX_MEAN_ABS_DIFF = 0.02       # max mean |Δprob| vs float model
+
+# ===== Training Data =====
+DATA_DIR = BASE_DIR / 'data'
+TRAIN_DIR = DATA_DIR / 'train'   # subfolders: Non-Anemic/, Anemic/
+VAL_DIR = DATA_DIR / 'val'
+IMG_SIZE = INPUT_SIZE
+BATCH_SIZE = 32
+EPOCHS = 100
+DATA_LOADER = os.getenv("NETRA_DATA_LOADER", "tfdata")   # "tfdata" or "generator" (legacy ImageDataGenerator)
+DATA_CACHE = os.getenv("NETRA_DATA_CACHE", "memory")     # "memory", a file path prefix, or "" for no cache
 
 # Legacy support
 GRADCAM_DIR = HEATMAPS_DIR
 
+# ===== Inference Micro-Batching =====
+BATCH_ENABLED = True      # group concurrent requests into one forward pass
+BATCH_MAX_SIZE = 16       # max tensors per forward pass
+BATCH_MAX_WAIT_MS = 10    # how long the first tensor waits for company (ms)
+
+# ===== Admission Control =====
+ADMISSION_RATE_PER_CLIENT = 5.0     # sustained requests/sec per client
+ADMISSION_BURST = 10                # token bucket size per client
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("NETRA_MAX_CONCURRENCY", os.cpu_count() or 2))  # predictions in flight
+ADMISSION_QUEUE_SIZE = 64           # requests allowed to wait for a slot
+ADMISSION_QUEUE_TIMEOUT = 10.0      # max seconds a request may wait
+ADMISSION_MAX_CLIENTS = 10000       # token buckets kept (LRU)
+
+# ===== Inference Executor =====
+# "thread": one shared pipeline on a thread pool (TF/OpenCV release the GIL)
+# "process": supervised pool of worker processes, one pipeline each
+EXECUTOR_MODE = os.getenv("NETRA_EXECUTOR_MODE", "thread")
+EXECUTOR_WORKERS = int(os.getenv("NETRA_WORKERS", "0")) or ADMISSION_MAX_CONCURRENCY
+PREDICT_TIMEOUT = float(os.getenv("NETRA_PREDICT_TIMEOUT", "30"))  # seconds before a request is abandoned (504)
+
+# ===== Worker Pool (EXECUTOR_MODE = "process") =====
+WORKER_HEALTH_INTERVAL = float(os.getenv("NETRA_WORKER_HEALTH_INTERVAL", "5"))   # seconds between pings
+WORKER_HEALTH_TIMEOUT = float(os.getenv("NETRA_WORKER_HEALTH_TIMEOUT", "60"))    # silent this long = hung
+WORKER_START_TIMEOUT = float(os.getenv("NETRA_WORKER_START_TIMEOUT", "180"))     # model load budget
+WORKER_RESTART_BACKOFF = 5.0         # wait before the first respawn, doubled per consecutive failure...
+WORKER_RESTART_BACKOFF_MAX = 300.0   # ...up to this
+WORKER_MAX_RESTARTS = 5              # consecutive failures before a worker is left down
+WORKER_STABLE_SECONDS = 60.0         # ready this long = failure count reset
+
 # ===== Extraction Settings =====
 EXTRACTION_SIZE_THRESHOLD = 300
 AUTO_SKIP_EXTRACTION = True
 
+# Pre-checks run once per image before any extraction strategy. Inputs that
+# fail them are rejected immediately instead of walking the whole cascade.
+EXTRACTION_ANALYSIS_SIZE = 256       # longest side of the downscaled copy used for quality metrics
+EXTRACTION_MIN_BRIGHTNESS = 15       # mean gray below this = too dark
+EXTRACTION_MAX_BRIGHTNESS = 240      # mean gray above this = washed out
+EXTRACTION_MIN_CONTRAST = 2.0        # gray std below this = blank / uniform frame
+EXTRACTION_MIN_SHARPNESS = 2.0       # Laplacian variance below this = hopelessly blurred
+EXTRACTION_CLOSEUP_ASPECT = 1.3      # landscape frames this wide try close-up strategies (Haar) first
+
+# Resolution pyramid: detectors never see more than these sizes, whatever the
+# upload size; boxes / landmarks are mapped back and the conjunctiva is
+# cropped from the full-resolution image.
+EXTRACTION_WORK_SIZE = 640           # longest side of the copy Haar / FaceMesh / edges run on
+EXTRACTION_PAD_CANVAS = 1024         # side of the black canvas used to help FaceMesh on close-ups
+EXTRACTION_MAX_ROI_SIZE = 512        # longest side of the conjunctiva crop before masking
+
+# EyeExtractor.extract_many (batch jobs): worker threads, each with its own
+# detectors, and at most EXTRACT_MAX_PENDING images decoded / in flight
+EXTRACT_WORKERS = int(os.getenv("NETRA_EXTRACT_WORKERS", "0")) or (os.cpu_count() or 1)
+EXTRACT_MAX_PENDING = 2 * EXTRACT_WORKERS
+
 # Class names
 CLASS_NAMES = ['Non-Anemic', 'Anemic']
 
+# ===== Decision Rule =====
+DECISION_THRESHOLD = 0.5             # prob > threshold => Anemic
+LOW_CONFIDENCE_BAND = (0.45, 0.55)   # reported as INCONCLUSIVE
+
 # ===== Severity Thresholds =====
 SEVERITY_THRESHOLDS = {
     'mild': 0.70,
@@ -57,7 +139,80 @@ PILOT_QUORUM = 200    # Minimum total cases before reporting pilot metrics
 ANEMIA_QUORUM = 50     # Minimum confirmed anemia cases before reporting
 DRIFT_ALERT_THRESHOLD = 0.05  # 5% deviation threshold for drift alerts
 
+# ===== Prediction Cache =====
+# Results keyed by (image SHA-256, eye, model version + backend); retried
+# uploads of the same image skip extraction and inference.
+CACHE_ENABLED = os.getenv("NETRA_CACHE", "1") == "1"
+CACHE_MAX_ENTRIES = 2048
+CACHE_MAX_BYTES = 8 * 1024 * 1024    # serialized size of the in-memory results
+CACHE_TTL_SECONDS = 3600
+CACHE_DISK_DIR = os.getenv("NETRA_CACHE_DIR") or None   # e.g. outputs/cache; survives restarts
+
+# ===== Image Fingerprint =====
+# Images are identified by the SHA-256 of the uploaded bytes, hashed while
+# the upload is read; a dHash is logged for near-duplicate search.
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+PERCEPTUAL_HASH_ENABLED = True
+
 # ===== Auto-Save Settings =====
 SAVE_ORIGINAL = True      # save a copy of the input image
 SAVE_CROPPED = True       # save the 64x64 cropped conjunctiva
-SAVE_HEATMAP = True       # save GradCAM heatmap (if generated)
+SAVE_HEATMAP = False      # heatmaps are generated on demand (GET /explain/{prediction_id})
+
+# ===== GradCAM =====
+# With the keras backend, a request that saves a heatmap takes its probability
+# from the GradCAM pass instead of running the model a second time.
+FUSED_GRADCAM = True
+# Clinician review (ExplanationEngine): layers and variants computed together
+EXPLAIN_LAYERS = None                # None = every Conv2D layer
+EXPLAIN_VARIANTS = ('gradcam', 'gradcam++')
+# On-demand explanations (GET /explain/{prediction_id}) are opt-in: when enabled,
+# a prediction that saves no heatmap also stores its 64x64 tissue crop (lossless,
+# ~10 KB: one PNG write + manifest rows per request) so the heatmap can be
+# generated when someone asks, and GradCAM is traced at startup.
+EXPLAIN_ENABLED = os.getenv("NETRA_EXPLAIN", "0") == "1"
+PERSIST_TISSUE = EXPLAIN_ENABLED
+EXPLAIN_WAIT_SECONDS = 2.0           # wait for a tissue crop still in the write queue
+
+# ===== Artifact Writer =====
+# Saved images are encoded and written by a background thread
+ARTIFACT_FORMAT = ".jpg"             # originals and crops (".jpg" or ".png")
+HEATMAP_FORMAT = ".png"
+ARTIFACT_JPEG_QUALITY = 90
+ARTIFACT_PNG_COMPRESSION = 1         # 0-9; low = faster encode, larger file
+ARTIFACT_QUEUE_SIZE = 256            # images waiting to be written
+ARTIFACT_QUEUE_POLICY = os.getenv("NETRA_ARTIFACT_POLICY", "drop")   # "drop" or "block" when full
+ARTIFACT_BLOCK_TIMEOUT = 5.0         # seconds a request may wait for space with "block"
+
+# ===== Artifact Store =====
+# Saved images are content-addressed: <kind dir>/ab/cd/<sha256><ext>
+ARTIFACT_MANIFEST = OUTPUT_DIR / 'manifest.sqlite'   # scan / session -> image hashes
+ARTIFACT_RETENTION_DAYS = 90         # artifact_store.py gc: drop references older than this
+ARTIFACT_MAX_TOTAL_GB = 20           # then evict least recently used images above this size
+ARTIFACT_GC_GRACE_SECONDS = 3600     # gc leaves blobs used this recently alone (files may still be queued)
+
+# ===== Audit Log =====
+# Rows are queued in memory and appended by one writer thread per process
+AUDIT_QUEUE_SIZE = 10000             # rows waiting to be written; log_inference blocks when full
+AUDIT_FLUSH_ROWS = 64                # write a batch once this many rows are queued...
+AUDIT_FLUSH_INTERVAL = 1.0           # ...or when the oldest queued row is this many seconds old
+AUDIT_FSYNC_INTERVAL = float(os.getenv("NETRA_AUDIT_FSYNC", "5.0"))   # seconds between fsyncs (0 = every batch)
+AUDIT_CHECKPOINT_BYTES = 1024 * 1024   # append a signed checkpoint every ~1 MB of rows (~3-4k rows)
+AUDIT_HMAC_KEY = os.getenv("NETRA_AUDIT_KEY")   # checkpoint signing key; keep it off the log host
+AUDIT_VERIFY_WORKERS = os.cpu_count() or 1
+AUDIT_ROTATE_BYTES = 64 * 1024 * 1024  # close the active log into logs/segments/ at this size...
+AUDIT_ROTATE_DAILY = True              # ...and when the first row is from an earlier (UTC) day
+AUDIT_BLOOM_FP_RATE = 0.01             # false-positive rate of each segment's image-hash filter
+
+# ===== Audit Analytics (audit_analytics.py) =====
+ANALYTICS_DIR = OUTPUT_DIR / 'analytics'    # Parquet copy of the audit rows + job state
+ANALYTICS_WINDOW_DAYS = 7            # recent window compared against...
+ANALYTICS_BASELINE_DAYS = 28         # ...the days just before it
+ANALYTICS_HIST_BINS = 20             # probability histogram used for drift
+ANALYTICS_MIN_ROWS = 100             # no drift alerts until both windows have this many rows
+
+# ===== Startup Warmup =====
+# Dummy batches run before the service reports ready, so the first real
+# request does not pay graph tracing / allocation costs.
+WARMUP_BATCH_SIZES = (1, BATCH_MAX_SIZE)
+WARMUP_GRADCAM = SAVE_HEATMAP or EXPLAIN_ENABLED   # also trace the batched GradCAM heatmap function
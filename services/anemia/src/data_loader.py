@@ -1,9 +1,122 @@
 """
 NetraAI - Fixed Data Loader
+create_datasets() is the tf.data input pipeline used for training: files are
+listed once, decoded and resized in parallel, the decoded 64x64 images are
+cached (memory or disk), augmentation runs on whole batches as one
+projective-transform op, and batches are prefetched. create_generators()
+keeps the legacy ImageDataGenerator path.
 """
+import math
+
+import cv2
+import numpy as np
 import tensorflow as tf
+from pathlib import Path
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from config import TRAIN_DIR, VAL_DIR, IMG_SIZE, BATCH_SIZE
+from config import TRAIN_DIR, VAL_DIR, IMG_SIZE, BATCH_SIZE, CLASS_NAMES, DATA_CACHE
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+# Same ranges as the ImageDataGenerator augmentation in create_generators()
+AUGMENT_ROTATION_DEG = 20
+AUGMENT_SHIFT = 0.2
+AUGMENT_SHEAR_DEG = 0.2
+AUGMENT_ZOOM = 0.2
+
+
+def list_images(directory):
+    """(paths, labels) of a class-folder dataset, 1 = Anemic (CLASS_NAMES order)."""
+    paths, labels = [], []
+    for label, class_name in enumerate(CLASS_NAMES):
+        class_dir = Path(directory) / class_name
+        if not class_dir.exists():
+            continue
+        for path in sorted(class_dir.iterdir()):
+            if path.suffix.lower() in IMAGE_EXTENSIONS:
+                paths.append(path)
+                labels.append(label)
+    return paths, labels
+
+
+def load_image_arrays(directory, limit=None):
+    """
+    Load a class-folder dataset into memory with the SAME preprocessing as
+    NetraAIPipeline (BGR->RGB, resize to 64x64, scale to [0,1]).
+    Used for backend parity checks and quantization calibration.
+
+    Returns:
+        x: float32 array (N,64,64,3), y: int array (N,) with 1 = Anemic
+    """
+    paths, labels = list_images(directory)
+
+    if limit is not None and len(paths) > limit:
+        # Spread the sample over both classes instead of taking the first folder
+        idx = np.linspace(0, len(paths) - 1, limit).astype(int)
+        paths = [paths[i] for i in idx]
+        labels = [labels[i] for i in idx]
+
+    images, kept = [], []
+    for path, label in zip(paths, labels):
+        img = cv2.imread(str(path))
+        if img is None:
+            continue
+        img = cv2.resize(img, (IMG_SIZE, IMG_SIZE))
+        images.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0)
+        kept.append(label)
+
+    if not images:
+        raise FileNotFoundError(f"No images found under {directory}")
+    return np.stack(images), np.array(kept)
+
+
+def _decode(path, label):
+    """File -> RGB float32 (64,64,3) in [0,1]; bilinear resize like the inference pipeline."""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(tf.cast(image, tf.float32), (IMG_SIZE, IMG_SIZE)) / 255.0
+    image.set_shape((IMG_SIZE, IMG_SIZE, 3))
+    return image, tf.cast(label, tf.float32)
+
+
+def augment_batch(images, labels):
+    """
+    Random flip + rotation / shear / zoom / shift for a whole batch: one
+    affine matrix per image, applied by a single ImageProjectiveTransform op
+    (bilinear, 'nearest' fill like the ImageDataGenerator settings).
+    """
+    batch = tf.shape(images)[0]
+    size = tf.cast(IMG_SIZE, tf.float32)
+
+    def uniform(limit):
+        return tf.random.uniform([batch], -limit, limit)
+
+    flip = tf.random.uniform([batch]) < 0.5
+    images = tf.where(flip[:, None, None, None], tf.reverse(images, axis=[2]), images)
+
+    theta = uniform(math.radians(AUGMENT_ROTATION_DEG))
+    shear = uniform(math.radians(AUGMENT_SHEAR_DEG))
+    zoom_x = 1.0 + uniform(AUGMENT_ZOOM)
+    zoom_y = 1.0 + uniform(AUGMENT_ZOOM)
+    shift_x = uniform(AUGMENT_SHIFT) * size
+    shift_y = uniform(AUGMENT_SHIFT) * size
+
+    # Output pixel -> input pixel: rotate . shear . zoom about the image centre, then shift
+    cos, sin = tf.cos(theta), tf.sin(theta)
+    a00 = cos * zoom_x
+    a01 = (-cos * tf.sin(shear) - sin * tf.cos(shear)) * zoom_y
+    a10 = sin * zoom_x
+    a11 = (-sin * tf.sin(shear) + cos * tf.cos(shear)) * zoom_y
+    centre = (size - 1.0) / 2.0
+    offset_x = centre - a00 * centre - a01 * centre + shift_x
+    offset_y = centre - a10 * centre - a11 * centre + shift_y
+    zeros = tf.zeros_like(theta)
+    transforms = tf.stack([a00, a01, offset_x, a10, a11, offset_y, zeros, zeros], axis=1)
+
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images, transforms=transforms, output_shape=tf.shape(images)[1:3],
+        fill_value=0.0, interpolation="BILINEAR", fill_mode="NEAREST"
+    )
+    return images, labels
+
 
 class DataLoader:
     def __init__(self):
@@ -53,3 +166,37 @@ class DataLoader:
         
         print(f"✅ Data loaded: {train_gen.samples} training, {val_gen.samples} validation")
         return train_gen, val_gen
+    
+    def _dataset(self, directory, training, cache):
+        paths, labels = list_images(directory)
+        if not paths:
+            raise FileNotFoundError(f"No images found under {directory}")
+        
+        ds = tf.data.Dataset.from_tensor_slices(([str(p) for p in paths], labels))
+        ds = ds.map(_decode, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not training)
+        # Decoded 64x64 images are small: decode once, reuse every epoch
+        if cache == "memory":
+            ds = ds.cache()
+        elif cache:
+            ds = ds.cache(f"{cache}_{'train' if training else 'val'}")
+        if training:
+            ds = ds.shuffle(len(paths), seed=42, reshuffle_each_iteration=True)
+        ds = ds.batch(self.batch_size)
+        if training:
+            ds = ds.map(augment_batch, num_parallel_calls=tf.data.AUTOTUNE)
+        return ds.prefetch(tf.data.AUTOTUNE), len(paths)
+    
+    def create_datasets(self, cache=DATA_CACHE):
+        """
+        Create train and validation tf.data pipelines
+        
+        Args:
+            cache: "memory", a file path prefix for an on-disk cache, or "" for none
+            
+        Returns:
+            train_ds, val_ds, train_samples, val_samples
+        """
+        train_ds, train_samples = self._dataset(self.train_dir, training=True, cache=cache)
+        val_ds, val_samples = self._dataset(self.val_dir, training=False, cache=cache)
+        print(f"✅ Data loaded: {train_samples} training, {val_samples} validation (tf.data, cache={cache or 'off'})")
+        return train_ds, val_ds, train_samples, val_samples
@@ -0,0 +1,24 @@
+"""
+decision.py - Clinical decision rule shared by serving and offline tools
+Kept free of model / vision imports so quantize.py and evaluation scripts
+can apply the exact rule the API uses without loading the pipeline.
+Path: src/decision.py
+"""
+
+from config import DECISION_THRESHOLD, LOW_CONFIDENCE_BAND
+
+
+def diagnose(prob):
+    """
+    Map an Anemic-class probability to the clinical decision.
+
+    Returns:
+        (is_anemic, is_low_confidence, final_diagnosis)
+    """
+    is_anemic = prob > DECISION_THRESHOLD
+    # ---- Confidence Guardrail (Clinical Requirement) ----
+    low, high = LOW_CONFIDENCE_BAND
+    is_low_confidence = low <= prob <= high
+    # ---- Fail-Safe: Default to Inconclusive on low confidence ----
+    final_diagnosis = "INCONCLUSIVE" if is_low_confidence else ("ANEMIC" if is_anemic else "NORMAL")
+    return is_anemic, is_low_confidence, final_diagnosis
@@ -0,0 +1,122 @@
+"""
+detectors.py - Per-thread registry of eye / face detectors
+Haar cascades and MediaPipe FaceMesh graphs are loaded once per thread and
+reused for every request on that thread; neither is safe to share between
+threads, so each extraction thread gets its own instances and no lock is held
+while detecting. An instance is counted as live until its thread exits.
+Path: src/detectors.py
+"""
+
+import logging
+import threading
+import time
+import weakref
+
+import cv2
+import mediapipe as mp
+
+logger = logging.getLogger(__name__)
+
+HAAR_EYE_XML = 'haarcascade_eye.xml'
+
+
+class _ThreadOwner:
+    """Lives in a thread's local storage; collected when that thread exits."""
+
+
+class DetectorRegistry:
+    """
+    Lazily builds detectors per thread, counts the instances held by live
+    threads and records how long each load took.
+
+    Usage:
+        registry = get_registry()
+        eyes = registry.haar_eye().detectMultiScale(gray, 1.1, 3)
+        results = registry.face_mesh().process(image_rgb)
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._loads = {}         # detector name -> {'live', 'loads', 'total_ms'}
+
+    def haar_eye(self):
+        return self._get('haar_eye', self._load_haar_eye)
+
+    def face_mesh(self):
+        return self._get('face_mesh', self._load_face_mesh)
+
+    def preload(self) -> dict:
+        """Load every detector for the calling thread; returns its load times in ms."""
+        self.haar_eye()
+        self.face_mesh()
+        loaded = dict(self._local.load_ms)
+        logger.info("Detectors loaded: " + ", ".join(f"{n} {ms:.0f} ms" for n, ms in loaded.items()))
+        return loaded
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {'instances': counts['live'], 'loads': counts['loads'],
+                       'mean_load_ms': round(counts['total_ms'] / counts['loads'], 1)}
+                for name, counts in self._loads.items()
+            }
+
+    # =====================================================================
+    #  INTERNALS
+    # =====================================================================
+
+    def _get(self, name, loader):
+        detector = getattr(self._local, name, None)
+        if detector is None:
+            start = time.perf_counter()
+            detector = loader()
+            load_ms = (time.perf_counter() - start) * 1000
+            setattr(self._local, name, detector)
+            if not hasattr(self._local, 'owner'):
+                self._local.owner = _ThreadOwner()
+                self._local.load_ms = {}
+            self._local.load_ms[name] = load_ms
+            # Thread-local detectors are dropped with their thread; so is the count
+            weakref.finalize(self._local.owner, self._release, name)
+            with self._lock:
+                counts = self._loads.setdefault(name, {'live': 0, 'loads': 0, 'total_ms': 0.0})
+                counts['live'] += 1
+                counts['loads'] += 1
+                counts['total_ms'] += load_ms
+            logger.debug(f"{name} loaded on {threading.current_thread().name} in {load_ms:.0f} ms")
+        return detector
+
+    def _release(self, name):
+        with self._lock:
+            self._loads[name]['live'] -= 1
+
+    @staticmethod
+    def _load_haar_eye():
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + HAAR_EYE_XML)
+        if cascade.empty():
+            raise RuntimeError(f"Could not load Haar cascade {HAAR_EYE_XML}")
+        return cascade
+
+    @staticmethod
+    def _load_face_mesh():
+        return mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=1,
+            refine_landmarks=True,  # Required for iris landmarks (468-477)
+            min_detection_confidence=0.3,
+            min_tracking_confidence=0.5
+        )
+
+
+# Global instance (one per process)
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = DetectorRegistry()
+    return _registry
@@ -0,0 +1,205 @@
+"""
+executor.py - Runs pipeline work off the FastAPI event loop
+Thread pool by default (TensorFlow / OpenCV / MediaPipe release the GIL),
+optionally a supervised WorkerPool with one NetraAIPipeline per process.
+Path: src/executor.py
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import EXECUTOR_MODE, EXECUTOR_WORKERS, PREDICT_TIMEOUT
+from worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceTimeout(Exception):
+    """Raised when a pipeline call does not finish within its deadline."""
+
+
+def _load_pipeline():
+    """Build (and warm up) the shared pipeline in a pool thread."""
+    from pipeline import get_pipeline
+    get_pipeline()
+
+
+def _init_thread():
+    """Load this pool thread's detectors before its first request."""
+    try:
+        from detectors import get_registry
+        get_registry().preload()
+    except Exception as e:
+        logger.error(f"Detector preload failed: {e}")
+
+
+def _merge_stats(snapshots):
+    """
+    Combine one stats dict per worker: integer counters are summed, nested
+    dicts merged, other fields kept only where every worker agrees.
+    """
+    snapshots = [s for s in snapshots if s is not None]
+    if not snapshots:
+        return None
+    if not all(isinstance(s, dict) for s in snapshots):
+        return snapshots[0] if all(s == snapshots[0] for s in snapshots) else None
+    merged = {}
+    for key in snapshots[0]:
+        values = [s.get(key) for s in snapshots]
+        if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            merged[key] = sum(values)
+        elif all(isinstance(v, dict) for v in values):
+            merged[key] = _merge_stats(values)
+        elif all(v == values[0] for v in values):
+            merged[key] = values[0]
+    return merged
+
+
+def _call_pipeline(method, args, kwargs):
+    """Invoke a method of this process's NetraAIPipeline (thread mode)."""
+    from pipeline import get_pipeline
+    return getattr(get_pipeline(), method)(*args, **kwargs)
+
+
+class InferenceExecutor:
+    """
+    Sized executor for pipeline calls made from coroutines.
+
+    run() awaits the call with a per-request timeout. On timeout or client
+    cancellation the job is cancelled if it has not started yet; a job that
+    is already running finishes in the background and its result is dropped.
+    The optional `release` callback runs only once the job has really
+    finished (or was cancelled before starting), so resources such as an
+    admission slot stay held while a timed-out job still occupies a worker.
+    """
+
+    def __init__(self, mode=EXECUTOR_MODE, max_workers=EXECUTOR_WORKERS,
+                 timeout=PREDICT_TIMEOUT):
+        self.mode = mode
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+
+        if mode == "process":
+            self._pool = WorkerPool(num_workers=self.max_workers)
+        elif mode == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="netra-infer",
+                initializer=_init_thread
+            )
+        else:
+            raise ValueError(f"Unknown executor mode: {mode}")
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._timeouts = 0
+        self._cancelled = 0
+
+        logger.info(f"InferenceExecutor: {self.max_workers} {mode} workers, timeout={timeout}s")
+
+    async def run(self, method, *args, timeout=None, release=None, **kwargs):
+        """Call `pipeline.<method>(*args, **kwargs)` on the pool and await it."""
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            if self.mode == "process":
+                future = self._pool.submit(method, *args, **kwargs)
+            else:
+                future = self._pool.submit(_call_pipeline, method, args, kwargs)
+        except Exception:
+            if release is not None:
+                release()
+            raise
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(self._on_done)
+        if release is not None:
+            future.add_done_callback(lambda _: release())
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            future.cancel()
+            raise InferenceTimeout(f"{method} did not finish within {timeout}s")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    async def pipeline_stats(self, timeout=2.0):
+        """
+        Runtime counters of the pipeline(s) by /metrics section, read without
+        going through the inference queue and without loading the pipeline.
+        Process mode: {section: {'total': summed over workers, 'workers': {id: stats}}}.
+        Returns None while no pipeline has reported yet.
+        """
+        if self.mode == "process":
+            per_worker = self._pool.pipeline_stats()
+            if not per_worker:
+                return None
+            sections = next(iter(per_worker.values())).keys()
+            return {
+                section: {
+                    'total': _merge_stats([stats.get(section) for stats in per_worker.values()]),
+                    'workers': {worker_id: stats.get(section) for worker_id, stats in per_worker.items()},
+                } for section in sections
+            }
+
+        from pipeline import pipeline_stats
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(pipeline_stats), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise InferenceTimeout(f"pipeline stats did not answer within {timeout}s")
+
+    def start(self):
+        """
+        Begin loading the model without blocking the caller. Worker processes
+        load on spawn; in thread mode one pool thread builds the pipeline.
+        """
+        if self.mode == "thread":
+            self._pool.submit(_load_pipeline).add_done_callback(self._on_loaded)
+
+    def ready(self) -> bool:
+        """True when every pipeline is loaded and warmed up."""
+        if self.mode == "process":
+            return self._pool.ready()
+        from pipeline import is_ready
+        return is_ready()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                'mode': self.mode,
+                'workers': self.max_workers,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'cancelled': self._cancelled,
+                'timeouts': self._timeouts,
+            }
+        if self.mode == "process":
+            stats['pool'] = self._pool.stats()
+        return stats
+
+    def shutdown(self, wait=True):
+        if self.mode == "process":
+            self._pool.shutdown(wait=wait)
+        else:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            from pipeline import close_pipeline
+            close_pipeline()
+
+    @staticmethod
+    def _on_loaded(future):
+        if future.exception() is not None:
+            logger.error(f"Pipeline failed to load: {future.exception()}")
+
+    def _on_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                self._cancelled += 1
+            else:
+                self._completed += 1
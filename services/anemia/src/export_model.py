@@ -0,0 +1,112 @@
+"""
+export_model.py - Export best_enhanced.h5 to lightweight inference formats
+Builds the network from model.py, loads the trained weights and writes a
+TFLite (and optionally ONNX) artifact, then checks probability parity
+against Keras on the validation set.
+Path: src/export_model.py
+
+Usage:
+    python export_model.py                 # TFLite + parity check
+    python export_model.py --onnx          # also ONNX (needs tf2onnx)
+    python export_model.py --skip-verify
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+sys.path.append(str(Path(__file__).parent))
+from config import (
+    MODEL_PATH, TFLITE_MODEL_PATH, ONNX_MODEL_PATH, VAL_DIR, INPUT_SIZE,
+    PARITY_TOLERANCE
+)
+from model import create_enhanced_model
+from backends import KerasBackend, TFLiteBackend, ONNXBackend
+from data_loader import load_image_arrays
+
+
+def build_trained_model(weights_path=MODEL_PATH):
+    """Recreate the architecture from model.py and load trained weights."""
+    model = create_enhanced_model()
+    model.load_weights(str(weights_path))
+    return model
+
+
+def export_tflite(model, output_path=TFLITE_MODEL_PATH):
+    """Float32 TFLite export (no quantization — see quantize.py for INT8)."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    tflite_model = converter.convert()
+    Path(output_path).write_bytes(tflite_model)
+    print(f"TFLite model saved: {output_path} ({len(tflite_model) / 1024:.0f} KB)")
+    return Path(output_path)
+
+
+def export_onnx(model, output_path=ONNX_MODEL_PATH, opset=13):
+    """ONNX export with a dynamic batch dimension."""
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, INPUT_SIZE, INPUT_SIZE, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(output_path))
+    print(f"ONNX model saved: {output_path}")
+    return Path(output_path)
+
+
+def verify_parity(reference, candidate, images, tolerance=PARITY_TOLERANCE, batch_size=32):
+    """
+    Compare probabilities of two backends on the same inputs.
+
+    Returns:
+        (passed, max_abs_diff)
+    """
+    ref = np.concatenate([reference.predict(images[i:i + batch_size])
+                          for i in range(0, len(images), batch_size)])
+    out = np.concatenate([candidate.predict(images[i:i + batch_size])
+                          for i in range(0, len(images), batch_size)])
+    max_diff = float(np.max(np.abs(ref - out)))
+    passed = max_diff <= tolerance
+    status = "PASS" if passed else "FAIL"
+    print(f"  {candidate.name:<7} max |Δprob| = {max_diff:.2e} over {len(images)} images "
+          f"(tolerance {tolerance:.0e}) -> {status}")
+    return passed, max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export NetraAI model to TFLite / ONNX")
+    parser.add_argument("--weights", default=str(MODEL_PATH), help="Trained Keras weights (.h5)")
+    parser.add_argument("--onnx", action="store_true", help="Also export ONNX (requires tf2onnx)")
+    parser.add_argument("--skip-verify", action="store_true", help="Skip the parity check")
+    parser.add_argument("--val-dir", default=str(VAL_DIR), help="Validation images for the parity check")
+    parser.add_argument("--tolerance", type=float, default=PARITY_TOLERANCE)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("NETRA AI - MODEL EXPORT")
+    print("=" * 60)
+
+    model = build_trained_model(args.weights)
+    candidates = [(TFLiteBackend, export_tflite(model))]
+    if args.onnx:
+        candidates.append((ONNXBackend, export_onnx(model)))
+
+    if args.skip_verify:
+        return 0
+
+    print(f"\nParity check against Keras on {args.val_dir}")
+    images, _ = load_image_arrays(args.val_dir)
+    reference = KerasBackend(args.weights)
+    results = [verify_parity(reference, backend_cls(path), images, args.tolerance)[0]
+               for backend_cls, path in candidates]
+
+    print("=" * 60)
+    if not all(results):
+        print("Parity check FAILED — do not deploy the exported model.")
+        return 1
+    print("All exported backends match Keras.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,132 @@ Matches training data distribution: isolated tissue on black background
 """
 
 import cv2
-import mediapipe as mp
 import numpy as np
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
+from detectors import get_registry
+
+from config import (
+    EXTRACTION_ANALYSIS_SIZE, EXTRACTION_MIN_BRIGHTNESS, EXTRACTION_MAX_BRIGHTNESS,
+    EXTRACTION_MIN_CONTRAST, EXTRACTION_MIN_SHARPNESS, EXTRACTION_CLOSEUP_ASPECT,
+    EXTRACTION_WORK_SIZE, EXTRACTION_PAD_CANVAS, EXTRACTION_MAX_ROI_SIZE,
+    EXTRACT_WORKERS, EXTRACT_MAX_PENDING
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_UNSET = object()
+
+
+class ImageAnalysis:
+    """
+    Artifacts shared by every extraction strategy for one image.
+
+    Detectors run on a working copy whose longest side is at most
+    EXTRACTION_WORK_SIZE; their boxes and landmarks are mapped back to
+    original-image pixels so the conjunctiva is cropped at full resolution.
+    Everything is computed lazily and at most once.
+    """
+
+    def __init__(self, image: np.ndarray, extractor: 'EyeExtractor'):
+        self.image = image
+        self.height, self.width = image.shape[:2]
+        self.work_scale = min(1.0, EXTRACTION_WORK_SIZE / max(self.height, self.width))
+        self._extractor = extractor
+        self._work = None
+        self._gray = None
+        self._rgb = None
+        self._small_gray = None
+        self._face_points = {}   # padded (bool) -> landmark points or None
+
+    @property
+    def work(self) -> np.ndarray:
+        """BGR working copy, longest side <= EXTRACTION_WORK_SIZE."""
+        if self._work is None:
+            if self.work_scale < 1:
+                size = (max(1, round(self.width * self.work_scale)), max(1, round(self.height * self.work_scale)))
+                self._work = cv2.resize(self.image, size, interpolation=cv2.INTER_AREA)
+            else:
+                self._work = self.image
+        return self._work
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.work, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def rgb(self) -> np.ndarray:
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.work, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def small_gray(self) -> np.ndarray:
+        """Gray copy with the longest side capped at EXTRACTION_ANALYSIS_SIZE."""
+        if self._small_gray is None:
+            gray = self.gray
+            scale = EXTRACTION_ANALYSIS_SIZE / max(gray.shape[:2])
+            if scale < 1:
+                size = (max(1, int(gray.shape[1] * scale)), max(1, int(gray.shape[0] * scale)))
+                self._small_gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+            else:
+                self._small_gray = gray
+        return self._small_gray
+
+    @property
+    def aspect(self) -> float:
+        return self.width / self.height if self.height else 1.0
+
+    def to_original(self, x, y, w, h):
+        """Map a box found on the working copy to original-image pixels."""
+        s = self.work_scale
+        return int(x / s), int(y / s), int(w / s), int(h / s)
+
+    def face_points(self, padded: bool = False):
+        """
+        FaceMesh landmarks of the first face as an (N, 2) array in
+        original-image pixels (None if no face). Shared by the iris and
+        polygon methods. padded=True runs FaceMesh on the working copy
+        centred in a black canvas, which helps on eye close-ups.
+        """
+        if padded not in self._face_points:
+            if padded:
+                canvas, (x_off, y_off, placed_w, placed_h) = self._extractor._prepad_for_mediapipe(self.work)
+                results = self._extractor._process_face_mesh(cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB))
+                size = canvas.shape[0]
+                offset = np.array([x_off, y_off], dtype=np.float32)
+                scale = np.array([self.width / placed_w, self.height / placed_h], dtype=np.float32)
+                to_original = lambda pts: (pts * size - offset) * scale
+            else:
+                results = self._extractor._process_face_mesh(self.rgb)
+                to_original = lambda pts: pts * np.array([self.width, self.height], dtype=np.float32)
+
+            points = None
+            if results.multi_face_landmarks:
+                landmarks = results.multi_face_landmarks[0].landmark
+                points = to_original(np.array([(lm.x, lm.y) for lm in landmarks], dtype=np.float32))
+            self._face_points[padded] = points
+        return self._face_points[padded]
+
+    def quality(self) -> dict:
+        """Cheap whole-image metrics computed on the downscaled gray copy."""
+        small = self.small_gray
+        return {
+            'width': self.width,
+            'height': self.height,
+            'brightness': float(small.mean()),
+            'contrast': float(small.std()),
+            'sharpness': float(cv2.Laplacian(small, cv2.CV_64F).var()),
+        }
+
 
 class EyeExtractor:
     """
@@ -22,15 +140,14 @@ class EyeExtractor:
     """
     
     def __init__(self):
-        """Initialize MediaPipe Face Mesh with iris landmarks"""
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=True,
-            max_num_faces=1,
-            refine_landmarks=True,  # Required for iris landmarks (468-477)
-            min_detection_confidence=0.3,
-            min_tracking_confidence=0.5
-        )
+        """Load detectors (Haar eye cascade, FaceMesh with iris landmarks) for this thread"""
+        # Detectors are not thread-safe: the registry keeps one set per thread
+        self.detectors = get_registry()
+        self.detector_load_ms = self.detectors.preload()
+        
+        # extract_many worker threads, kept across calls so each loads its detectors once
+        self._pools = {}
+        self._pool_lock = threading.Lock()
         
         # ===== LOWER EYELID LANDMARKS ONLY =====
         # These trace the lower conjunctiva crescent (below iris)
@@ -97,47 +214,67 @@ class EyeExtractor:
         
         return False
     
-    def _prepad_for_mediapipe(self, image: np.ndarray) -> np.ndarray:
+    def _process_face_mesh(self, image_rgb: np.ndarray):
+        """Run this thread's FaceMesh instance."""
+        return self.detectors.face_mesh().process(image_rgb)
+    
+    def _prepad_for_mediapipe(self, image: np.ndarray):
         """
         Pre-pad close-up images to help MediaPipe detect faces.
         MediaPipe works better when the face occupies a reasonable proportion.
+        
+        Returns:
+            (padded canvas, (x_off, y_off, placed_w, placed_h)) — where the
+            (possibly downscaled) image sits inside the canvas
         """
         h, w = image.shape[:2]
         
-        # If image is very large (likely a high-res close-up), resize it down first
-        # MediaPipe struggles with 4K eyes but works great on 500px faces
-        max_dim = max(h, w)
-        if max_dim > 1000:
-            scale = 500 / max_dim
-            image = cv2.resize(image, (int(w * scale), int(h * scale)))
+        # We want the 'eye' to look like a small part of a larger face: the
+        # image fills a quarter of the canvas side. The canvas is bounded so a
+        # large close-up never turns into a multi-megapixel buffer.
+        size = min(EXTRACTION_PAD_CANVAS, max(h, w) * 4)
+        scale = min(1.0, (size // 4) / max(h, w))
+        if scale < 1:
+            image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
             h, w = image.shape[:2]
         
-        # Now pad it into a large black canvas
-        # We want the 'eye' to look like a small part of a larger face
-        size = max(h, w) * 4
         padded = np.zeros((size, size, 3), dtype=np.uint8)
         y_off = (size - h) // 2
         x_off = (size - w) // 2
         padded[y_off:y_off+h, x_off:x_off+w] = image
-        return padded
+        return padded, (x_off, y_off, w, h)
+    
+    def _bounded_roi(self, image: np.ndarray, top: int, bottom: int, left: int, right: int):
+        """
+        Crop a region from the full-resolution image, downscaled if its longest
+        side exceeds EXTRACTION_MAX_ROI_SIZE.
+        
+        Returns:
+            (roi, scale) — multiply original-pixel offsets inside the crop by scale
+        """
+        roi = image[max(0, top):bottom, max(0, left):right]
+        if roi.size == 0:
+            return roi, 1.0
+        rh, rw = roi.shape[:2]
+        scale = min(1.0, EXTRACTION_MAX_ROI_SIZE / max(rh, rw))
+        if scale < 1:
+            roi = cv2.resize(roi, (max(1, round(rw * scale)), max(1, round(rh * scale))), interpolation=cv2.INTER_AREA)
+        return roi, scale
     
     # =====================================================================
     #  UNIFIED PUBLIC API
     # =====================================================================
     
+    # Strategy order by image geometry. Wide landscape frames are usually eye
+    # close-ups where Haar (and FaceMesh on a padded copy) succeed; other
+    # frames usually contain a face, where the landmark methods are best.
+    CLOSEUP_ORDER = ('haar', 'padded_iris', 'padded_polygon', 'iris', 'polygon', 'edges')
+    FACE_ORDER = ('iris', 'polygon', 'haar', 'padded_iris', 'padded_polygon', 'edges')
+    
     def extract_lower_conjunctiva(self, image: np.ndarray, eye: str = 'left', debug: bool = False, session_id: str = None) -> np.ndarray:
         """
         Extract ONLY the lower conjunctiva region (below iris).
         
-        Pipeline:
-            1. Check if already cropped → use as-is
-            2. MediaPipe iris-based lower conjunctiva extraction
-            3. MediaPipe standard lower-lid polygon extraction
-            4. MediaPipe with pre-padded image
-            5. Haar cascade + lower region
-            6. Edge detection + lower region
-            7. Center crop fallback
-        
         Args:
             image: BGR image (full face or eye close-up)
             eye: 'left' or 'right'
@@ -146,67 +283,195 @@ class EyeExtractor:
             
         Returns:
             64x64x3 numpy array with isolated lower conjunctiva on black background
+            (None if the image was rejected or nothing usable was found)
+        """
+        tissue, _ = self.extract_with_report(image, eye, debug=debug, session_id=session_id)
+        return tissue
+    
+    def extract_with_report(self, image: np.ndarray, eye: str = 'left', debug: bool = False, session_id: str = None):
         """
+        Extract the lower conjunctiva and report how it went.
+        
+        Pipeline:
+            1. Already cropped → use as-is
+            2. Pre-analysis: shared gray / downscaled copy and quality metrics;
+               hopeless inputs (too small, dark, washed out, blank, blurred) stop here
+            3. Strategies in CLOSEUP_ORDER or FACE_ORDER (iris, lower-lid polygon,
+               both on a pre-padded copy, Haar, edges) until one validates
+            4. Lower-center crop fallback
+        
+        Returns:
+            (tissue or None, report) where report has 'method', 'failure_reason',
+            'profile', 'quality' and per-stage 'timings_ms'
+        """
+        report = {'method': None, 'failure_reason': None, 'profile': None,
+                  'quality': None, 'timings_ms': {}}
+        timings = report['timings_ms']
+        start = time.perf_counter()
+        
+        def elapsed_ms(since):
+            return round((time.perf_counter() - since) * 1000, 2)
+        
         # ===== STEP 1: Check if already cropped =====
         if self.is_already_cropped(image):
             logger.info("Image already cropped — using as-is")
-            return cv2.resize(image, (64, 64))
-        
-        # ===== STEP 2: Haar cascade + lower region (Fast & Good for extreme close-ups) =====
-        try:
-            result = self._extract_lower_with_haar(image, debug=debug, session_id=session_id)
-            if result is not None:
-                logger.info("✅ Extracted lower conjunctiva using Haar cascade")
-                return result
-        except Exception as e:
-            logger.warning(f"Haar cascade primary failed: {e}")
-
-        # ===== STEP 3: MediaPipe iris-based lower conjunctiva (best for full face/mid distance) =====
-        try:
-            result = self._extract_below_iris(image, eye, debug=debug, session_id=session_id)
+            report['method'] = 'pre-cropped'
+            timings['total'] = elapsed_ms(start)
+            return cv2.resize(image, (64, 64)), report
+        
+        # ===== STEP 2: Pre-analysis + early abort =====
+        analysis = ImageAnalysis(image, self)
+        report['quality'] = analysis.quality()
+        report['profile'] = 'closeup' if analysis.aspect >= EXTRACTION_CLOSEUP_ASPECT else 'face'
+        timings['analysis'] = elapsed_ms(start)
+        
+        rejection = self._precheck(report['quality'])
+        if rejection is not None:
+            logger.warning(f"Image rejected before extraction: {rejection} ({report['quality']})")
+            report['failure_reason'] = rejection
+            timings['total'] = elapsed_ms(start)
+            return None, report
+        
+        # ===== STEP 3: Strategies, most likely first =====
+        strategies = {
+            'haar': lambda: self._extract_lower_with_haar(image, debug=debug, session_id=session_id, analysis=analysis),
+            'iris': lambda: self._extract_below_iris(image, eye, debug=debug, session_id=session_id, analysis=analysis),
+            'polygon': lambda: self._extract_lower_lid_polygon(image, eye, debug=debug, session_id=session_id, analysis=analysis),
+            'padded_iris': lambda: self._extract_below_iris(
+                image, eye, debug=debug, session_id=session_id, analysis=analysis, padded=True),
+            'padded_polygon': lambda: self._extract_lower_lid_polygon(
+                image, eye, debug=debug, session_id=session_id, analysis=analysis, padded=True),
+            'edges': lambda: self._extract_lower_with_edges(image, debug=debug, session_id=session_id, analysis=analysis),
+        }
+        order = self.CLOSEUP_ORDER if report['profile'] == 'closeup' else self.FACE_ORDER
+        
+        for name in order:
+            stage_start = time.perf_counter()
+            try:
+                result = strategies[name]()
+            except Exception as e:
+                logger.warning(f"{name} extraction failed: {e}")
+                result = None
+            timings[name] = elapsed_ms(stage_start)
             if result is not None:
-                logger.info("✅ Extracted lower conjunctiva using iris-based method")
-                return result
-        except Exception as e:
-            logger.warning(f"Iris-based extraction failed: {e}")
+                logger.info(f"✅ Extracted lower conjunctiva using {name} ({timings[name]:.0f} ms)")
+                report['method'] = name
+                timings['total'] = elapsed_ms(start)
+                return result, report
         
-        # ===== STEP 4: MediaPipe standard lower-lid polygon extraction =====
-        try:
-            result = self._extract_lower_lid_polygon(image, eye, debug=debug, session_id=session_id)
-            if result is not None:
-                logger.info("✅ Extracted lower conjunctiva using lower-lid polygon")
-                return result
-        except Exception as e:
-            logger.warning(f"Lower-lid polygon extraction failed: {e}")
+        # ===== STEP 4: Ultimate fallback =====
+        logger.warning("⚠️ All methods failed — using lower-center crop fallback")
+        stage_start = time.perf_counter()
+        result = self._lower_center_crop_fallback(image, debug=debug, session_id=session_id)
+        timings['center_crop'] = elapsed_ms(stage_start)
+        timings['total'] = elapsed_ms(start)
+        if result is None:
+            report['failure_reason'] = 'no_valid_region'
+        else:
+            report['method'] = 'center_crop'
+        return result, report
+    
+    def extract_many(self, images, eye: str = 'left', ordered: bool = True,
+                     workers: int = EXTRACT_WORKERS, max_pending: int = EXTRACT_MAX_PENDING):
+        """
+        Extract the lower conjunctiva from many images on a thread pool.
         
-        # ===== STEP 5: Try with pre-padded image (helps MediaPipe on tight crops) =====
-        try:
-            padded = self._prepad_for_mediapipe(image)
-            if padded is not image:
-                logger.info("Trying MediaPipe with pre-padded image")
-                result = self._extract_below_iris(padded, eye, debug=debug, session_id=session_id)
-                if result is not None:
-                    logger.info("✅ Extracted with pre-padded image (iris method)")
-                    return result
-                result = self._extract_lower_lid_polygon(padded, eye, debug=debug, session_id=session_id)
-                if result is not None:
-                    logger.info("✅ Extracted with pre-padded image (polygon method)")
-                    return result
-        except Exception as e:
-            logger.warning(f"Pre-padded extraction failed: {e}")
+        Each worker thread uses its own detectors (see detectors.py); the threads
+        are shared by every call with the same `workers` until close(). The input
+        iterable is consumed lazily and at most `max_pending` images are read /
+        in flight at once, so a generator over a large directory stays memory
+        bounded:
+        
+            for item in extractor.extract_many(Path(d).rglob('*.jpg'), ordered=False):
+                ...
+        
+        Args:
+            images: iterable of BGR arrays or image paths (read inside the workers)
+            eye: 'left' or 'right'
+            ordered: yield in input order (True) or as each image finishes (False)
+            workers: worker threads
+            max_pending: maximum submitted but not yet yielded images
+            
+        Yields:
+            dicts with 'index', 'source', 'tissue' (64x64x3 or None), 'method',
+            'failure_reason' and 'timings_ms'
+        """
+        max_pending = max(1, max_pending)
+        pool = self._extract_pool(max(1, workers))
+        pending = deque() if ordered else set()
+        
+        def completed():
+            if ordered:
+                return [pending.popleft()]
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            pending.difference_update(done)
+            return done
         
-        # ===== STEP 6: Edge detection + lower region (Last resort automated) =====
         try:
-            result = self._extract_lower_with_edges(image, debug=debug, session_id=session_id)
-            if result is not None:
-                logger.info("✅ Extracted lower conjunctiva using edge detection")
+            for index, item in enumerate(images):
+                future = pool.submit(self._extract_one, index, item, eye)
+                if ordered:
+                    pending.append(future)
+                else:
+                    pending.add(future)
+                while len(pending) >= max_pending:
+                    for future in completed():
+                        yield future.result()
+            while pending:
+                for future in completed():
+                    yield future.result()
+        finally:
+            # Consumer stopped early: drop images that have not started yet
+            for future in pending:
+                future.cancel()
+            wait(pending)
+    
+    def _extract_pool(self, workers):
+        with self._pool_lock:
+            pool = self._pools.get(workers)
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="netra-extract")
+                self._pools[workers] = pool
+            return pool
+    
+    def close(self):
+        """Stop the extract_many worker threads (their detectors are released with them)."""
+        with self._pool_lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def _extract_one(self, index, item, eye):
+        """One extract_many job; never raises so a bad image cannot stop the batch."""
+        source = str(item) if isinstance(item, (str, Path)) else index
+        result = {'index': index, 'source': source, 'tissue': None, 'method': None,
+                  'failure_reason': None, 'timings_ms': {}}
+        try:
+            image = cv2.imread(str(item)) if isinstance(item, (str, Path)) else item
+            if image is None:
+                result['failure_reason'] = 'unreadable'
                 return result
+            tissue, report = self.extract_with_report(image, eye)
+            result.update(tissue=tissue, method=report['method'],
+                          failure_reason=report['failure_reason'], timings_ms=report['timings_ms'])
         except Exception as e:
-            logger.warning(f"Edge detection fallback failed: {e}")
-        
-        # ===== STEP 7: Ultimate fallback =====
-        logger.warning("⚠️ All methods failed — using lower-center crop fallback")
-        return self._lower_center_crop_fallback(image, debug=debug, session_id=session_id)
+            logger.warning(f"Extraction failed for {source}: {e}")
+            result['failure_reason'] = f"error: {e}"
+        return result
+    
+    def _precheck(self, quality: dict):
+        """Return a rejection reason for inputs no strategy can succeed on, else None."""
+        if quality['width'] < self.min_roi_width or quality['height'] < self.min_roi_height:
+            return 'too_small'
+        if quality['brightness'] < EXTRACTION_MIN_BRIGHTNESS:
+            return 'too_dark'
+        if quality['brightness'] > EXTRACTION_MAX_BRIGHTNESS:
+            return 'overexposed'
+        if quality['contrast'] < EXTRACTION_MIN_CONTRAST:
+            return 'low_contrast'
+        if quality['sharpness'] < EXTRACTION_MIN_SHARPNESS:
+            return 'too_blurry'
+        return None
     
     # Keep old name as alias for backward compatibility
     def extract_conjunctiva(self, image: np.ndarray, eye: str = 'left', debug: bool = False, session_id: str = None) -> np.ndarray:
@@ -217,7 +482,8 @@ class EyeExtractor:
     #  METHOD 1: IRIS-BASED LOWER CONJUNCTIVA (Primary method)
     # =====================================================================
     
-    def _extract_below_iris(self, image: np.ndarray, eye: str, debug: bool = False, session_id: str = None) -> np.ndarray:
+    def _extract_below_iris(self, image: np.ndarray, eye: str, debug: bool = False, session_id: str = None,
+                            analysis: ImageAnalysis = None, padded: bool = False) -> np.ndarray:
         """
         Use iris center as the TOP boundary, lower eyelid as BOTTOM boundary.
         This precisely isolates the inferior palpebral conjunctiva.
@@ -229,42 +495,28 @@ class EyeExtractor:
             Right  → rightmost lower lid landmark
         """
         h, w = image.shape[:2]
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(image_rgb)
+        analysis = analysis or ImageAnalysis(image, self)
+        # Landmarks come from the working copy, already mapped to full-resolution pixels
+        points = analysis.face_points(padded)
         
-        if not results.multi_face_landmarks:
+        if points is None:
             return None
         
-        landmarks = results.multi_face_landmarks[0]
-        
         # Check we have iris landmarks (need refine_landmarks=True)
-        if len(landmarks.landmark) < 478:
+        if len(points) < 478:
             return None
         
         # Get iris center
         iris_idx = self.left_iris_center if eye == 'left' else self.right_iris_center
-        iris_lm = landmarks.landmark[iris_idx]
-        iris_x, iris_y = int(iris_lm.x * w), int(iris_lm.y * h)
+        iris_x, iris_y = (int(v) for v in points[iris_idx])
         
         # Get lower eyelid points
         lower_indices = self.left_lower_lid_indices if eye == 'left' else self.right_lower_lid_indices
-        lower_points = []
-        for idx in lower_indices:
-            lm = landmarks.landmark[idx]
-            lower_points.append([int(lm.x * w), int(lm.y * h)])
-        lower_points = np.array(lower_points, dtype=np.int32)
-        
-        # Get upper eye points (for creating the upper boundary line)
-        upper_indices = self.left_upper_indices if eye == 'left' else self.right_upper_indices
-        upper_points = []
-        for idx in upper_indices:
-            lm = landmarks.landmark[idx]
-            upper_points.append([int(lm.x * w), int(lm.y * h)])
-        upper_points = np.array(upper_points, dtype=np.int32)
+        lower_points = points[lower_indices].astype(np.int32)
         
         # --- Define ROI boundaries ---
         # Top: start from iris center (conjunctiva is BELOW iris)
-        roi_top = iris_y
+        roi_top = max(0, iris_y)
         
         # Bottom: lowest lower-lid landmark + expansion for conjunctiva
         lower_y_max = lower_points[:, 1].max()
@@ -299,38 +551,36 @@ class EyeExtractor:
         lower_reversed = lower_points[::-1]  # reverse so polygon closes properly
         crescent_polygon = np.vstack([upper_line, lower_reversed])
         
-        # Crop ROI region
-        roi = image[roi_top:roi_bottom, roi_left:roi_right]
+        # Crop ROI region (full resolution, bounded)
+        roi, roi_scale = self._bounded_roi(image, roi_top, roi_bottom, roi_left, roi_right)
         if roi.size == 0:
             return None
         
         # Shift polygon to ROI coordinates
-        shifted_polygon = crescent_polygon - [roi_left, roi_top]
+        shifted_polygon = ((crescent_polygon - [roi_left, roi_top]) * roi_scale).astype(np.int32)
         
         # Create and apply initial mask
         mask = np.zeros(roi.shape[:2], dtype=np.uint8)
         cv2.fillPoly(mask, [shifted_polygon], 255)
         
-        # --- NEW: Aggressive Color + Blob Refinement ---
-        mask = self._refine_with_color_mask(roi, mask)
-        
-        segmented = cv2.bitwise_and(roi, roi, mask=mask)
+        # --- Aggressive Color + Blob Refinement, then validation stats ---
+        stats = self._analyze_roi(roi, mask)
         
         # --- Validate: check for iris contamination (too many dark pixels) ---
-        if not self._validate_conjunctiva(segmented, mask):
+        if stats['failure']:
             logger.warning("Iris contamination detected — adjusting")
             # Push top boundary lower to avoid iris
-            adjusted_top = iris_y + int((lower_y_max - iris_y) * 0.3)
-            roi = image[adjusted_top:roi_bottom, roi_left:roi_right]
+            adjusted_top = max(0, iris_y + int((lower_y_max - iris_y) * 0.3))
+            roi, roi_scale = self._bounded_roi(image, adjusted_top, roi_bottom, roi_left, roi_right)
             if roi.size == 0:
                 return None
-            shifted_polygon = crescent_polygon - [roi_left, adjusted_top]
+            shifted_polygon = ((crescent_polygon - [roi_left, adjusted_top]) * roi_scale).astype(np.int32)
             mask = np.zeros(roi.shape[:2], dtype=np.uint8)
             cv2.fillPoly(mask, [shifted_polygon], 255)
-            segmented = cv2.bitwise_and(roi, roi, mask=mask)
+            stats = self._analyze_roi(roi, mask, refine=False)
         
         # Tight crop to tissue
-        tissue = self._tight_crop(segmented)
+        tissue = self._crop_tissue(roi, stats)
         if tissue is None:
             return None
         
@@ -343,27 +593,23 @@ class EyeExtractor:
     #  METHOD 2: LOWER-LID POLYGON (when iris landmarks unavailable)
     # =====================================================================
     
-    def _extract_lower_lid_polygon(self, image: np.ndarray, eye: str, debug: bool = False, session_id: str = None) -> np.ndarray:
+    def _extract_lower_lid_polygon(self, image: np.ndarray, eye: str, debug: bool = False, session_id: str = None,
+                                   analysis: ImageAnalysis = None, padded: bool = False) -> np.ndarray:
         """
         Uses lower eyelid landmarks to create a lower-conjunctiva polygon mask.
         Falls back to this when iris landmarks are not available.
         """
         h, w = image.shape[:2]
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(image_rgb)
+        analysis = analysis or ImageAnalysis(image, self)
+        points = analysis.face_points(padded)
         
-        if not results.multi_face_landmarks:
+        if points is None:
             return None
         
-        landmarks = results.multi_face_landmarks[0]
         lower_indices = self.left_lower_lid_indices if eye == 'left' else self.right_lower_lid_indices
         
-        # Get lower lid points
-        lower_points = []
-        for idx in lower_indices:
-            lm = landmarks.landmark[idx]
-            lower_points.append([int(lm.x * w), int(lm.y * h)])
-        lower_points = np.array(lower_points, dtype=np.int32)
+        # Get lower lid points (full-resolution pixels)
+        lower_points = points[lower_indices].astype(np.int32)
         
         # Get bounding box of lower lid
         x, y, bw, bh = cv2.boundingRect(lower_points)
@@ -372,7 +618,7 @@ class EyeExtractor:
         # Use the midpoint of the eye as the top boundary
         inner_corner = lower_points[0]
         outer_corner = lower_points[-1]
-        mid_y = (inner_corner[1] + outer_corner[1]) // 2
+        mid_y = max(0, int(inner_corner[1] + outer_corner[1]) // 2)
         
         # Expand downward to capture full conjunctiva
         expand_down = int(bh * 0.5)
@@ -391,26 +637,24 @@ class EyeExtractor:
         lower_reversed = lower_points[::-1]
         crescent_polygon = np.vstack([upper_line, lower_reversed])
         
-        # Crop ROI
-        roi = image[mid_y:bottom, left:right]
+        # Crop ROI (full resolution, bounded)
+        roi, roi_scale = self._bounded_roi(image, mid_y, bottom, left, right)
         if roi.size == 0:
             return None
         
         # Shift and mask
-        shifted_polygon = crescent_polygon - [left, mid_y]
+        shifted_polygon = ((crescent_polygon - [left, mid_y]) * roi_scale).astype(np.int32)
         mask = np.zeros(roi.shape[:2], dtype=np.uint8)
         cv2.fillPoly(mask, [shifted_polygon], 255)
         
-        # --- NEW: Color Refinement ---
-        mask = self._refine_with_color_mask(roi, mask)
-        
-        segmented = cv2.bitwise_and(roi, roi, mask=mask)
+        # --- Color Refinement + validation stats ---
+        stats = self._analyze_roi(roi, mask)
         
         # Validate
-        if not self._validate_conjunctiva(segmented, mask):
+        if stats['failure']:
             return None
         
-        tissue = self._tight_crop(segmented)
+        tissue = self._crop_tissue(roi, stats)
         if tissue is None:
             return None
         
@@ -423,20 +667,20 @@ class EyeExtractor:
     #  METHOD 3: HAAR CASCADE + LOWER REGION
     # =====================================================================
     
-    def _extract_lower_with_haar(self, image: np.ndarray, debug: bool = False, session_id: str = None) -> np.ndarray:
+    def _extract_lower_with_haar(self, image: np.ndarray, debug: bool = False, session_id: str = None,
+                                 analysis: ImageAnalysis = None) -> np.ndarray:
         """
         Use Haar cascade to detect the eye, then extract only the bottom 40%.
         Applies a crescent mask to exclude skin and iris.
         """
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-        eyes = eye_cascade.detectMultiScale(gray, 1.1, 3)
+        analysis = analysis or ImageAnalysis(image, self)
+        eyes = self.detectors.haar_eye().detectMultiScale(analysis.gray, 1.1, 3)
         
         if len(eyes) == 0:
             return None
         
-        # Take the largest detected eye
-        x, y, w, h = max(eyes, key=lambda rect: rect[2] * rect[3])
+        # Take the largest detected eye (detected on the working copy)
+        x, y, w, h = analysis.to_original(*max(eyes, key=lambda rect: rect[2] * rect[3]))
         
         # Extract ONLY the bottom 40% (below iris = lower conjunctiva)
         # We take a slightly wider and taller region to ensure we don't cut off tissue
@@ -445,7 +689,7 @@ class EyeExtractor:
         conj_left = max(0, x - int(w * 0.05))
         conj_right = min(image.shape[1], x + w + int(w * 0.05))
         
-        roi = image[conj_top:conj_bottom, conj_left:conj_right]
+        roi, _ = self._bounded_roi(image, conj_top, conj_bottom, conj_left, conj_right)
         if roi.size == 0:
             return None
         
@@ -462,19 +706,17 @@ class EyeExtractor:
         axes = (int(rw * 0.45), int(rh * 0.7))
         cv2.ellipse(mask, (center_x, center_y), axes, 0, 0, 180, 255, -1)
         
-        # --- NEW: Color Refinement ---
-        mask = self._refine_with_color_mask(roi, mask)
-        
-        segmented = cv2.bitwise_and(roi, roi, mask=mask)
+        # --- Color Refinement + validation stats ---
+        stats = self._analyze_roi(roi, mask)
         
         # Validate result
-        if not self._validate_conjunctiva(segmented, mask):
+        if stats['failure']:
             return None
         
         # Tight crop to remove excessive black space
-        tissue = self._tight_crop(segmented)
+        tissue = self._crop_tissue(roi, stats)
         if tissue is None:
-            return segmented # return raw if tight crop fails
+            return None
             
         if debug:
             self._save_debug_roi(tissue, "haar_masked", session_id)
@@ -485,12 +727,13 @@ class EyeExtractor:
     #  METHOD 4: EDGE DETECTION + LOWER REGION
     # =====================================================================
     
-    def _extract_lower_with_edges(self, image: np.ndarray, debug: bool = False, session_id: str = None) -> np.ndarray:
+    def _extract_lower_with_edges(self, image: np.ndarray, debug: bool = False, session_id: str = None,
+                                  analysis: ImageAnalysis = None) -> np.ndarray:
         """
         Fallback: edge detection to find eye contour, extract bottom 35%.
         """
-        h, w = image.shape[:2]
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        analysis = analysis or ImageAnalysis(image, self)
+        gray = analysis.gray
         
         blurred = cv2.GaussianBlur(gray, (5, 5), 0)
         edges = cv2.Canny(blurred, 30, 100)
@@ -503,19 +746,18 @@ class EyeExtractor:
             return None
         
         largest = max(contours, key=cv2.contourArea)
-        x, y, bw, bh = cv2.boundingRect(largest)
+        x, y, bw, bh = analysis.to_original(*cv2.boundingRect(largest))
         
         # Focus on LOWER 35% only (below iris region)
         conj_y = y + int(bh * 0.55)
         conj_h = int(bh * 0.35)
         
-        tissue = image[conj_y:conj_y + conj_h, x:x + bw]
+        tissue, _ = self._bounded_roi(image, conj_y, conj_y + conj_h, x, x + bw)
         if tissue.size == 0:
             return None
         
-        # Validate result (using a full mask for the ROI)
-        dummy_mask = np.ones(tissue.shape[:2], dtype=np.uint8) * 255
-        if not self._validate_conjunctiva(tissue, dummy_mask):
+        # Validate result (whole ROI)
+        if self._analyze_roi(tissue, refine=False)['failure']:
             return None
         
         if debug:
@@ -536,11 +778,10 @@ class EyeExtractor:
         size = min(h // 2, w)  # half height, full width
         x = (w - size) // 2
         y = h // 2  # start from the middle (lower half)
-        crop = image[y:y+size, x:x+size]
+        crop, _ = self._bounded_roi(image, y, y + size, x, x + size)
         
-        # Validate result (using a full mask for the ROI)
-        dummy_mask = np.ones(crop.shape[:2], dtype=np.uint8) * 255
-        if not self._validate_conjunctiva(crop, dummy_mask):
+        # Validate result (whole ROI)
+        if self._analyze_roi(crop, refine=False)['failure']:
             return None
         
         if debug:
@@ -548,133 +789,135 @@ class EyeExtractor:
             
         return self._resize_and_pad(crop)
     
-    def _refine_with_color_mask(self, roi: np.ndarray, initial_mask: np.ndarray) -> np.ndarray:
-        """
-        Refine a mask by targeting only the primary pink/red tissue blob.
-        Ultra-aggressive filtering to remove any skin or hair.
-        """
-        # 1. HSV Filtering (Standard)
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-        lower_red1 = np.array([0, 50, 60])    # High min saturation for tissue
-        upper_red1 = np.array([15, 255, 255])
-        lower_red2 = np.array([160, 50, 60])
-        upper_red2 = np.array([179, 255, 255])
-        mask_hsv = cv2.bitwise_or(cv2.inRange(hsv, lower_red1, upper_red1), 
-                                 cv2.inRange(hsv, lower_red2, upper_red2))
-        
-        # 2. Lab Color Space Filtering (Excellent for Red/Pink tissue)
-        # 'a' channel represents Green-Red axis. High values = Red/Pink.
-        lab = cv2.cvtColor(roi, cv2.COLOR_BGR2Lab)
-        a_channel = lab[:, :, 1]
-        _, mask_lab = cv2.threshold(a_channel, 130, 255, cv2.THRESH_BINARY) # tissue is usually >145
-        
-        # 3. Brightness mask
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        _, bright_mask = cv2.threshold(gray, self.dark_pixel_threshold + 5, 255, cv2.THRESH_BINARY)
-        
-        # Combine filters
-        refined = cv2.bitwise_and(mask_hsv, mask_lab)
-        refined = cv2.bitwise_and(refined, bright_mask)
-        refined = cv2.bitwise_and(refined, initial_mask)
-        
-        # 4. Cleaning
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        refined = cv2.morphologyEx(refined, cv2.MORPH_OPEN, kernel, iterations=1)
-        
-        # 5. Connected Components: Keep ONLY the single best "crescent" blob
-        num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(refined, connectivity=8)
-        
-        if num_labels < 2:
-            return refined
-            
-        best_label = -1
-        max_score = -1
-        
-        for i in range(1, num_labels):
-            area = stats[i, cv2.CC_STAT_AREA]
-            w_blob = stats[i, cv2.CC_STAT_WIDTH]
-            h_blob = stats[i, cv2.CC_STAT_HEIGHT]
-            aspect = w_blob / h_blob if h_blob > 0 else 1
-            
-            # Score blobs based on Area and Aspect ratio (crescents are wide)
-            if area > 100:
-                score = area * min(aspect, 5.0) # Reward width but cap reward
-                if score > max_score:
-                    max_score = score
-                    best_label = i
-        
-        final_mask = np.zeros_like(refined)
-        if best_label != -1:
-            final_mask[labels == best_label] = 255
-            
-        return final_mask
-
     # =====================================================================
-    #  HELPER FUNCTIONS
+    #  ROI ANALYSIS (refinement + validation + tight crop in one pass)
     # =====================================================================
     
-    def _validate_conjunctiva(self, segmented: np.ndarray, mask: np.ndarray) -> bool:
+    def _analyze_roi(self, roi: np.ndarray, initial_mask: np.ndarray = None, refine: bool = True) -> dict:
         """
-        Validate that the extracted region is usable for clinical inference.
+        Analyze a candidate ROI from one set of color conversions.
         
-        Checks:
+        refine=True narrows initial_mask to the primary pink/red tissue blob
+        (HSV + Lab 'a' channel + brightness, opened, best crescent-shaped
+        connected component). The masked pixels are then checked for
+        clinical usability:
         - Not too many dark pixels (iris is dark)
         - Not overexposed (saturation)
         - Resolution meets minimum feature requirement
-        """
-        # Get pixels within mask
-        gray = cv2.cvtColor(segmented, cv2.COLOR_BGR2GRAY)
-        tissue_pixels = gray[mask > 0]
+        - Enough tissue area
         
-        if len(tissue_pixels) == 0:
-            return False
+        Args:
+            roi: BGR crop
+            initial_mask: uint8 mask (None = whole ROI)
+            refine: apply the color / blob refinement
             
-        # Check resolution (Fail-safe for low-res inputs)
-        # We check the bounding box of non-zero pixels
-        coords = cv2.findNonZero(mask)
-        if coords is not None:
-            _, _, w, h = cv2.boundingRect(coords)
-            if w < self.min_roi_width or h < self.min_roi_height:
-                logger.warning(f"Resolution too low: {w}x{h} (Min: {self.min_roi_width}x{self.min_roi_height})")
-                return False
-        
-        # Check dark pixel ratio (iris contamination / underexposure)
-        dark_count = np.sum(tissue_pixels < self.dark_pixel_threshold)
-        dark_ratio = dark_count / len(tissue_pixels)
-        if dark_ratio > self.max_dark_ratio:
-            logger.warning(f"Failed exposure/dark check: {dark_ratio:.1%} dark pixels")
-            return False
+        Returns:
+            dict with 'mask' (None = whole ROI), 'bbox' of the tissue (x, y, w, h)
+            or None, 'area', 'dark_ratio', 'overexposed_ratio', 'blob_score'
+            and 'failure' (None if the ROI is usable)
+        """
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        mask = initial_mask
+        blob_score = None
+        
+        if refine:
+            # 1. HSV Filtering (high min saturation for tissue, both red hue ranges)
+            hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+            refined = cv2.bitwise_or(cv2.inRange(hsv, (0, 50, 60), (15, 255, 255)),
+                                     cv2.inRange(hsv, (160, 50, 60), (179, 255, 255)))
             
-        # Check overexposure (Saturation check)
-        over_count = np.sum(tissue_pixels > self.overexposed_threshold)
-        over_ratio = over_count / len(tissue_pixels)
-        if over_ratio > self.max_overexposed_ratio:
+            # 2. Lab 'a' channel (Green-Red axis; tissue is usually >145)
+            a_channel = cv2.extractChannel(cv2.cvtColor(roi, cv2.COLOR_BGR2Lab), 1)
+            cv2.bitwise_and(refined, cv2.threshold(a_channel, 130, 255, cv2.THRESH_BINARY)[1], dst=refined)
+            
+            # 3. Brightness mask
+            cv2.bitwise_and(refined, cv2.threshold(gray, self.dark_pixel_threshold + 5, 255, cv2.THRESH_BINARY)[1], dst=refined)
+            if initial_mask is not None:
+                cv2.bitwise_and(refined, initial_mask, dst=refined)
+            
+            # 4. Cleaning
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+            refined = cv2.morphologyEx(refined, cv2.MORPH_OPEN, kernel, iterations=1)
+            
+            # 5. Keep ONLY the single best "crescent" blob: score = area * capped
+            #    aspect (crescents are wide), blobs of <= 100 px never win
+            num_labels, labels, cc_stats, _ = cv2.connectedComponentsWithStats(refined, connectivity=8)
+            blob_score = 0.0
+            if num_labels >= 2:
+                area = cc_stats[1:, cv2.CC_STAT_AREA].astype(np.float64)
+                width = cc_stats[1:, cv2.CC_STAT_WIDTH]
+                height = cc_stats[1:, cv2.CC_STAT_HEIGHT]
+                aspect = np.where(height > 0, width / np.maximum(height, 1), 1.0)
+                scores = np.where(area > 100, area * np.minimum(aspect, 5.0), -1.0)
+                best = int(np.argmax(scores))
+                if scores[best] > 0:
+                    blob_score = float(scores[best])
+                    refined = cv2.compare(labels, best + 1, cv2.CMP_EQ)
+                else:
+                    refined[:] = 0
+            mask = refined
+        
+        # Exposure statistics of the masked pixels from one histogram
+        hist = cv2.calcHist([gray], [0], mask, [256], [0, 256]).ravel()
+        area = int(hist.sum())
+        dark_ratio = float(hist[:self.dark_pixel_threshold].sum() / area) if area else 0.0
+        over_ratio = float(hist[self.overexposed_threshold + 1:].sum() / area) if area else 0.0
+        
+        # Tissue bounding box (the tight crop). Unrefined masks may still
+        # cover black pixels, so those are excluded like the tissue itself.
+        if mask is None:
+            bbox = (0, 0, roi.shape[1], roi.shape[0])
+        elif refine:
+            bbox = cv2.boundingRect(mask) if area else None
+        else:
+            visible = cv2.bitwise_and(cv2.threshold(gray, 5, 255, cv2.THRESH_BINARY)[1], mask)
+            bbox = cv2.boundingRect(visible) if cv2.countNonZero(visible) else None
+        
+        stats = {
+            'mask': mask,
+            'bbox': bbox,
+            'area': area,
+            'dark_ratio': dark_ratio,
+            'overexposed_ratio': over_ratio,
+            'blob_score': blob_score,
+            'failure': None,
+        }
+        
+        # ---- Validation (same order and thresholds as the clinical checks) ----
+        if area == 0:
+            stats['failure'] = 'empty'
+            return stats
+        
+        mask_w, mask_h = (cv2.boundingRect(mask)[2:] if mask is not None else (roi.shape[1], roi.shape[0]))
+        if mask_w < self.min_roi_width or mask_h < self.min_roi_height:
+            logger.warning(f"Resolution too low: {mask_w}x{mask_h} (Min: {self.min_roi_width}x{self.min_roi_height})")
+            stats['failure'] = 'low_resolution'
+        elif dark_ratio > self.max_dark_ratio:
+            logger.warning(f"Failed exposure/dark check: {dark_ratio:.1%} dark pixels")
+            stats['failure'] = 'too_dark'
+        elif over_ratio > self.max_overexposed_ratio:
             logger.warning(f"Failed exposure/overexposed check: {over_ratio:.1%} saturated pixels")
-            return False
-        
-        # Check minimum tissue area
-        if len(tissue_pixels) < 200: # Increased from 50 for clinical robustness
-            logger.warning(f"Tissue area too small: {len(tissue_pixels)}px")
-            return False
-        
-        return True
+            stats['failure'] = 'overexposed'
+        elif area < 200:  # Increased from 50 for clinical robustness
+            logger.warning(f"Tissue area too small: {area}px")
+            stats['failure'] = 'too_small'
+        return stats
     
-    def _tight_crop(self, segmented: np.ndarray) -> np.ndarray:
-        """Crop tightly to non-zero pixels (tissue region)."""
-        gray = cv2.cvtColor(segmented, cv2.COLOR_BGR2GRAY)
-        mask_pts = np.column_stack(np.where(gray > 5))
-        
-        if len(mask_pts) == 0:
+    def _crop_tissue(self, roi: np.ndarray, stats: dict) -> np.ndarray:
+        """Tight crop to the tissue bounding box; only the crop is masked."""
+        if stats['bbox'] is None:
             return None
-        
-        y_min, x_min = mask_pts.min(axis=0)
-        y_max, x_max = mask_pts.max(axis=0)
-        tissue = segmented[y_min:y_max+1, x_min:x_max+1]
-        
-        if tissue.size == 0:
+        x, y, w, h = stats['bbox']
+        crop = roi[y:y+h, x:x+w]
+        if crop.size == 0:
             return None
-        
-        return tissue
+        if stats['mask'] is None:
+            return crop
+        return cv2.bitwise_and(crop, crop, mask=stats['mask'][y:y+h, x:x+w])
+    
+    # =====================================================================
+    #  HELPER FUNCTIONS
+    # =====================================================================
     
     def _resize_and_pad(self, tissue: np.ndarray) -> np.ndarray:
         """
@@ -768,7 +1011,7 @@ class EyeExtractor:
         # --- MediaPipe landmark detection ---
         try:
             image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            results = self.face_mesh.process(image_rgb)
+            results = self._process_face_mesh(image_rgb)
             
             if results.multi_face_landmarks:
                 landmarks = results.multi_face_landmarks[0]
@@ -1,6 +1,12 @@
 """
 gradcam.py - GradCAM heatmap generation
 Output: Overlay image only (as per your decision)
+Heatmaps for a whole batch are computed in one compiled graph (forward,
+gradient, pooling, ReLU, normalization and resize on-device) and come back
+as uint8, so a micro-batch of requests costs one call. The same graph also
+returns the probability, so a request that wants a heatmap needs only one
+pass through the model (see infer()). ExplanationEngine computes Grad-CAM
+and Grad-CAM++ maps for several conv layers from a single backward pass.
 Path: src/gradcam.py
 """
 
@@ -9,9 +15,29 @@ import numpy as np
 import cv2
 from pathlib import Path
 import sys
+import time
 
 sys.path.append(str(Path(__file__).parent))
-from config import LAST_CONV_LAYER, GRADCAM_DIR
+from config import LAST_CONV_LAYER, GRADCAM_DIR, INPUT_SIZE, EXPLAIN_LAYERS, EXPLAIN_VARIANTS
+
+
+def _class_loss(predictions, class_idx):
+    """Per-image score to explain. class_idx: 1 / 0 / -1 (predicted class) per image."""
+    # Binary model output shape is (batch, 1): probability of Class 1 (Anemic)
+    prob = predictions[:, 0]
+    predicted = tf.cast(prob > 0.5, tf.int32)
+    target = tf.where(class_idx < 0, predicted, class_idx)
+    # Anemic: maximize output, Non-Anemic: maximize (1 - output)
+    return prob, tf.where(target == 1, prob, 1 - prob)
+
+
+def _to_uint8_maps(cam):
+    """(batch, h, w) class activation maps -> ReLU, per-map [0, 255], resized to the input."""
+    cam = tf.nn.relu(cam)
+    peak = tf.reduce_max(cam, axis=(1, 2), keepdims=True)
+    cam = cam / tf.where(peak > 0, peak, tf.ones_like(peak))
+    cam = tf.image.resize(cam[..., None], (INPUT_SIZE, INPUT_SIZE))[..., 0]
+    return tf.cast(tf.round(tf.clip_by_value(cam, 0.0, 1.0) * 255.0), tf.uint8)
 
 class GradCAM:
     """
@@ -50,60 +76,107 @@ class GradCAM:
             inputs=[self.model.inputs],
             outputs=[self.conv_layer.output, self.model.output]
         )
+        
+        # Compiled batch functions (the batch dimension is left open so every
+        # micro-batch size reuses the same traced graph)
+        images_spec = tf.TensorSpec([None, INPUT_SIZE, INPUT_SIZE, 3], tf.float32)
+        self._explain = tf.function(
+            self._compute_explained,
+            input_signature=[images_spec, tf.TensorSpec([None], tf.int32)]
+        )
+        self._forward = tf.function(
+            lambda images: self.grad_model(images, training=False),
+            input_signature=[images_spec]
+        )
     
-    def generate_heatmap(self, image, class_idx=None):
+    def _compute_explained(self, images, class_idx):
         """
-        Generate GradCAM heatmap
+        Forward + backward pass and heatmap reduction for a batch.
+        class_idx: per image, 1 = Anemic, 0 = Non-Anemic, -1 = predicted class
+        Returns (probabilities, conv activations, (batch, INPUT_SIZE, INPUT_SIZE) uint8 heatmaps).
+        """
+        with tf.GradientTape() as tape:
+            conv_output, predictions = self.grad_model(images, training=False)
+            prob, loss = _class_loss(predictions, class_idx)
+        # Each image's loss only depends on its own activations, so one
+        # gradient call gives per-image gradients
+        grads = tape.gradient(loss, conv_output)
+        
+        # Global average pooling -> channel weights (batch, channels)
+        weights = tf.reduce_mean(grads, axis=(1, 2))
+        
+        # Weighted mean over channels, then ReLU + normalize each map
+        heatmap = tf.reduce_mean(conv_output * weights[:, None, None, :], axis=-1)
+        return prob, conv_output, _to_uint8_maps(heatmap)
+    
+    def warmup(self, batch_sizes=(1,)):
+        """Trace the compiled functions before the first request."""
+        for size in batch_sizes:
+            dummy = tf.zeros((size, INPUT_SIZE, INPUT_SIZE, 3), tf.float32)
+            self._explain(dummy, tf.fill([size], -1))
+            self._forward(dummy)
+    
+    def infer(self, images, heatmap=True, class_idx=None):
+        """
+        Probability, conv activations and (optionally) the GradCAM heatmap
+        from ONE pass through the model
         
         Args:
-            image: Preprocessed image (1,64,64,3)
-            class_idx: 0 for Non-Anemic, 1 for Anemic (None = predicted class)
+            images: Preprocessed images (N,64,64,3) or a single (64,64,3)
+            heatmap: False = forward pass only (no gradient)
+            class_idx: see generate_heatmaps
             
         Returns:
-            heatmap: Raw heatmap array
+            dict with 'probability' (N,) float32, 'activations' (N,h,w,c)
+            float32 and 'heatmaps' (N,64,64) uint8 or None
         """
-        # Ensure image has batch dimension
-        if len(image.shape) == 3:
-            image = np.expand_dims(image, axis=0)
-        
-        with tf.GradientTape() as tape:
-            conv_output, predictions = self.grad_model(image)
-            
-            # Binary model output shape is (batch, 1)
-            # predictions[0][0] is probability of Class 1 (Anemic)
-            prob = predictions[0][0]
-            
-            if class_idx is None:
-                class_idx = 1 if prob > 0.5 else 0
-            
-            # For binary classification with 1 output node:
-            # If class_idx == 1 (Anemic), maximize output
-            # If class_idx == 0 (Non-Anemic), maximize (1 - output)
-            if class_idx == 1:
-                loss = predictions[:, 0]
-            else:
-                loss = 1 - predictions[:, 0]
-        
-        # Calculate gradients
-        grads = tape.gradient(loss, conv_output)
+        images = np.asarray(images, dtype=np.float32)
+        if images.ndim == 3:
+            images = np.expand_dims(images, axis=0)
         
-        # Global average pooling
-        pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+        if not heatmap:
+            conv_output, predictions = self._forward(tf.convert_to_tensor(images))
+            return {'probability': predictions.numpy()[:, 0], 'activations': conv_output.numpy(), 'heatmaps': None}
         
-        # Weight conv outputs
-        conv_output = conv_output[0]
-        pooled_grads = pooled_grads[0]
+        prob, conv_output, heatmaps = self._explain(tf.convert_to_tensor(images), self._targets(class_idx, len(images)))
+        return {'probability': prob.numpy(), 'activations': conv_output.numpy(), 'heatmaps': heatmaps.numpy()}
+    
+    @staticmethod
+    def _targets(class_idx, count):
+        if class_idx is None:
+            return tf.fill([count], -1)
+        return tf.convert_to_tensor(np.broadcast_to(np.asarray(class_idx, np.int32), (count,)))
+    
+    def generate_heatmaps(self, images, class_idx=None):
+        """
+        Generate GradCAM heatmaps for a batch in one compiled call
         
-        # Vectorized multiplication (broadcasting)
-        conv_output = conv_output * pooled_grads
+        Args:
+            images: Preprocessed images (N,64,64,3) or a single (64,64,3)
+            class_idx: None (predicted class), 0 / 1 for every image, or one per image
+            
+        Returns:
+            heatmaps: (N,64,64) uint8 array, 255 = strongest activation
+        """
+        images = np.asarray(images, dtype=np.float32)
+        if images.ndim == 3:
+            images = np.expand_dims(images, axis=0)
         
-        # Create heatmap
-
-        heatmap = np.mean(conv_output, axis=-1)
-        heatmap = np.maximum(heatmap, 0)
-        heatmap /= np.max(heatmap) if np.max(heatmap) > 0 else 1
+        _, _, heatmaps = self._explain(tf.convert_to_tensor(images), self._targets(class_idx, len(images)))
+        return heatmaps.numpy()
+    
+    def generate_heatmap(self, image, class_idx=None):
+        """
+        Generate GradCAM heatmap
         
-        return heatmap
+        Args:
+            image: Preprocessed image (1,64,64,3)
+            class_idx: 0 for Non-Anemic, 1 for Anemic (None = predicted class)
+            
+        Returns:
+            heatmap: (64,64) uint8 heatmap
+        """
+        return self.generate_heatmaps(image, class_idx)[0]
     
     def overlay_heatmap(self, image, heatmap, alpha=0.4):
         """
@@ -111,17 +184,20 @@ class GradCAM:
         
         Args:
             image: Original image (64,64,3) - RGB
-            heatmap: GradCAM heatmap
+            heatmap: GradCAM heatmap (uint8, or float in [0, 1])
             alpha: Transparency
             
         Returns:
             Overlayed image (RGB) - THIS IS THE ONLY OUTPUT
         """
+        if heatmap.dtype != np.uint8:
+            heatmap = np.uint8(255 * heatmap)
         # Resize heatmap to image size
-        heatmap_resized = cv2.resize(heatmap, (image.shape[1], image.shape[0]))
-        
+        if heatmap.shape[:2] != image.shape[:2]:
+            heatmap = cv2.resize(heatmap, (image.shape[1], image.shape[0]))
+
         # Convert to RGB heatmap
-        heatmap_colored = cv2.applyColorMap(np.uint8(255 * heatmap_resized), cv2.COLORMAP_JET)
+        heatmap_colored = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
         heatmap_colored = cv2.cvtColor(heatmap_colored, cv2.COLOR_BGR2RGB)
         
         # Superimpose
@@ -155,6 +231,115 @@ class GradCAM:
         return overlay
 
 
+# =====================================================================
+#  MULTI-LAYER / GRAD-CAM++
+# =====================================================================
+
+def _gradcam_map(conv_output, grads):
+    """Grad-CAM: channel weights = spatial mean of the gradients."""
+    weights = tf.reduce_mean(grads, axis=(1, 2))
+    return _to_uint8_maps(tf.reduce_mean(conv_output * weights[:, None, None, :], axis=-1))
+
+
+def _gradcam_pp_map(conv_output, grads):
+    """
+    Grad-CAM++: per-pixel weights alpha = g^2 / (2 g^2 + sum(A) g^3) on the
+    positive gradients (closed form from Chattopadhyay et al., 2018).
+    """
+    grads_2 = tf.square(grads)
+    grads_3 = grads_2 * grads
+    sum_activations = tf.reduce_sum(conv_output, axis=(1, 2), keepdims=True)
+    denominator = 2.0 * grads_2 + sum_activations * grads_3
+    alphas = grads_2 / tf.where(denominator != 0.0, denominator, tf.ones_like(denominator))
+    weights = tf.reduce_sum(alphas * tf.nn.relu(grads), axis=(1, 2))
+    return _to_uint8_maps(tf.reduce_sum(conv_output * weights[:, None, None, :], axis=-1))
+
+
+VARIANTS = {
+    'gradcam': _gradcam_map,
+    'gradcam++': _gradcam_pp_map,
+}
+
+
+class ExplanationEngine:
+    """
+    Grad-CAM / Grad-CAM++ maps for several conv layers. One tape records
+    the activations of every target layer and one backward pass gives all
+    their gradients; each variant is then a cheap on-device reduction.
+    """
+    
+    def __init__(self, model, layer_names=EXPLAIN_LAYERS, variants=EXPLAIN_VARIANTS):
+        """
+        Args:
+            model: Frozen Keras model
+            layer_names: Conv layers to explain (None = every Conv2D layer)
+            variants: Names from VARIANTS
+        """
+        self.model = model
+        if layer_names is None:
+            layer_names = [layer.name for layer in model.layers if isinstance(layer, tf.keras.layers.Conv2D)]
+        layers = {layer.name: layer for layer in model.layers}
+        missing = [name for name in layer_names if name not in layers]
+        if missing:
+            raise ValueError(f"Unknown layers for explanation: {missing}")
+        unknown = [v for v in variants if v not in VARIANTS]
+        if unknown:
+            raise ValueError(f"Unknown explanation variants: {unknown} (known: {list(VARIANTS)})")
+        self.layer_names = list(layer_names)
+        self.variants = list(variants)
+        
+        self.grad_model = tf.keras.models.Model(
+            inputs=[model.inputs],
+            outputs=[[layers[name].output for name in self.layer_names], model.output]
+        )
+        self._gradients = tf.function(
+            self._compute_gradients,
+            input_signature=[
+                tf.TensorSpec([None, INPUT_SIZE, INPUT_SIZE, 3], tf.float32),
+                tf.TensorSpec([None], tf.int32),
+            ]
+        )
+        # Traced once per layer shape
+        self._reducers = {name: tf.function(VARIANTS[name]) for name in self.variants}
+    
+    def _compute_gradients(self, images, class_idx):
+        with tf.GradientTape() as tape:
+            conv_outputs, predictions = self.grad_model(images, training=False)
+            prob, loss = _class_loss(predictions, class_idx)
+        return prob, conv_outputs, tape.gradient(loss, conv_outputs)
+    
+    def explain(self, images, class_idx=None):
+        """
+        Every variant for every target layer
+        
+        Args:
+            images: Preprocessed images (N,64,64,3) or a single (64,64,3)
+            class_idx: None (predicted class), 0 / 1 for every image, or one per image
+            
+        Returns:
+            dict with 'probability' (N,), 'maps' {layer: {variant: (N,64,64) uint8}}
+            and 'timings_ms' {'gradients': shared pass, <variant>: all layers}
+        """
+        images = np.asarray(images, dtype=np.float32)
+        if images.ndim == 3:
+            images = np.expand_dims(images, axis=0)
+        
+        start = time.perf_counter()
+        prob, conv_outputs, grads = self._gradients(tf.convert_to_tensor(images),
+                                                    GradCAM._targets(class_idx, len(images)))
+        prob = prob.numpy()   # waits for the pass to finish
+        timings = {'gradients': (time.perf_counter() - start) * 1000}
+        
+        maps = {name: {} for name in self.layer_names}
+        for variant, reduce in self._reducers.items():
+            start = time.perf_counter()
+            for name, conv_output, layer_grads in zip(self.layer_names, conv_outputs, grads):
+                maps[name][variant] = reduce(conv_output, layer_grads).numpy()
+            timings[variant] = (time.perf_counter() - start) * 1000
+        
+        return {'probability': prob, 'maps': maps, 'timings_ms': timings}
+
+
 def test_gradcam(model, image_path, save_heatmap=False):
     """Test function"""
     from tensorflow.keras.preprocessing import image as keras_image
@@ -2,23 +2,34 @@
 pipeline.py - Complete pipeline with organized image saving
 """
 
-import tensorflow as tf
 import numpy as np
 import cv2
 from pathlib import Path
 import sys
 import logging
-from datetime import datetime
+import threading
+import time
+import mimetypes
 import uuid
 
 from eye_extractor import EyeExtractor
 from enhancer import MedicalEnhancer
-from gradcam import GradCAM
+from batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from artifact_writer import ArtifactWriter
+from artifact_store import ArtifactStore
+from fingerprint import perceptual_hash, fingerprint_file
+from backends import create_backend, KerasBackend
+from decision import diagnose
 import audit_logger
 from config import (
-    MODELS_DIR, ORIGINALS_DIR, CROPPED_DIR, HEATMAPS_DIR,
+    ORIGINALS_DIR, CROPPED_DIR, HEATMAPS_DIR, ARTIFACT_MANIFEST, INFERENCE_BACKEND,
     SEVERITY_THRESHOLDS, HB_ESTIMATES, USE_DIP,
-    SAVE_ORIGINAL, SAVE_CROPPED, SAVE_HEATMAP, ENV
+    SAVE_ORIGINAL, SAVE_CROPPED, SAVE_HEATMAP, ENV,
+    BATCH_ENABLED, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS,
+    WARMUP_BATCH_SIZES, WARMUP_GRADCAM, INPUT_SIZE,
+    MODEL_VERSION, CACHE_ENABLED, ARTIFACT_FORMAT, HEATMAP_FORMAT, PERCEPTUAL_HASH_ENABLED,
+    FUSED_GRADCAM, PERSIST_TISSUE, EXPLAIN_WAIT_SECONDS
 )
 
 MEDICAL_DISCLAIMER = (
@@ -36,45 +47,81 @@ class NetraAIPipeline:
         logger.info("NETRA AI - INITIALIZING PIPELINE")
         logger.info("=" * 60)
 
-        # Load model
-        model_path = MODELS_DIR / 'best_enhanced.h5'
-        if not model_path.exists():
-            raise FileNotFoundError(f"Model not found at {model_path}")
-        self.model = tf.keras.models.load_model(str(model_path))
-        logger.info(f"Model loaded: {model_path}")
+        # Load model through the configured backend (keras / tflite / onnx)
+        self.backend = create_backend(INFERENCE_BACKEND)
+        self.model = self.backend.model if isinstance(self.backend, KerasBackend) else None
+        logger.info(f"Model loaded: {self.backend.model_path}")
 
         # Initialize components
         self.extractor = EyeExtractor()
         self.enhancer = MedicalEnhancer() if USE_DIP else None
-        self.gradcam = GradCAM(self.model)
-        
-        # Rate Limiting (Simple implementation)
-        self.last_request_time = None
-        self.min_interval = 0.5 # 500ms between requests
+        self._gradcam = None
+        self._explainer = None
+        self._gradcam_lock = threading.Lock()
+
+        # Micro-batching: concurrent requests share one forward pass
+        self.batcher = None
+        self.heatmap_batcher = None
+        if BATCH_ENABLED:
+            self.batcher = MicroBatcher(
+                self._predict_batch,
+                max_batch_size=BATCH_MAX_SIZE,
+                max_wait_ms=BATCH_MAX_WAIT_MS,
+                name="anemia-model"
+            )
+            # Heatmaps of concurrent requests share one compiled GradCAM call
+            self.heatmap_batcher = MicroBatcher(
+                self._explain_batch,
+                max_batch_size=BATCH_MAX_SIZE,
+                max_wait_ms=BATCH_MAX_WAIT_MS,
+                name="gradcam"
+            )
+
+        # Results of already-seen images (retried uploads)
+        self.cache = PredictionCache() if CACHE_ENABLED else None
+        self.cache_version = f"{MODEL_VERSION}/{self.backend.name}"
+
+        # Saved images are encoded / written off the request path and stored
+        # once per content hash
+        self.artifacts = ArtifactWriter()
+        self.store = ArtifactStore(self.artifacts)
 
         # Log output directories
         logger.info(f"Originals will be saved to: {ORIGINALS_DIR}")
         logger.info(f"Cropped images will be saved to: {CROPPED_DIR}")
         logger.info(f"Heatmaps will be saved to: {HEATMAPS_DIR}")
-        logger.info("=" * 60)
+        logger.info(f"Artifact manifest: {ARTIFACT_MANIFEST}")
 
-    def _generate_filename(self, prefix: str, extension: str = ".jpg") -> str:
-        """Generate a unique filename with timestamp and UUID."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        return f"{prefix}_{timestamp}_{unique_id}{extension}"
+        # Trace compiled functions now instead of on the first request
+        self.ready = False
+        self.warmup()
+        self.ready = True
+        logger.info("=" * 60)
 
-    def _save_image(self, image: np.ndarray, directory: Path, prefix: str) -> Path:
-        """Save an image to the given directory with a generated filename."""
-        filename = self._generate_filename(prefix, ".jpg")
-        save_path = directory / filename
-        cv2.imwrite(str(save_path), image)
-        logger.debug(f"Saved: {save_path}")
-        return save_path
+    def warmup(self, batch_sizes=WARMUP_BATCH_SIZES, gradcam=WARMUP_GRADCAM):
+        """Run dummy batches through inference (and GradCAM) for each batch size."""
+        start = time.perf_counter()
+        for size in sorted(set(batch_sizes)):
+            self.backend.predict(np.zeros((size, INPUT_SIZE, INPUT_SIZE, 3), np.float32))
+        if gradcam:
+            self.gradcam.warmup(batch_sizes=sorted(set(batch_sizes)))
+        logger.info(f"Warmup done in {time.perf_counter() - start:.2f}s (batch sizes {sorted(set(batch_sizes))})")
+
+    def _save_image(self, image: np.ndarray, kind: str, label: str, prediction_id: str,
+                    session_id=None, extension: str = ARTIFACT_FORMAT, digest=None) -> Path:
+        """
+        Store an image in the content-addressed artifact store ('originals',
+        'cropped', 'heatmaps' or 'tissue'); identical images are only written once.
+        The label (source name, eye, diagnosis) is kept in the manifest.
+        Returns the stored path (None if the writer dropped it).
+        """
+        return self.store.put(image, kind, extension, scan_id=prediction_id,
+                              session_id=session_id, label=label, digest=digest)
 
     def predict(self, image_bgr, eye='left', save_heatmap=SAVE_HEATMAP,
                 save_original=SAVE_ORIGINAL, save_cropped=SAVE_CROPPED,
-                image_source=None, session_id=None, metadata=None, **kwargs):
+                image_source=None, session_id=None, metadata=None, fingerprint=None,
+                fused_gradcam=FUSED_GRADCAM, **kwargs):
         """
         Run full pipeline and save images to organized folders.
 
@@ -85,27 +132,55 @@ class NetraAIPipeline:
             image_source: Original filename or identifier (for naming)
             session_id: Optional session/user ID to include in folder structure
             metadata: Optional dictionary with clinical metadata (age, sex, hb, etc.)
+            fingerprint: SHA-256 of the encoded upload (fingerprint.UploadFingerprint);
+                         identifies the image in the cache, store and audit log
+            fused_gradcam: With save_heatmap, take the probability and the heatmap
+                           from one GradCAM pass instead of running the model twice
+                           (keras backend only; other backends always run inference
+                           on their own model)
             debug: Whether to save intermediate raw ROI before resizing
 
         Returns:
             Dictionary with results and saved file paths
         """
-        # ---- Rate Limiting ----
-        import time
-        now = time.time()
-        if self.last_request_time and (now - self.last_request_time) < self.min_interval:
-            return {
-                'success': False,
-                'error': "Rate limit exceeded. Please wait.",
-                'diagnosis': "INCONCLUSIVE"
-            }
-        self.last_request_time = now
-
         # ---- Defaults for logging ----
         prob = 0.0
         is_low_confidence = True
         final_diagnosis = "INCONCLUSIVE"
         extraction_method = "failed_or_unknown"
+        # Callers with only a decoded array fall back to hashing its pixels
+        image_hash = fingerprint or audit_logger.hash_image(image_bgr)
+        phash = perceptual_hash(image_bgr) if PERCEPTUAL_HASH_ENABLED else None
+        prediction_id = uuid.uuid4().hex
+
+        # ---- Duplicate image: reuse the earlier result ----
+        cache_key = None
+        if self.cache is not None:
+            cache_key = PredictionCache.make_key(image_hash, eye, self.cache_version)
+            cached = self.cache.get(cache_key)
+            if cached is not None and self._cache_covers(cached, save_heatmap, save_original, save_cropped):
+                # Still a scan of its own: new id, manifest refs to the stored images
+                # under this session (so /explain works for it) and an audit row
+                result = dict(cached, prediction_id=prediction_id, cache_hit=True,
+                              cached_prediction_id=cached['prediction_id'])
+                try:
+                    self.store.link(cached['prediction_id'], prediction_id, session_id=session_id)
+                except Exception as e:
+                    logger.warning(f"Could not reference cached artifacts for {prediction_id}: {e}")
+                audit_logger.log_inference(
+                    image_bgr=image_bgr,
+                    probability=float(cached['probability']),
+                    classification=cached['diagnosis'],
+                    is_low_confidence=bool(cached['is_low_confidence']),
+                    extraction_method=cached['extraction_method'],
+                    version=MODEL_VERSION,
+                    env=ENV,
+                    metadata=metadata,
+                    image_hash=image_hash,
+                    perceptual_hash=phash,
+                    cache_hit=True
+                )
+                return result
 
         try:
             # ---- Save original if requested ----
@@ -119,22 +194,20 @@ class NetraAIPipeline:
                     prefix = f"original_{eye}"
                 if session_id:
                     prefix = f"{session_id}_{prefix}"
-                original_path = self._save_image(image_bgr, ORIGINALS_DIR, prefix)
+                original_path = self._save_image(image_bgr, 'originals', prefix, prediction_id,
+                                                 session_id=session_id, digest=image_hash)
 
             # ---- Extract LOWER CONJUNCTIVA only ----
-            is_cropped = self.extractor.is_already_cropped(image_bgr)
-            if is_cropped:
-                tissue_bgr = cv2.resize(image_bgr, (64, 64))
-                extraction_method = "pre-cropped"
-            else:
-                # Use debug param if passed in via session_id or another way, here we can just pass debug=False for now since we'll add it to predict_from_file
-                debug = kwargs.get('debug', False)
-                tissue_bgr = self.extractor.extract_lower_conjunctiva(image_bgr, eye=eye, debug=debug, session_id=session_id)
-                extraction_method = "lower_conjunctiva_extraction"
+            debug = kwargs.get('debug', False)
+            tissue_bgr, extraction = self.extractor.extract_with_report(
+                image_bgr, eye=eye, debug=debug, session_id=session_id
+            )
+            is_cropped = extraction['method'] == "pre-cropped"
 
             if tissue_bgr is None:
                 extraction_method = "extraction_failed"
-                raise ValueError("Extraction failed, tissue is None")
+                raise ValueError(f"Extraction failed: {extraction['failure_reason']}")
+            extraction_method = extraction['method']
 
             if tissue_bgr.shape != (64, 64, 3):
                 tissue_bgr = cv2.resize(tissue_bgr, (64, 64))
@@ -149,15 +222,37 @@ class NetraAIPipeline:
                     prefix = f"cropped_{eye}"
                 if session_id:
                     prefix = f"{session_id}_{prefix}"
-                cropped_path = self._save_image(tissue_bgr, CROPPED_DIR, prefix)
+                cropped_path = self._save_image(tissue_bgr, 'cropped', prefix, prediction_id,
+                                                session_id=session_id)
+
+            # ---- Keep the exact model input for on-demand heatmaps (explain) ----
+            if PERSIST_TISSUE and not save_heatmap:
+                if image_source:
+                    prefix = f"{Path(image_source).stem}_tissue_{eye}"
+                else:
+                    prefix = f"tissue_{eye}"
+                if session_id:
+                    prefix = f"{session_id}_{prefix}"
+                self._save_image(tissue_bgr, 'tissue', prefix, prediction_id,
+                                 session_id=session_id, extension='.png')
 
             # ---- Preprocess for model ----
             model_input = self._preprocess_tissue(tissue_bgr, is_cropped=is_cropped)
 
             # ---- Model inference ----
-            prob = float(self.model.predict(model_input, verbose=0)[0][0])
-            threshold = 0.5
-            is_anemic = prob > threshold
+            fused = None
+            if save_heatmap and fused_gradcam and isinstance(self.backend, KerasBackend):
+                # One forward + backward pass gives the probability and the heatmap
+                try:
+                    fused = self._explain(model_input)
+                except Exception as e:
+                    logger.warning(f"Fused GradCAM failed, running inference alone: {e}")
+            heatmap = None
+            if fused is not None:
+                prob, heatmap = fused
+            else:
+                prob = self._infer(model_input)
+            is_anemic, is_low_confidence, final_diagnosis = diagnose(prob)
             confidence = prob if is_anemic else 1 - prob
 
             # ---- Severity estimation ----
@@ -173,11 +268,6 @@ class NetraAIPipeline:
             else:
                 severity = "Severe"
                 hb = HB_ESTIMATES['severe']
-            # ---- Confidence Guardrail (Clinical Requirement) ----
-            is_low_confidence = 0.45 <= prob <= 0.55
-            
-            # ---- Fail-Safe: Default to Inconclusive on low confidence ----
-            final_diagnosis = "INCONCLUSIVE" if is_low_confidence else ("ANEMIC" if is_anemic else "NORMAL")
             
             # ---- GradCAM ----
             heatmap_path = None
@@ -188,13 +278,16 @@ class NetraAIPipeline:
                     eye=eye,
                     prob=prob,
                     diagnosis=final_diagnosis.lower(),
-                    session_id=session_id
+                    session_id=session_id,
+                    prediction_id=prediction_id,
+                    heatmap=heatmap
                 )
 
             # ---- Result ----
             result = {
                 'success': True,
-                'version': 'v1.0.0',
+                'prediction_id': prediction_id,
+                'version': MODEL_VERSION,
                 'probability': prob,
                 'is_anemic': is_anemic if not is_low_confidence else None,
                 'diagnosis': final_diagnosis,
@@ -203,22 +296,30 @@ class NetraAIPipeline:
                 'severity': severity if not is_low_confidence else "Unknown",
                 'hemoglobin_estimate': hb if not is_low_confidence else None,
                 'extraction_method': extraction_method,
+                'extraction_timings_ms': extraction['timings_ms'],
+                'image_hash': image_hash,
+                'perceptual_hash': phash,
                 'original_image_path': str(original_path) if original_path else None,
                 'cropped_image_path': str(cropped_path) if cropped_path else None,
                 'heatmap_path': str(heatmap_path) if heatmap_path else None,
                 'medical_disclaimer': MEDICAL_DISCLAIMER
             }
+            if cache_key is not None:
+                self.cache.put(cache_key, result)
+                result['cache_hit'] = False
             
-            # ---- Audit Logging (Secure Immutable Append-Only) ----
+            # ---- Audit Logging (Hash-Chained Append-Only, see audit_verify.py) ----
             audit_logger.log_inference(
                 image_bgr=image_bgr,
                 probability=float(prob),
                 classification=final_diagnosis,
                 is_low_confidence=bool(is_low_confidence),
                 extraction_method=extraction_method,
-                version="v1.0.0",
+                version=MODEL_VERSION,
                 env=ENV,
-                metadata=metadata
+                metadata=metadata,
+                image_hash=image_hash,
+                perceptual_hash=phash
             )
             
             return result
@@ -232,16 +333,19 @@ class NetraAIPipeline:
                 classification=final_diagnosis,
                 is_low_confidence=bool(is_low_confidence),
                 extraction_method=extraction_method,
-                version="v1.0.0",
+                version=MODEL_VERSION,
                 env=ENV,
-                metadata=metadata
+                metadata=metadata,
+                image_hash=image_hash,
+                perceptual_hash=phash
             )
             return {
                 'success': False,
+                'prediction_id': prediction_id,
                 'error': str(e),
                 'diagnosis': "INCONCLUSIVE",
                 'is_low_confidence': True,
-                'version': 'v1.0.0',
+                'version': MODEL_VERSION,
                 'probability': 0.0,
                 'confidence': 0.0,
                 'original_image_path': None,
@@ -250,6 +354,114 @@ class NetraAIPipeline:
                 'medical_disclaimer': MEDICAL_DISCLAIMER
             }
 
+    @staticmethod
+    def _cache_covers(cached, save_heatmap, save_original, save_cropped):
+        """A cached result is only reused if it has every artifact this call asks for."""
+        wanted = (
+            (save_heatmap, 'heatmap_path'),
+            (save_original, 'original_image_path'),
+            (save_cropped, 'cropped_image_path'),
+        )
+        return all(cached.get(key) for flag, key in wanted if flag)
+
+    def cache_stats(self):
+        """Hit/miss counters of the prediction cache (None if disabled)."""
+        return self.cache.stats() if self.cache is not None else None
+
+    def _infer(self, model_input):
+        """Run the model on a single (1,64,64,3) input, batched if enabled."""
+        if self.batcher is not None:
+            return self.batcher.run(model_input[0])
+        return float(self.backend.predict(model_input)[0])
+
+    def _predict_batch(self, tensors):
+        """Batch callback for the MicroBatcher: list of (64,64,3) -> list of probs."""
+        probs = self.backend.predict(np.stack(tensors).astype(np.float32))
+        return [float(p) for p in probs]
+
+    def _explain(self, model_input):
+        """
+        (probability, (64,64) uint8 GradCAM heatmap) of a single (1,64,64,3)
+        input from one Keras forward + backward pass, batched if enabled.
+        """
+        if self.heatmap_batcher is not None:
+            return self.heatmap_batcher.run(model_input[0])
+        return self._explain_batch(model_input)[0]
+
+    def _explain_batch(self, tensors):
+        """Batch callback for the GradCAM MicroBatcher: list of (64,64,3) -> list of (prob, heatmap)."""
+        out = self.gradcam.infer(np.stack(tensors))
+        return [(float(p), h) for p, h in zip(out['probability'], out['heatmaps'])]
+
+    @property
+    def gradcam(self):
+        """
+        GradCAM needs gradients, i.e. the Keras model. With a lightweight
+        backend the Keras model is only loaded the first time a heatmap is asked for.
+        """
+        if self._gradcam is None:
+            with self._gradcam_lock:
+                if self._gradcam is None:
+                    from gradcam import GradCAM
+                    if self.model is None:
+                        self.model = KerasBackend().model
+                    self._gradcam = GradCAM(self.model)
+        return self._gradcam
+
+    @property
+    def explainer(self):
+        """Multi-layer Grad-CAM / Grad-CAM++ engine, built on first review."""
+        if self._explainer is None:
+            with self._gradcam_lock:
+                if self._explainer is None:
+                    from gradcam import ExplanationEngine
+                    if self.model is None:
+                        self.model = KerasBackend().model
+                    self._explainer = ExplanationEngine(self.model)
+        return self._explainer
+
+    def artifact_stats(self):
+        """Queue depth, written / dropped counts of the artifact writer."""
+        return self.artifacts.stats()
+
+    def audit_stats(self):
+        """Queue depth and batch / fsync counters of the audit writer."""
+        return audit_logger.stats()
+
+    def close(self):
+        """Flush saved images and audit rows and stop background threads."""
+        self.extractor.close()
+        self.artifacts.close()
+        self.store.close()
+        audit_logger.close()
+        if self.batcher is not None:
+            self.batcher.close()
+        if self.heatmap_batcher is not None:
+            self.heatmap_batcher.close()
+
+    def detector_stats(self):
+        """Live detector instances per type, loads so far and their mean load time."""
+        return self.extractor.detectors.stats()
+
+    def batching_stats(self):
+        """Occupancy counters of the inference batcher (None if disabled)."""
+        return self.batcher.stats() if self.batcher is not None else None
+
+    def heatmap_batching_stats(self):
+        """Occupancy counters of the GradCAM batcher (None if disabled)."""
+        return self.heatmap_batcher.stats() if self.heatmap_batcher is not None else None
+
+    def runtime_stats(self):
+        """Every counter reported by /metrics, keyed by its /metrics section."""
+        return {
+            'batching': self.batching_stats(),
+            'gradcam_batching': self.heatmap_batching_stats(),
+            'cache': self.cache_stats(),
+            'detectors': self.detector_stats(),
+            'artifacts': self.artifact_stats(),
+            'audit': self.audit_stats(),
+        }
+
     def _preprocess_tissue(self, tissue_bgr, is_cropped=False):
         """Convert tissue to model input tensor (Finalized: Raw only)."""
         # Strictly preserve original color distribution
@@ -258,8 +470,9 @@ class NetraAIPipeline:
         return np.expand_dims(tissue_norm, axis=0)
 
     def _generate_heatmap(self, model_input, tissue_bgr, image_source=None,
-                          eye='left', prob=None, diagnosis=None, session_id=None):
-        """Generate and save GradCAM heatmap."""
+                          eye='left', prob=None, diagnosis=None, session_id=None, prediction_id=None,
+                          heatmap=None):
+        """Generate (unless the fused pass already did) and save GradCAM heatmap."""
         try:
             # Build prefix
             if image_source:
@@ -273,23 +486,110 @@ class NetraAIPipeline:
             if session_id:
                 prefix = f"{session_id}_{prefix}"
 
-            filename = self._generate_filename(prefix, ".png")
-            save_path = HEATMAPS_DIR / filename
-
             # Convert BGR to RGB for overlay
             original_rgb = cv2.cvtColor(tissue_bgr, cv2.COLOR_BGR2RGB)
-            self.gradcam.generate_overlay(
-                model_input,
-                original_rgb,
-                save=True,
-                save_path=save_path
+            if heatmap is None:
+                _, heatmap = self._explain(model_input)
+            overlay = self.gradcam.overlay_heatmap(original_rgb, heatmap)
+            save_path = self._save_image(
+                cv2.cvtColor(overlay, cv2.COLOR_RGB2BGR), 'heatmaps', prefix, prediction_id,
+                session_id=session_id, extension=HEATMAP_FORMAT
             )
-            logger.info(f"Heatmap saved: {save_path}")
+            logger.info(f"Heatmap queued: {save_path}")
             return save_path
         except Exception as e:
             logger.warning(f"GradCAM failed: {e}")
             return None
 
+    def explain(self, prediction_id):
+        """
+        GradCAM overlay of an earlier prediction, generated on first request
+        from its stored tissue crop and kept in the artifact store after that.
+
+        Returns:
+            {'success', 'prediction_id', 'heatmap_path', 'generated',
+             'image' (encoded HEATMAP_FORMAT bytes), 'media_type'}
+            or {'success': False, 'error'} if the prediction has no stored tissue
+        """
+        refs = self.store.lookup(scan_id=prediction_id)
+        for ref in refs:
+            if ref['kind'] == 'heatmaps' and Path(ref['path']).exists():
+                return {'success': True, 'prediction_id': prediction_id, 'heatmap_path': ref['path'],
+                        'generated': False, 'image': Path(ref['path']).read_bytes(),
+                        'media_type': mimetypes.guess_type(ref['path'])[0]}
+
+        tissue, tissue_bgr = self._stored_tissue(refs)
+        if tissue_bgr is None:
+            return {'success': False, 'error': self._no_tissue_error(prediction_id)}
+
+        _, heatmap = self._explain(self._preprocess_tissue(tissue_bgr))
+        overlay = cv2.cvtColor(
+            self.gradcam.overlay_heatmap(cv2.cvtColor(tissue_bgr, cv2.COLOR_BGR2RGB), heatmap),
+            cv2.COLOR_RGB2BGR
+        )
+        ok, encoded = cv2.imencode(HEATMAP_FORMAT, overlay)
+        if not ok:
+            return {'success': False, 'error': "Could not encode heatmap"}
+
+        label = (tissue['label'] or "tissue").replace("_tissue_", "_heatmap_")
+        heatmap_path = self._save_image(overlay, 'heatmaps', label, prediction_id,
+                                        session_id=tissue['session_id'], extension=HEATMAP_FORMAT)
+        return {'success': True, 'prediction_id': prediction_id,
+                'heatmap_path': str(heatmap_path) if heatmap_path else None,
+                'generated': True, 'image': encoded.tobytes(),
+                'media_type': mimetypes.guess_type(f"heatmap{HEATMAP_FORMAT}")[0]}
+
+    def review(self, prediction_id):
+        """
+        Grad-CAM and Grad-CAM++ overlays of every EXPLAIN_LAYERS conv layer for
+        an earlier prediction (clinician review), from one backward pass.
+        Not cached: reviews are rare and the maps are cheap once computed.
+
+        Returns:
+            {'success', 'prediction_id', 'probability',
+             'overlays': {layer: {variant: encoded HEATMAP_FORMAT bytes}}, 'timings_ms'}
+        """
+        _, tissue_bgr = self._stored_tissue(self.store.lookup(scan_id=prediction_id))
+        if tissue_bgr is None:
+            return {'success': False, 'error': self._no_tissue_error(prediction_id)}
+
+        explanation = self.explainer.explain(self._preprocess_tissue(tissue_bgr))
+        tissue_rgb = cv2.cvtColor(tissue_bgr, cv2.COLOR_BGR2RGB)
+        overlays = {}
+        for layer, variants in explanation['maps'].items():
+            overlays[layer] = {}
+            for variant, maps in variants.items():
+                overlay = self.gradcam.overlay_heatmap(tissue_rgb, maps[0])
+                _, encoded = cv2.imencode(HEATMAP_FORMAT, cv2.cvtColor(overlay, cv2.COLOR_RGB2BGR))
+                overlays[layer][variant] = encoded.tobytes()
+        return {'success': True, 'prediction_id': prediction_id,
+                'probability': float(explanation['probability'][0]),
+                'overlays': overlays, 'timings_ms': explanation['timings_ms']}
+
+    @staticmethod
+    def _no_tissue_error(prediction_id):
+        if PERSIST_TISSUE:
+            return f"No stored tissue for prediction {prediction_id}"
+        return (f"No stored tissue for prediction {prediction_id} "
+                f"(set NETRA_EXPLAIN=1 to keep tissue crops for /explain)")
+
+    def _stored_tissue(self, refs):
+        """
+        (ref, BGR image) of the model input stored for a prediction: the
+        lossless tissue crop, else the saved (JPEG) crop. (None, None) if neither.
+        """
+        for kind in ('tissue', 'cropped'):
+            ref = next((r for r in refs if r['kind'] == kind), None)
+            if ref is None:
+                continue
+            if not Path(ref['path']).exists():
+                # Written in the background; it may still be queued
+                self.artifacts.flush(timeout=EXPLAIN_WAIT_SECONDS)
+            image = cv2.imread(ref['path'])
+            if image is not None:
+                return ref, image
+        return None, None
+
     def predict_from_file(self, image_path, eye='left',
                           save_heatmap=SAVE_HEATMAP,
                           save_original=SAVE_ORIGINAL,
@@ -327,6 +627,7 @@ class NetraAIPipeline:
             image_source=image_path.name,
             session_id=session_id,
             metadata=metadata,
+            fingerprint=fingerprint_file(image_path),
             debug=debug
         )
         result['input_image_path'] = str(image_path)
@@ -335,9 +636,25 @@ class NetraAIPipeline:
 
 # Global instance
 _pipeline = None
+_pipeline_lock = threading.Lock()
+
+def close_pipeline():
+    """Flush and stop this process's pipeline, if it was created."""
+    if _pipeline is not None:
+        _pipeline.close()
+
+def is_ready():
+    """True once this process's pipeline is loaded and warmed up."""
+    return _pipeline is not None and _pipeline.ready
+
+def pipeline_stats():
+    """runtime_stats() of this process's pipeline; None until it exists (never loads it)."""
+    return _pipeline.runtime_stats() if _pipeline is not None else None
 
 def get_pipeline():
     global _pipeline
     if _pipeline is None:
-        _pipeline = NetraAIPipeline()
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = NetraAIPipeline()
     return _pipeline
@@ -0,0 +1,151 @@
+"""
+prediction_cache.py - LRU + TTL cache of prediction results
+Keyed by image hash, eye and model version so retried uploads of the same
+image skip extraction and inference. Optional on-disk tier (one JSON file per
+entry) survives restarts and is shared by worker processes.
+Path: src/prediction_cache.py
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from config import (
+    CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL_SECONDS, CACHE_DISK_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """Thread-safe, size-bounded result cache with hit/miss counters."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 ttl_seconds=CACHE_TTL_SECONDS, disk_dir=CACHE_DISK_DIR):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # key -> (expires_at, size_bytes, result)
+        self._bytes = 0
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(image_hash: str, eye: str, model_version: str) -> str:
+        return f"{model_version}:{eye}:{image_hash}"
+
+    # =====================================================================
+    #  PUBLIC API
+    # =====================================================================
+
+    def get(self, key: str):
+        """Return a copy of the cached result, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return dict(result)
+                self._remove(key)
+
+        result = self._disk_get(key, now)
+        with self._lock:
+            if result is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._insert(key, result, now + self.ttl_seconds)
+        return dict(result)
+
+    def put(self, key: str, result: dict):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._insert(key, dict(result), expires_at)
+        self._disk_put(key, result, expires_at)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'disk_tier': str(self.disk_dir) if self.disk_dir else None,
+            }
+
+    # =====================================================================
+    #  MEMORY TIER
+    # =====================================================================
+
+    def _insert(self, key, result, expires_at):
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, size, result)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    # =====================================================================
+    #  DISK TIER
+    # =====================================================================
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.disk_dir / digest[:2] / f"{digest}.json"
+
+    def _disk_get(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry.get('key') != key or entry.get('expires_at', 0) <= now:
+            path.unlink(missing_ok=True)
+            return None
+        return entry['result']
+
+    def _disk_put(self, key, result, expires_at):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, 'w') as f:
+                json.dump({'key': key, 'expires_at': expires_at, 'result': result}, f, default=str)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Prediction cache disk write failed: {e}")
@@ -0,0 +1,137 @@
+"""
+quantize.py - Post-training INT8 quantization with an accuracy gate
+Calibrates on a representative sample of VAL_DIR, converts the
+create_enhanced_model network to a fully-integer TFLite model and compares
+it with the float model. The INT8 model is only published to
+INT8_MODEL_PATH if it agrees closely enough with float.
+Path: src/quantize.py
+
+Usage:
+    python quantize.py
+    python quantize.py --min-agreement 0.99 --calibration-samples 300
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+sys.path.append(str(Path(__file__).parent))
+from config import (
+    MODEL_PATH, INT8_MODEL_PATH, VAL_DIR, QUANT_CALIBRATION_SAMPLES,
+    QUANT_MIN_AGREEMENT, QUANT_MAX_MEAN_ABS_DIFF
+)
+from backends import KerasBackend, TFLiteBackend
+from data_loader import load_image_arrays
+from decision import diagnose
+from export_model import build_trained_model
+
+
+def convert_int8(model, calibration_images):
+    """Full-integer quantization (int8 weights, activations, input and output)."""
+    def representative_dataset():
+        for image in calibration_images:
+            yield [image[np.newaxis].astype(np.float32)]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+def compare(float_probs, int8_probs, labels=None):
+    """Agreement metrics between the float and INT8 models."""
+    float_dx = [diagnose(float(p)) for p in float_probs]
+    int8_dx = [diagnose(float(p)) for p in int8_probs]
+
+    report = {
+        'samples': int(len(float_probs)),
+        'mean_abs_diff': float(np.mean(np.abs(float_probs - int8_probs))),
+        'max_abs_diff': float(np.max(np.abs(float_probs - int8_probs))),
+        'diagnosis_agreement': float(np.mean([f[2] == q[2] for f, q in zip(float_dx, int8_dx)])),
+        'low_confidence_agreement': float(np.mean([f[1] == q[1] for f, q in zip(float_dx, int8_dx)])),
+        'float_low_confidence_rate': float(np.mean([f[1] for f in float_dx])),
+        'int8_low_confidence_rate': float(np.mean([q[1] for q in int8_dx])),
+    }
+    if labels is not None:
+        report['float_accuracy'] = float(np.mean([f[0] == bool(y) for f, y in zip(float_dx, labels)]))
+        report['int8_accuracy'] = float(np.mean([q[0] == bool(y) for q, y in zip(int8_dx, labels)]))
+    return report
+
+
+def passes_gate(report, min_agreement=QUANT_MIN_AGREEMENT, max_mean_abs_diff=QUANT_MAX_MEAN_ABS_DIFF):
+    """Return the list of failed checks (empty list = publishable)."""
+    failures = []
+    if report['diagnosis_agreement'] < min_agreement:
+        failures.append(f"final_diagnosis agreement {report['diagnosis_agreement']:.3f} < {min_agreement}")
+    if report['low_confidence_agreement'] < min_agreement:
+        failures.append(f"low-confidence band agreement {report['low_confidence_agreement']:.3f} < {min_agreement}")
+    if report['mean_abs_diff'] > max_mean_abs_diff:
+        failures.append(f"mean |Δprob| {report['mean_abs_diff']:.4f} > {max_mean_abs_diff}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8-quantize the NetraAI model with an accuracy gate")
+    parser.add_argument("--weights", default=str(MODEL_PATH))
+    parser.add_argument("--val-dir", default=str(VAL_DIR))
+    parser.add_argument("--output", default=str(INT8_MODEL_PATH))
+    parser.add_argument("--calibration-samples", type=int, default=QUANT_CALIBRATION_SAMPLES)
+    parser.add_argument("--min-agreement", type=float, default=QUANT_MIN_AGREEMENT)
+    parser.add_argument("--max-mean-abs-diff", type=float, default=QUANT_MAX_MEAN_ABS_DIFF)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("NETRA AI - INT8 QUANTIZATION")
+    print("=" * 60)
+
+    model = build_trained_model(args.weights)
+    calibration, _ = load_image_arrays(args.val_dir, limit=args.calibration_samples)
+    print(f"Calibrating on {len(calibration)} images from {args.val_dir}")
+    int8_bytes = convert_int8(model, calibration)
+
+    # Evaluate the candidate before it can be picked up by the service
+    images, labels = load_image_arrays(args.val_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        candidate_path = Path(tmp) / "candidate_int8.tflite"
+        candidate_path.write_bytes(int8_bytes)
+        int8_probs = TFLiteBackend(candidate_path).predict(images)
+    float_probs = KerasBackend(args.weights).predict(images)
+
+    report = compare(float_probs, int8_probs, labels)
+    report['size_kb'] = round(len(int8_bytes) / 1024, 1)
+    failures = passes_gate(report, args.min_agreement, args.max_mean_abs_diff)
+
+    for key, value in report.items():
+        print(f"  {key:<26} {value}")
+    print("=" * 60)
+
+    if failures:
+        print("NOT PUBLISHED — INT8 model failed the accuracy gate:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+
+    output = Path(args.output)
+    output.write_bytes(int8_bytes)
+    report.update({
+        'published_at': datetime.utcnow().isoformat(),
+        'source_weights': str(args.weights),
+        'thresholds': {'min_agreement': args.min_agreement, 'max_mean_abs_diff': args.max_mean_abs_diff},
+    })
+    output.with_suffix('.json').write_text(json.dumps(report, indent=2))
+    print(f"Published INT8 model: {output}")
+    print("Serve it with NETRA_BACKEND=tflite-int8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
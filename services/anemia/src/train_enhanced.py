@@ -12,7 +12,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 # Import modules
-from config import MODELS_DIR, LOGS_DIR, BATCH_SIZE, IMG_SIZE
+from config import MODELS_DIR, LOGS_DIR, BATCH_SIZE, IMG_SIZE, DATA_LOADER
 from data_loader import DataLoader
 from model import create_enhanced_model
 
@@ -25,9 +25,17 @@ class EnhancedTrainer:
     def prepare_data(self):
         """Load and prepare data"""
         print("📂 Loading data...")
-        self.train_gen, self.val_gen = self.data_loader.create_generators()
-        self.steps_per_epoch = self.train_gen.samples // BATCH_SIZE
-        self.val_steps = self.val_gen.samples // BATCH_SIZE
+        if DATA_LOADER == "tfdata":
+            self.train_ds, self.val_ds, self.train_samples, self.val_samples = self.data_loader.create_datasets()
+            # Finite datasets: Keras runs each epoch to the end of the data (last
+            # partial batch included) and restarts it. A step count would make
+            # Keras reuse one iterator across epochs and run out of data.
+            self.steps_per_epoch = None
+            self.val_steps = None
+        else:
+            self.train_gen, self.val_gen = self.data_loader.create_generators()
+            self.steps_per_epoch = self.train_gen.samples // BATCH_SIZE
+            self.val_steps = self.val_gen.samples // BATCH_SIZE
         
     def build_model(self):
         """Build enhanced model"""
@@ -91,10 +99,15 @@ class EnhancedTrainer:
         
         callbacks = self.get_callbacks()
         
+        if DATA_LOADER == "tfdata":
+            train_data, val_data = self.train_ds, self.val_ds
+        else:
+            train_data, val_data = self.train_gen, self.val_gen
+        
         self.history = self.model.fit(
-            self.train_gen,
+            train_data,
             steps_per_epoch=self.steps_per_epoch,
-            validation_data=self.val_gen,
+            validation_data=val_data,
             validation_steps=self.val_steps,
             epochs=epochs,
             callbacks=callbacks,
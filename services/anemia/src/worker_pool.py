@@ -0,0 +1,363 @@
+"""
+worker_pool.py - Supervised pool of anemia worker processes
+Each worker process owns its own NetraAIPipeline (model, FaceMesh, GradCAM).
+A dispatcher routes jobs to the least-loaded ready worker, a supervisor
+pings workers and respawns any that crash or hang, with exponential backoff
+and a cap on consecutive failures so a broken model cannot crash-loop the
+host. The pool reports not-ready while any worker is failing. Workers push their
+runtime counters every health interval from a side thread, so /metrics
+never waits behind predictions.
+Path: src/worker_pool.py
+"""
+
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+from config import (
+    EXECUTOR_WORKERS, WORKER_HEALTH_INTERVAL, WORKER_HEALTH_TIMEOUT,
+    WORKER_START_TIMEOUT, WORKER_RESTART_BACKOFF, WORKER_RESTART_BACKOFF_MAX,
+    WORKER_MAX_RESTARTS, WORKER_STABLE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+_PING = "__ping__"
+
+
+class WorkerCrashed(Exception):
+    """A worker died (or was killed as hung) while holding this job."""
+
+
+class WorkerError(Exception):
+    """A pipeline call raised inside a worker process."""
+
+
+def _report_stats(tag, pipeline, result_q, interval):
+    """Side thread of a worker: push pipeline.runtime_stats() every `interval` seconds."""
+    while True:
+        try:
+            snapshot = pipeline.runtime_stats()
+        except Exception as e:
+            logger.warning(f"Worker {tag[0]} stats failed: {e}")
+            snapshot = None
+        result_q.put(("stats", tag, None, snapshot))
+        time.sleep(interval)
+
+
+def _worker_main(worker_id, generation, request_q, result_q, stats_interval=WORKER_HEALTH_INTERVAL):
+    """Entry point of a worker process."""
+    tag = (worker_id, generation)
+    start = time.perf_counter()
+    try:
+        from pipeline import get_pipeline
+        pipeline = get_pipeline()
+    except Exception as e:
+        result_q.put(("failed", tag, None, f"{type(e).__name__}: {e}"))
+        return
+    result_q.put(("ready", tag, None, time.perf_counter() - start))
+    threading.Thread(target=_report_stats, args=(tag, pipeline, result_q, stats_interval),
+                     name="worker-stats", daemon=True).start()
+
+    while True:
+        msg = request_q.get()
+        if msg is None:
+            # Graceful shutdown: flush queued artifacts before exiting
+            pipeline.close()
+            break
+        job_id, method, args, kwargs = msg
+        if method == _PING:
+            result_q.put(("pong", tag, job_id, None))
+            continue
+        try:
+            value = getattr(pipeline, method)(*args, **kwargs)
+            result_q.put(("ok", tag, job_id, value))
+        except Exception as e:
+            # Exceptions may not pickle; send a description instead
+            result_q.put(("error", tag, job_id, f"{type(e).__name__}: {e}"))
+
+
+class _WorkerSlot:
+    """Parent-side bookkeeping for one worker process."""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.generation = 0          # bumped on every respawn
+        self.process = None
+        self.request_q = None
+        self.in_flight = {}          # job_id -> Future
+        self.ready = False
+        self.started_at = 0.0
+        self.last_seen = 0.0
+        self.ping_sent_at = None
+        self.restarts = 0
+        self.failures = 0            # consecutive, reset once ready for WORKER_STABLE_SECONDS
+        self.ready_at = None
+        self.respawn_at = None       # down, waiting out its backoff
+        self.given_up = False        # down for good after WORKER_MAX_RESTARTS failures
+        self.load_seconds = None
+        self.stats = None            # latest runtime_stats() pushed by the worker
+
+
+class WorkerPool:
+    """
+    N worker processes fed by a least-loaded dispatcher.
+
+    submit() returns a concurrent.futures.Future, so callers can block on it
+    or await it with asyncio.wrap_future().
+    """
+
+    def __init__(self, num_workers=EXECUTOR_WORKERS,
+                 health_interval=WORKER_HEALTH_INTERVAL,
+                 health_timeout=WORKER_HEALTH_TIMEOUT,
+                 start_timeout=WORKER_START_TIMEOUT,
+                 restart_backoff=WORKER_RESTART_BACKOFF,
+                 restart_backoff_max=WORKER_RESTART_BACKOFF_MAX,
+                 max_restarts=WORKER_MAX_RESTARTS,
+                 stable_seconds=WORKER_STABLE_SECONDS):
+        self.num_workers = max(1, int(num_workers))
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.start_timeout = start_timeout
+        self.restart_backoff = restart_backoff
+        self.restart_backoff_max = restart_backoff_max
+        self.max_restarts = max_restarts
+        self.stable_seconds = stable_seconds
+
+        # TensorFlow is not fork-safe: always start clean interpreters
+        self._ctx = multiprocessing.get_context("spawn")
+        self._result_q = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._closed = False
+
+        self._slots = [_WorkerSlot(i) for i in range(self.num_workers)]
+        for slot in self._slots:
+            self._spawn(slot)
+
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-collector", daemon=True)
+        self._supervisor = threading.Thread(target=self._supervise, name="worker-pool-supervisor", daemon=True)
+        self._collector.start()
+        self._supervisor.start()
+        logger.info(f"WorkerPool: started {self.num_workers} worker processes")
+
+    # =====================================================================
+    #  PUBLIC API
+    # =====================================================================
+
+    def submit(self, method, *args, **kwargs) -> Future:
+        """Run `pipeline.<method>(*args, **kwargs)` on the least-loaded worker."""
+        future = Future()
+        # Once queued to a worker the job cannot be taken back: mark it running
+        # so cancel() fails and done-callbacks fire only when the worker answers
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WorkerPool is shut down")
+            slot = self._pick_slot()
+            if slot is None:
+                future.set_exception(WorkerCrashed("No worker available: all workers are restarting after failures"))
+                return future
+            job_id = next(self._job_ids)
+            slot.in_flight[job_id] = future
+            slot.request_q.put((job_id, method, args, kwargs))
+        return future
+
+    def ready(self) -> bool:
+        """True once every worker has loaded its pipeline and none is crash-looping."""
+        with self._lock:
+            return all(slot.ready and slot.failures == 0 for slot in self._slots)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'workers': [{
+                    'worker_id': slot.worker_id,
+                    'pid': slot.process.pid if slot.process else None,
+                    'alive': bool(slot.process and slot.process.is_alive()),
+                    'ready': slot.ready,
+                    'in_flight': len(slot.in_flight),
+                    'restarts': slot.restarts,
+                    'failures': slot.failures,
+                    'restarting_in': round(max(0.0, slot.respawn_at - now), 1) if slot.respawn_at else None,
+                    'given_up': slot.given_up,
+                    'load_seconds': slot.load_seconds,
+                    'last_seen_seconds_ago': round(now - slot.last_seen, 2) if slot.last_seen else None,
+                } for slot in self._slots],
+                'in_flight': sum(len(slot.in_flight) for slot in self._slots),
+            }
+
+    def pipeline_stats(self) -> dict:
+        """Latest runtime_stats() of each worker that has reported: {worker_id: stats}."""
+        with self._lock:
+            return {slot.worker_id: slot.stats for slot in self._slots if slot.stats is not None}
+
+    def shutdown(self, wait=True, timeout=10.0):
+        with self._lock:
+            self._closed = True
+            slots = list(self._slots)
+        for slot in slots:
+            try:
+                slot.request_q.put(None)
+            except Exception:
+                pass
+        if wait:
+            deadline = time.monotonic() + timeout
+            for slot in slots:
+                slot.process.join(timeout=max(0.0, deadline - time.monotonic()))
+        for slot in slots:
+            if slot.process.is_alive():
+                slot.process.terminate()
+            self._fail_in_flight(slot, WorkerCrashed("WorkerPool shut down"))
+
+    # =====================================================================
+    #  DISPATCH
+    # =====================================================================
+
+    def _pick_slot(self):
+        """Least in-flight jobs among ready workers; any starting worker if none ready; None if all down."""
+        candidates = [s for s in self._slots if s.ready and s.process.is_alive()]
+        if not candidates:
+            candidates = [s for s in self._slots if s.respawn_at is None and not s.given_up]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda s: len(s.in_flight))
+
+    def _collect(self):
+        while True:
+            try:
+                kind, (worker_id, generation), job_id, payload = self._result_q.get(timeout=0.5)
+            except queue.Empty:
+                if self._closed:
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+
+            with self._lock:
+                slot = self._slots[worker_id]
+                if generation != slot.generation:
+                    continue    # late message from a worker that was replaced
+                if kind == "stats":
+                    # Sent from a side thread: not a sign that the job loop is alive
+                    slot.stats = payload
+                    continue
+                slot.last_seen = time.monotonic()
+                if kind == "ready":
+                    slot.ready = True
+                    slot.ready_at = slot.last_seen
+                    slot.load_seconds = round(payload, 2)
+                    logger.info(f"Worker {worker_id} (pid {slot.process.pid}) ready in {payload:.1f}s")
+                    continue
+                if kind == "failed":
+                    logger.error(f"Worker {worker_id} failed to start: {payload}")
+                    continue
+                if kind == "pong":
+                    slot.ping_sent_at = None
+                    continue
+                future = slot.in_flight.pop(job_id, None)
+
+            if future is None:
+                continue
+            try:
+                if kind == "ok":
+                    future.set_result(payload)
+                else:
+                    future.set_exception(WorkerError(payload))
+            except InvalidStateError:
+                pass        # caller cancelled / timed out
+
+    # =====================================================================
+    #  SUPERVISION
+    # =====================================================================
+
+    def _supervise(self):
+        while not self._closed:
+            time.sleep(self.health_interval)
+            now = time.monotonic()
+            with self._lock:
+                if self._closed:
+                    return
+                for slot in self._slots:
+                    if slot.given_up:
+                        continue
+                    if slot.respawn_at is not None:
+                        if now >= slot.respawn_at:
+                            slot.respawn_at = None
+                            slot.restarts += 1
+                            self._spawn(slot)
+                        continue
+                    reason = self._check(slot, now)
+                    if reason:
+                        self._retire(slot, reason, now)
+                        continue
+                    if slot.failures and slot.ready and now - slot.ready_at >= self.stable_seconds:
+                        logger.info(f"Worker {slot.worker_id} stable again after {slot.failures} failure(s)")
+                        slot.failures = 0
+                    if slot.ready and slot.ping_sent_at is None:
+                        slot.ping_sent_at = now
+                        slot.request_q.put((None, _PING, (), {}))
+
+    def _retire(self, slot, reason, now):
+        """Stop a failed worker and schedule its respawn after an exponential backoff."""
+        if slot.process.is_alive():
+            slot.process.terminate()
+        slot.ready = False
+        slot.stats = None
+        self._fail_in_flight(slot, WorkerCrashed(f"Worker {slot.worker_id} {reason}"))
+        slot.failures += 1
+        if slot.failures > self.max_restarts:
+            slot.given_up = True
+            logger.critical(f"Worker {slot.worker_id} (pid {slot.process.pid}) {reason} — "
+                            f"{slot.failures} consecutive failures, not respawning")
+            return
+        delay = min(self.restart_backoff * 2 ** (slot.failures - 1), self.restart_backoff_max)
+        slot.respawn_at = now + delay
+        logger.error(f"Worker {slot.worker_id} (pid {slot.process.pid}) {reason} — "
+                     f"respawning in {delay:.0f}s (failure {slot.failures}/{self.max_restarts})")
+
+    def _check(self, slot, now):
+        """Return why a worker must be replaced, or None if it is healthy."""
+        if not slot.process.is_alive():
+            return f"exited with code {slot.process.exitcode}"
+        if not slot.ready:
+            if now - slot.started_at > self.start_timeout:
+                return f"not ready after {self.start_timeout:.0f}s"
+            return None
+        if slot.ping_sent_at is not None:
+            # A busy worker answers pings after its current job; results count as signs of life
+            silent_for = now - max(slot.ping_sent_at, slot.last_seen)
+            if silent_for > self.health_timeout:
+                return f"unresponsive for {silent_for:.0f}s"
+        return None
+
+    def _spawn(self, slot):
+        slot.generation += 1
+        slot.request_q = self._ctx.Queue()
+        slot.process = self._ctx.Process(
+            target=_worker_main,
+            args=(slot.worker_id, slot.generation, slot.request_q, self._result_q, self.health_interval),
+            name=f"anemia-worker-{slot.worker_id}",
+            daemon=True
+        )
+        slot.ready = False
+        slot.ready_at = None
+        slot.stats = None
+        slot.ping_sent_at = None
+        slot.started_at = time.monotonic()
+        slot.last_seen = 0.0
+        slot.process.start()
+
+    @staticmethod
+    def _fail_in_flight(slot, exc):
+        pending, slot.in_flight = slot.in_flight, {}
+        for future in pending.values():
+            try:
+                future.set_exception(exc)
+            except InvalidStateError:
+                pass
@@ -0,0 +1,117 @@
+"""
+Tests for request admission control (src/admission.py)
+Run: python -m pytest -q test_admission.py
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from admission import AdmissionController, AdmissionRejected, TokenBucket
+
+
+def controller(**kwargs):
+    options = dict(rate_per_client=1000, burst=1000, max_concurrency=1, max_queue=4, queue_timeout=2.0)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    now = bucket.updated
+    assert bucket.try_take(now)[0] and bucket.try_take(now)[0]
+    ok, wait = bucket.try_take(now)
+    assert not ok and wait == pytest.approx(0.1)
+    assert bucket.try_take(now + 0.11)[0]
+
+
+def test_client_over_its_rate_is_rejected_others_are_not():
+    admission = controller(rate_per_client=0.001, burst=1, max_concurrency=10)
+    admission.release(admission.acquire("a"))
+    with pytest.raises(AdmissionRejected) as e:
+        admission.acquire("a")
+    assert e.value.retry_after >= 1
+    admission.release(admission.acquire("b"))
+    assert admission.stats()['rejected_rate_limited'] == 1
+
+
+def test_waiter_gets_the_slot_when_it_is_released():
+    admission = controller()
+    ticket = admission.acquire("a")
+    admitted = threading.Event()
+
+    def wait_for_slot():
+        admission.release(admission.acquire("b"))
+        admitted.set()
+
+    thread = threading.Thread(target=wait_for_slot)
+    thread.start()
+    time.sleep(0.05)
+    assert not admitted.is_set()
+    assert admission.stats()['queue_depth'] == 1
+    admission.release(ticket)
+    thread.join(5)
+    assert admitted.is_set()
+    assert admission.stats()['active'] == 0
+
+
+def test_full_queue_is_rejected():
+    admission = controller(max_queue=0)
+    ticket = admission.acquire("a")
+    with pytest.raises(AdmissionRejected, match="queue full"):
+        admission.acquire("b")
+    admission.release(ticket)
+    assert admission.stats()['rejected_queue_full'] == 1
+
+
+def test_queued_request_is_shed_when_its_deadline_passes():
+    admission = controller()
+    admission._service_ewma = 0.01          # expected wait well within the deadline
+    ticket = admission.acquire("a")
+    with pytest.raises(AdmissionRejected, match="deadline"):
+        admission.acquire("b", timeout=0.05)
+    admission.release(ticket)
+    stats = admission.stats()
+    assert stats['shed_deadline'] == 1 and stats['active'] == 0
+
+
+def test_request_is_shed_up_front_when_the_estimated_wait_is_too_long():
+    admission = controller()
+    admission._service_ewma = 10.0
+    ticket = admission.acquire("a")
+    with pytest.raises(AdmissionRejected, match="estimated wait"):
+        admission.acquire("b", timeout=1.0)
+    admission.release(ticket)
+
+
+def test_cancelled_async_waiter_does_not_leak_a_slot():
+    admission = controller()
+    ticket = admission.acquire("a")
+
+    async def scenario():
+        waiter = asyncio.ensure_future(admission.acquire_async("b"))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    admission.release(ticket)
+    assert admission.stats()['active'] == 0
+    admission.release(admission.acquire("c", timeout=0.5))
+
+
+def test_admit_async_releases_on_exit():
+    admission = controller()
+
+    async def scenario():
+        async with admission.admit_async("a"):
+            assert admission.stats()['active'] == 1
+        assert admission.stats()['active'] == 0
+
+    asyncio.run(scenario())
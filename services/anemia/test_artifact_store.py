@@ -0,0 +1,127 @@
+"""
+Tests for the content-addressed artifact store (src/artifact_store.py)
+Run: python -m pytest -q test_artifact_store.py
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from artifact_store import ArtifactStore
+from artifact_writer import ArtifactWriter
+
+
+@pytest.fixture
+def store(tmp_path):
+    writer = ArtifactWriter(name="test")
+    kind_dirs = {kind: tmp_path / kind for kind in ('originals', 'cropped', 'heatmaps', 'tissue')}
+    store = ArtifactStore(writer, manifest_path=tmp_path / "manifest.sqlite", kind_dirs=kind_dirs)
+    yield store
+    writer.close()
+    store.close()
+
+
+def _image(value):
+    return np.full((8, 8, 3), value, np.uint8)
+
+
+def test_link_references_an_earlier_scan_under_a_new_id(store):
+    store.put(_image(10), 'tissue', '.png', scan_id="first", session_id="s1", label="tissue_left")
+    store.put(_image(20), 'cropped', '.jpg', scan_id="first", session_id="s1")
+    store.writer.flush()
+
+    assert store.link("first", "second", session_id="s2") == 2
+    refs = store.lookup(scan_id="second")
+    assert {r['kind'] for r in refs} == {'tissue', 'cropped'}
+    assert all(r['session_id'] == "s2" and Path(r['path']).exists() for r in refs)
+    assert [r['path'] for r in refs] == [r['path'] for r in store.lookup(scan_id="first")]
+    assert store.stats()['blobs'] == 2
+
+
+def test_link_of_an_unknown_scan_adds_nothing(store):
+    assert store.link("missing", "new") == 0
+    assert store.lookup(scan_id="new") == []
+
+
+class _HeldWriter(ArtifactWriter):
+    """Writer whose queue does not drain until release() (an image still queued)."""
+
+    def __init__(self):
+        self._gate = threading.Event()
+        super().__init__(name="held")
+
+    def _write(self, image, path):
+        self._gate.wait(10)
+        super()._write(image, path)
+
+    def release(self):
+        self._gate.set()
+
+
+@pytest.fixture
+def held_store(tmp_path):
+    writer = _HeldWriter()
+    kind_dirs = {kind: tmp_path / kind for kind in ('originals', 'cropped', 'heatmaps', 'tissue')}
+    store = ArtifactStore(writer, manifest_path=tmp_path / "manifest.sqlite", kind_dirs=kind_dirs)
+    yield store
+    writer.release()
+    writer.close()
+    store.close()
+
+
+def test_identical_content_is_stored_once(store):
+    first = store.put(_image(1), 'cropped', '.png', scan_id="a")
+    second = store.put(_image(1), 'cropped', '.png', scan_id="b")
+    store.writer.flush()
+    assert first == second and first.exists()
+    stats = store.stats()
+    assert stats['blobs'] == 1 and stats['refs'] == 2
+    assert stats['stored'] == 1 and stats['deduplicated'] == 1
+
+
+def test_duplicate_put_while_queued_is_not_written_twice(held_store):
+    held_store.put(_image(5), 'cropped', '.png', scan_id="a")
+    held_store.put(_image(5), 'cropped', '.png', scan_id="b")     # file not on disk yet
+    assert held_store.stats()['stored'] == 1
+    assert held_store.stats()['deduplicated'] == 1
+
+
+def test_gc_keeps_blobs_whose_file_is_still_queued(held_store):
+    path = held_store.put(_image(7), 'tissue', '.png', scan_id="a")
+    assert not path.exists()
+    summary = held_store.gc(max_age_days=None, max_total_gb=None, dry_run=True)
+    assert summary['deleted_blobs'] == 0 and summary['pending_blobs'] == 1
+    assert held_store.lookup(scan_id="a")
+
+
+def test_gc_drops_missing_files_after_the_grace_period(store):
+    path = store.put(_image(3), 'tissue', '.png', scan_id="a")
+    store.writer.flush()
+    path.unlink()
+    assert store.gc(max_age_days=None, max_total_gb=None)['deleted_blobs'] == 0
+    assert store.gc(max_age_days=None, max_total_gb=None, grace_seconds=0)['deleted_blobs'] == 1
+    assert store.lookup(scan_id="a") == []
+
+
+def test_gc_expires_old_references_and_their_blobs(store):
+    path = store.put(_image(4), 'cropped', '.png', scan_id="old")
+    store.writer.flush()
+    with store._db:
+        store._db.execute("UPDATE refs SET created_at = created_at - 10 * 86400")
+    summary = store.gc(max_age_days=5, max_total_gb=None, grace_seconds=0)
+    assert summary['expired_refs'] == 1 and summary['deleted_blobs'] == 1
+    assert not path.exists()
+
+
+def test_gc_evicts_least_recently_used_over_quota(store):
+    old = store.put(np.random.default_rng(0).integers(0, 255, (64, 64, 3), dtype=np.uint8), 'cropped', '.png', scan_id="a")
+    new = store.put(np.random.default_rng(1).integers(0, 255, (64, 64, 3), dtype=np.uint8), 'cropped', '.png', scan_id="b")
+    store.writer.flush()
+    quota_gb = (new.stat().st_size + 1) / 1024 ** 3
+    summary = store.gc(max_age_days=None, max_total_gb=quota_gb, grace_seconds=0)
+    assert summary['deleted_blobs'] == 1
+    assert not old.exists() and new.exists()
@@ -0,0 +1,149 @@
+"""
+Tests for the audit analytics job (src/audit_analytics.py)
+Run: python -m pytest -q test_audit_analytics.py
+"""
+
+import json
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+pytest.importorskip("pyarrow")
+import audit_analytics
+from audit_analytics import ALERTS_FILE, aggregate_days, pilot_metrics, report, to_columnar, update
+from audit_logger import AUDIT_COLUMNS
+from audit_segments import segment_files
+from config import ANALYTICS_HIST_BINS, ANALYTICS_WINDOW_DAYS
+from test_audit_logger import make_row
+from test_audit_segments import write_log
+
+
+def total_rows(state):
+    return sum(agg['rows'] for agg in state['days'].values())
+
+
+def scored_row(i, timestamp, probability, classification, confirmed="N/A"):
+    row = make_row(i, timestamp)
+    row[AUDIT_COLUMNS.index("probability")] = f"{probability:.4f}"
+    row[AUDIT_COLUMNS.index("classification")] = classification
+    row[AUDIT_COLUMNS.index("is_low_confidence")] = str(classification == "INCONCLUSIVE")
+    row[AUDIT_COLUMNS.index("hb_confirmed_anemia")] = confirmed
+    return row
+
+
+def frame(rows):
+    return to_columnar(pd.DataFrame([r + ["0" * 64] for r in rows], columns=AUDIT_COLUMNS))
+
+
+def test_second_update_converts_nothing(tmp_path):
+    log, out = tmp_path / "audit.csv", tmp_path / "analytics"
+    write_log(log, [make_row(i) for i in range(12)], rotate_daily=False)
+
+    assert update(log, out)['new_rows'] == 12
+    state = update(log, out)
+    assert state['new_rows'] == 0
+    assert total_rows(state) == 12
+    assert len(list((out / "rows").glob("*.parquet"))) == 1
+
+
+def test_rows_are_not_counted_twice_after_the_log_is_rotated(tmp_path):
+    log, out = tmp_path / "audit.csv", tmp_path / "analytics"
+    write_log(log, [make_row(i) for i in range(10)], rotate_daily=False)
+    assert update(log, out)['new_rows'] == 10
+
+    # Reopened with a tiny size limit: the converted log becomes a gzip segment
+    write_log(log, [make_row(i) for i in range(10, 15)], rotate_bytes=1, rotate_daily=False)
+    assert any(p.name.endswith(".csv.gz") for p in segment_files(log))
+
+    state = update(log, out)
+    assert state['new_rows'] == 5
+    assert total_rows(state) == 15
+    assert update(log, out)['new_rows'] == 0
+
+
+def test_confusion_counts_exclude_inconclusive_predictions():
+    now = datetime.utcnow().isoformat()
+    days = aggregate_days(frame([
+        scored_row(0, now, 0.9, "ANEMIC", "True"),
+        scored_row(1, now, 0.9, "ANEMIC", "False"),
+        scored_row(2, now, 0.1, "NORMAL", "True"),
+        scored_row(3, now, 0.1, "NORMAL", "False"),
+        scored_row(4, now, 0.1, "NORMAL", "False"),
+        scored_row(5, now, 0.5, "INCONCLUSIVE", "True"),
+        scored_row(6, now, 0.9, "ANEMIC"),
+    ]))
+
+    (agg,) = days.values()
+    assert (agg['tp'], agg['fp'], agg['fn'], agg['tn']) == (1, 1, 1, 2)
+    assert agg['confirmed_inconclusive'] == 1
+    assert agg['rows'] == 7 and agg['anemic'] == 3 and agg['low_confidence'] == 1
+    assert sum(agg['histogram']) == 7
+
+
+def test_pilot_metrics_wait_for_quorum(monkeypatch):
+    monkeypatch.setattr(audit_analytics, "PILOT_QUORUM", 10)
+    monkeypatch.setattr(audit_analytics, "ANEMIA_QUORUM", 4)
+    day = {'tp': 3, 'fn': 1, 'tn': 4, 'fp': 1, 'confirmed_inconclusive': 0}
+
+    pending = pilot_metrics({'2024-01-01': day})
+    assert pending['status'].startswith("quorum not met")
+    assert 'sensitivity' not in pending
+
+    ready = pilot_metrics({'2024-01-01': day, '2024-01-02': dict(day, tp=0, fn=0, tn=1, fp=0)})
+    assert ready['status'] == "ok"
+    assert ready['sensitivity'] == 3 / 4
+    assert ready['specificity'] == 5 / 6
+
+
+def drifted_log(path, rows_per_day=5):
+    """Baseline days scored NORMAL, recent days scored ANEMIC."""
+    today = date.today()
+    rows, i = [], 0
+    for offset, prob, label in ((ANALYTICS_WINDOW_DAYS, 0.1, "NORMAL"), (0, 0.9, "ANEMIC")):
+        timestamp = datetime.combine(today - timedelta(days=offset), datetime.min.time()).isoformat()
+        for _ in range(rows_per_day):
+            rows.append(scored_row(i, timestamp, prob, label))
+            i += 1
+    write_log(path, rows, rotate_daily=False)
+
+
+def test_report_writes_an_alert_on_drift(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_analytics, "ANALYTICS_MIN_ROWS", 1)
+    log, out = tmp_path / "audit.csv", tmp_path / "analytics"
+    drifted_log(log)
+
+    result = report(update(log, out), out)
+
+    assert result['drift']['probability_tv_distance'] == pytest.approx(1.0)
+    metrics = {a['metric'] for a in result['alerts']}
+    assert {'probability_tv_distance', 'anemic_rate_delta'} <= metrics
+    alerts = [json.loads(line) for line in (out / ALERTS_FILE).read_text().splitlines()]
+    assert {a['metric'] for a in alerts} == metrics
+    assert len(result['window']['histogram']) == ANALYTICS_HIST_BINS
+
+
+def test_no_drift_is_computed_below_min_rows(tmp_path):
+    log, out = tmp_path / "audit.csv", tmp_path / "analytics"
+    drifted_log(log)
+
+    result = report(update(log, out), out)
+    assert result['drift'] is None and result['alerts'] == []
+    assert not (out / ALERTS_FILE).exists()
+
+
+def test_main_exits_2_on_drift(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(audit_analytics, "ANALYTICS_MIN_ROWS", 1)
+    log, out = tmp_path / "audit.csv", tmp_path / "analytics"
+    drifted_log(log)
+
+    monkeypatch.setattr(sys, "argv", ["audit_analytics.py", "--log", str(log), "--out", str(out)])
+    assert audit_analytics.main() == 2
+    assert "alerts" in capsys.readouterr().out
+
+    # The same data without drift detection enabled exits cleanly
+    monkeypatch.setattr(audit_analytics, "ANALYTICS_MIN_ROWS", 10_000)
+    assert audit_analytics.main() == 0
@@ -0,0 +1,76 @@
+"""
+Tests for the audit log writer (src/audit_logger.py)
+Run: python -m pytest -q test_audit_logger.py
+"""
+
+import csv
+import hashlib
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from audit_logger import AuditWriter, AUDIT_COLUMNS, GENESIS_HASH, chain_hash
+
+
+def image_hash(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+def make_row(i, timestamp=None):
+    """One audit row (every column except record_hash)."""
+    row = ["N/A"] * (len(AUDIT_COLUMNS) - 1)
+    row[0] = timestamp or datetime.utcnow().isoformat()
+    row[1] = image_hash(i)
+    row[3] = "0.9000"
+    return row
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = AuditWriter(path=tmp_path / "audit.csv", flush_rows=4, flush_interval=0.05,
+                         fsync_interval=0, key="test-key")
+    yield writer
+    writer.close()
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_rows_are_written_in_order_with_a_hash_chain(writer):
+    for i in range(10):
+        writer.write(make_row(i))
+    assert writer.flush(timeout=5)
+
+    rows = read_rows(writer.path)
+    assert [r['image_hash_sha256'] for r in rows] == [image_hash(i) for i in range(10)]
+    lines = writer.path.read_bytes().split(b"\r\n")[1:-1]
+    prev = GENESIS_HASH
+    for line in lines:
+        payload, record_hash = line.rsplit(b",", 1)
+        prev = chain_hash(prev, payload)
+        assert record_hash.decode() == prev
+    stats = writer.stats()
+    assert stats['rows_written'] == 10 and stats['batches'] >= 3
+
+
+def test_close_drains_the_queue(tmp_path):
+    writer = AuditWriter(path=tmp_path / "audit.csv", flush_rows=1000, flush_interval=60, key="k")
+    for i in range(25):
+        writer.write(make_row(i))
+    writer.close(timeout=5)
+    assert len(read_rows(writer.path)) == 25
+
+
+def test_write_after_close_is_dropped_and_counted(writer):
+    writer.write(make_row(0))
+    writer.close(timeout=5)
+
+    assert writer.write(make_row(1)) is False
+    assert writer.stats()['dropped_rows'] == 1
+    assert writer.flush(timeout=1)          # does not wait for a stopped worker
+    assert len(read_rows(writer.path)) == 1
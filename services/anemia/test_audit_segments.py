@@ -0,0 +1,70 @@
+"""
+Tests for audit log rotation and segments (src/audit_logger.py, src/audit_segments.py)
+Run: python -m pytest -q test_audit_segments.py
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from audit_logger import AuditWriter
+from audit_segments import (
+    iter_rows, load_indexes, segment_dir, segment_files, segments_for_window, segments_with_image
+)
+from audit_verify import verify_log
+from test_audit_logger import image_hash, make_row
+
+KEY = "test-key"
+
+
+def write_log(path, rows, **kwargs):
+    options = dict(flush_rows=4, flush_interval=0.05, fsync_interval=0, checkpoint_bytes=4000, key=KEY)
+    options.update(kwargs)
+    writer = AuditWriter(path=path, **options)
+    for row in rows:
+        writer.write(row)
+        writer.flush(timeout=5)
+    writer.close(timeout=10)
+    return writer
+
+
+def test_size_rotation_compresses_segments_and_keeps_one_chain(tmp_path):
+    path = tmp_path / "audit.csv"
+    writer = write_log(path, [make_row(i) for i in range(40)], rotate_bytes=3000, rotate_daily=False)
+
+    assert writer.stats()['rotations'] >= 2
+    files = segment_files(path)
+    assert all(p.name.endswith(".csv.gz") for p in files[:-1]) and files[-1] == path
+    assert len(load_indexes(path)) == len(files) - 1
+
+    summary = verify_log(path, workers=2, key=KEY)
+    assert summary['ok'], summary['first_error']
+    assert summary['rows'] == 40
+
+
+def test_new_day_starts_a_new_segment(tmp_path):
+    path = tmp_path / "audit.csv"
+    yesterday = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    today = datetime.utcnow().isoformat()
+    write_log(path, [make_row(0, yesterday), make_row(1, yesterday), make_row(2, today)])
+
+    (index,) = load_indexes(path)
+    assert index['first_timestamp'][:10] == yesterday[:10]
+    assert verify_log(path, workers=1, key=KEY)['ok']
+
+    window = segments_for_window(path, start=today[:10])
+    rows = list(iter_rows(window, start=today[:10]))
+    assert [r['image_hash_sha256'] for r in rows] == [image_hash(2)]
+
+
+def test_image_lookup_uses_segment_bloom_filters(tmp_path):
+    path = tmp_path / "audit.csv"
+    write_log(path, [make_row(i) for i in range(40)], rotate_bytes=3000, rotate_daily=False)
+    target = image_hash(7)
+
+    candidates = segments_with_image(path, target)
+    assert len(candidates) < len(segment_files(path))
+    rows = list(iter_rows(candidates, image_hash=target))
+    assert len(rows) == 1
+    assert segment_dir(path).exists()
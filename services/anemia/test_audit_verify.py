@@ -0,0 +1,58 @@
+"""
+Tests for audit log verification (src/audit_verify.py)
+Run: python -m pytest -q test_audit_verify.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from audit_logger import AuditWriter
+from audit_verify import verify_log
+from test_audit_logger import make_row
+
+KEY = "test-key"
+
+
+@pytest.fixture
+def log(tmp_path):
+    """A closed log of 60 rows with several signed checkpoints."""
+    path = tmp_path / "audit.csv"
+    writer = AuditWriter(path=path, flush_rows=8, flush_interval=0.05, fsync_interval=0,
+                         checkpoint_bytes=2000, key=KEY, rotate_daily=False)
+    for i in range(60):
+        writer.write(make_row(i))
+    writer.close(timeout=10)
+    return path
+
+
+def test_untouched_log_verifies(log):
+    summary = verify_log(log, workers=2, key=KEY)
+    assert summary['ok'], summary['first_error']
+    assert summary['rows'] == 60
+    assert summary['checkpoints'] >= 3 and summary['unsigned_checkpoints'] == 0
+
+
+def test_edited_row_is_reported_with_its_row_number(log):
+    lines = log.read_bytes().split(b"\r\n")
+    lines[21] = lines[21].replace(b"0.9000", b"0.1000", 1)     # row 21 (line 0 is the header)
+    log.write_bytes(b"\r\n".join(lines))
+
+    summary = verify_log(log, workers=2, key=KEY)
+    assert not summary['ok']
+    assert summary['first_error']['row'] == 21
+
+
+def test_deleted_row_breaks_the_chain(log):
+    lines = log.read_bytes().split(b"\r\n")
+    del lines[5]
+    log.write_bytes(b"\r\n".join(lines))
+    assert not verify_log(log, workers=2, key=KEY)['ok']
+
+
+def test_checkpoints_signed_with_another_key_fail(log):
+    summary = verify_log(log, workers=1, key="wrong-key")
+    assert not summary['ok']
+    assert "signature" in summary['first_error']['reason']
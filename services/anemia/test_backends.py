@@ -0,0 +1,67 @@
+"""
+Tests for the inference backends (src/backends.py)
+Run: python -m pytest -q test_backends.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from backends import TFLiteBackend
+from config import INPUT_SIZE, BATCH_MAX_SIZE
+
+
+def test_tflite_batches_are_padded_to_a_few_sizes():
+    sizes = {TFLiteBackend._padded_size(n) for n in range(1, BATCH_MAX_SIZE + 1)}
+    assert sizes <= {1 << i for i in range(BATCH_MAX_SIZE.bit_length())} | {BATCH_MAX_SIZE}
+    assert all(TFLiteBackend._padded_size(n) >= n for n in range(1, 4 * BATCH_MAX_SIZE))
+    assert TFLiteBackend._padded_size(BATCH_MAX_SIZE + 3) == BATCH_MAX_SIZE + 3
+
+
+@pytest.fixture(scope="module")
+def exported_model(tmp_path_factory):
+    tf = pytest.importorskip("tensorflow")
+    tf.keras.utils.set_random_seed(0)
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input((INPUT_SIZE, INPUT_SIZE, 3)),
+        tf.keras.layers.Conv2D(4, 3, activation="relu"),
+        tf.keras.layers.BatchNormalization(),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(1, activation="sigmoid"),
+    ])
+    directory = tmp_path_factory.mktemp("models")
+    keras_path = directory / "model.keras"
+    model.save(keras_path)
+    tflite_path = directory / "model.tflite"
+    tflite_path.write_bytes(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+    return keras_path, tflite_path
+
+
+def test_tflite_matches_keras_at_every_batch_size(exported_model):
+    from backends import KerasBackend
+
+    keras_path, tflite_path = exported_model
+    reference = KerasBackend(keras_path)
+    backend = TFLiteBackend(tflite_path)
+    rng = np.random.default_rng(0)
+
+    for n in (1, 3, 5, 8, BATCH_MAX_SIZE, BATCH_MAX_SIZE + 2):
+        batch = rng.uniform(0, 1, (n, INPUT_SIZE, INPUT_SIZE, 3)).astype(np.float32)
+        probs = backend.predict(batch)
+        assert probs.shape == (n,)
+        np.testing.assert_allclose(probs, reference.predict(batch), atol=1e-5)
+
+
+def test_tflite_reuses_interpreters_across_calls(exported_model):
+    _, tflite_path = exported_model
+    backend = TFLiteBackend(tflite_path)
+    batch = np.zeros((3, INPUT_SIZE, INPUT_SIZE, 3), np.float32)
+    backend.predict(batch)
+    allocated = backend.batch_sizes
+    backend.predict(batch)
+    backend.predict(batch[:1])
+    backend.predict(batch)
+    assert backend.batch_sizes == sorted(set(allocated) | {1, 4})
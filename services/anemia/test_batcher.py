@@ -0,0 +1,119 @@
+"""
+Tests for the inference micro-batcher (src/batcher.py)
+Run: python -m pytest -q test_batcher.py
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from batcher import MicroBatcher, BatcherClosed
+
+
+def test_concurrent_items_share_a_batch_and_keep_order():
+    batches = []
+
+    def double(items):
+        batches.append(list(items))
+        return [x * 2 for x in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=200, name="test")
+    futures = [batcher.submit(i) for i in range(8)]
+    assert [f.result(timeout=5) for f in futures] == [i * 2 for i in range(8)]
+    assert batches == [list(range(8))]
+    stats = batcher.stats()
+    assert stats['batches'] == 1 and stats['items'] == 8
+    batcher.close()
+
+
+def test_batch_is_dispatched_when_wait_window_closes():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=64, max_wait_ms=20, name="test")
+    start = time.monotonic()
+    assert batcher.run("x", timeout=5) == "x"
+    assert time.monotonic() - start < 2
+    batcher.close()
+
+
+def test_failed_batch_fails_every_item():
+    def boom(items):
+        raise ValueError("model exploded")
+
+    batcher = MicroBatcher(boom, max_batch_size=4, max_wait_ms=50, name="test")
+    futures = [batcher.submit(i) for i in range(3)]
+    for f in futures:
+        with pytest.raises(ValueError):
+            f.result(timeout=5)
+    stats = batcher.stats()
+    assert stats['failed_batches'] == stats['batches'] >= 1
+    assert stats['failed_items'] == stats['items'] == 3
+    assert sum(stats['batch_size_histogram'].values()) == stats['batches']
+    batcher.close()
+
+
+def test_failed_batches_count_towards_occupancy():
+    calls = 0
+
+    def flaky(items):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ValueError("model exploded")
+        return items
+
+    batcher = MicroBatcher(flaky, max_batch_size=2, max_wait_ms=200, name="test")
+    failed = [batcher.submit(i) for i in range(2)]
+    for f in failed:
+        with pytest.raises(ValueError):
+            f.result(timeout=5)
+    ok = [batcher.submit(i) for i in range(2)]
+    assert [f.result(timeout=5) for f in ok] == [0, 1]
+
+    stats = batcher.stats()
+    assert stats['batches'] == 2 and stats['items'] == 4
+    assert stats['failed_batches'] == 1 and stats['failed_items'] == 2
+    assert stats['mean_occupancy'] == 1.0
+    batcher.close()
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=2, max_wait_ms=50, name="test")
+    futures = [batcher.submit(i) for i in range(2)]
+    with pytest.raises(RuntimeError):
+        futures[0].result(timeout=5)
+    assert batcher.stats()['failed_batches'] == 1
+    batcher.close()
+
+
+def test_close_processes_queued_items_then_rejects_new_ones():
+    release = threading.Event()
+
+    def slow(items):
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=0, name="test")
+    first = batcher.submit("a")
+    queued = batcher.submit("b")
+    closer = threading.Thread(target=batcher.close)
+    closer.start()
+    time.sleep(0.05)
+
+    with pytest.raises(BatcherClosed):
+        batcher.submit("c")
+
+    release.set()
+    closer.join(5)
+    assert first.result(timeout=5) == "a"
+    assert queued.result(timeout=5) == "b"
+    batcher.close()     # idempotent
+
+
+def test_run_after_close_does_not_block():
+    batcher = MicroBatcher(lambda items: items, name="test")
+    batcher.close()
+    with pytest.raises(BatcherClosed):
+        batcher.run("x")
@@ -0,0 +1,34 @@
+"""
+Tests for environment-driven settings (src/config.py)
+Run: python -m pytest -q test_config.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+def load_config(**env):
+    code = (
+        "import sys, json; sys.path.insert(0, 'src'); import config; "
+        "print(json.dumps({k: getattr(config, k) for k in "
+        "('EXPLAIN_ENABLED', 'PERSIST_TISSUE', 'WARMUP_GRADCAM', 'SAVE_HEATMAP')}))"
+    )
+    environment = {k: v for k, v in os.environ.items() if k != "NETRA_EXPLAIN"}
+    environment.update(env)
+    out = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent, env=environment,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def test_explanations_are_opt_in():
+    config = load_config()
+    assert not config['EXPLAIN_ENABLED'] and not config['PERSIST_TISSUE']
+    assert config['WARMUP_GRADCAM'] == config['SAVE_HEATMAP']
+
+
+def test_enabling_explanations_stores_tissue_and_warms_gradcam():
+    config = load_config(NETRA_EXPLAIN="1")
+    assert config['EXPLAIN_ENABLED'] and config['PERSIST_TISSUE'] and config['WARMUP_GRADCAM']
@@ -0,0 +1,74 @@
+"""
+Tests for the tf.data training input pipeline (src/data_loader.py)
+Run: python -m pytest -q test_data_loader.py
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+sys.path.append(str(Path(__file__).parent / "src"))
+from config import BATCH_SIZE, CLASS_NAMES, IMG_SIZE
+from data_loader import DataLoader
+
+COUNTS = {'Non-Anemic': 30, 'Anemic': 20}
+
+
+@pytest.fixture(scope="module")
+def loader(tmp_path_factory):
+    """Class-folder dataset of odd-sized images, used as both splits."""
+    root = tmp_path_factory.mktemp("data")
+    rng = np.random.default_rng(0)
+    for class_name, count in COUNTS.items():
+        (root / class_name).mkdir()
+        for i in range(count):
+            h, w = rng.integers(40, 120, 2)
+            image = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+            cv2.imwrite(str(root / class_name / f"{i}.png"), image)
+    loader = DataLoader()
+    loader.train_dir = loader.val_dir = root
+    return loader
+
+
+def collect(dataset):
+    images, labels = [], []
+    for x, y in dataset:
+        images.append(x.numpy())
+        labels.append(y.numpy())
+    return images, np.concatenate(labels)
+
+
+def test_batches_have_the_model_input_shape_and_range(loader):
+    train_ds, val_ds, train_samples, val_samples = loader.create_datasets(cache="memory")
+    assert train_samples == val_samples == sum(COUNTS.values())
+    for dataset in (train_ds, val_ds):
+        images, _ = collect(dataset)
+        assert all(x.shape[1:] == (IMG_SIZE, IMG_SIZE, 3) and x.dtype == np.float32 for x in images)
+        assert all(x.shape[0] == BATCH_SIZE for x in images[:-1])
+        assert sum(x.shape[0] for x in images) == train_samples
+        assert min(x.min() for x in images) >= 0.0 and max(x.max() for x in images) <= 1.0
+
+
+def test_every_epoch_sees_each_label_once(loader):
+    assert CLASS_NAMES.index('Anemic') == 1
+    train_ds, val_ds, _, _ = loader.create_datasets(cache="")
+    for _ in range(2):
+        _, labels = collect(train_ds)
+        assert len(labels) == sum(COUNTS.values())
+        assert int(labels.sum()) == COUNTS['Anemic']
+    _, val_labels = collect(val_ds)
+    assert val_labels.tolist() == [0.0] * COUNTS['Non-Anemic'] + [1.0] * COUNTS['Anemic']
+
+
+def test_training_batches_are_augmented_validation_batches_are_not(loader):
+    train_ds, val_ds, _, _ = loader.create_datasets(cache="memory")
+    first_val, _ = collect(val_ds)
+    second_val, _ = collect(val_ds)
+    np.testing.assert_array_equal(np.concatenate(first_val), np.concatenate(second_val))
+    first_train, _ = collect(train_ds)
+    second_train, _ = collect(train_ds)
+    assert not np.array_equal(np.concatenate(first_train), np.concatenate(second_train))
@@ -0,0 +1,35 @@
+"""
+Tests for the clinical decision rule (src/decision.py)
+Run: python -m pytest -q test_decision.py
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from config import DECISION_THRESHOLD, LOW_CONFIDENCE_BAND
+from decision import diagnose
+
+
+def test_confident_probabilities_map_to_a_diagnosis():
+    assert diagnose(0.95) == (True, False, "ANEMIC")
+    assert diagnose(0.05) == (False, False, "NORMAL")
+
+
+def test_low_confidence_band_is_inconclusive_inclusive_of_its_edges():
+    low, high = LOW_CONFIDENCE_BAND
+    for prob in (low, DECISION_THRESHOLD, high):
+        is_anemic, is_low_confidence, final = diagnose(prob)
+        assert is_low_confidence and final == "INCONCLUSIVE"
+        assert is_anemic == (prob > DECISION_THRESHOLD)
+
+
+def test_decision_module_does_not_load_the_serving_stack():
+    code = (
+        "import sys; sys.path.insert(0, 'src'); import decision; "
+        "print(sorted({'pipeline', 'cv2', 'tensorflow', 'mediapipe'} & set(sys.modules)))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,122 @@
+"""
+Tests for the inference executor (src/executor.py)
+Run: python -m pytest -q test_executor.py
+"""
+
+import asyncio
+import sys
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from executor import InferenceExecutor, InferenceTimeout, _merge_stats
+
+
+class _ManualPool:
+    """Stands in for a WorkerPool: jobs run until the test finishes them."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, method, *args, **kwargs):
+        future = Future()
+        future.set_running_or_notify_cancel()     # like WorkerPool: dispatched jobs cannot be cancelled
+        self.jobs.append(future)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class _StatsPool:
+    """Stands in for a WorkerPool whose workers have pushed their counters."""
+
+    def __init__(self, per_worker):
+        self.per_worker = per_worker
+
+    def pipeline_stats(self):
+        return self.per_worker
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def _process_executor(pool):
+    executor = InferenceExecutor(mode="thread", max_workers=1)
+    executor._pool.shutdown()
+    executor.mode = "process"
+    executor._pool = pool
+    return executor
+
+
+def test_release_waits_for_a_timed_out_job_to_finish():
+    pool = _ManualPool()
+    executor = _process_executor(pool)
+    released = threading.Event()
+
+    with pytest.raises(InferenceTimeout):
+        asyncio.run(executor.run("predict", timeout=0.05, release=released.set))
+    assert not released.is_set()         # the worker is still busy with the job
+
+    pool.jobs[0].set_result({'success': True})
+    assert released.is_set()
+    assert executor._in_flight == 0
+
+
+def test_release_runs_once_on_success():
+    pool = _ManualPool()
+    executor = _process_executor(pool)
+    calls = []
+
+    async def call():
+        task = asyncio.ensure_future(executor.run("predict", release=lambda: calls.append(1)))
+        await asyncio.sleep(0)
+        pool.jobs[0].set_result("done")
+        return await task
+
+    assert asyncio.run(call()) == "done"
+    assert calls == [1]
+
+
+def test_release_runs_when_submit_fails():
+    class _ClosedPool(_ManualPool):
+        def submit(self, method, *args, **kwargs):
+            raise RuntimeError("WorkerPool is shut down")
+
+    executor = _process_executor(_ClosedPool())
+    calls = []
+    with pytest.raises(RuntimeError):
+        asyncio.run(executor.run("predict", release=lambda: calls.append(1)))
+    assert calls == [1]
+
+
+def test_merge_sums_counters_and_keeps_agreeing_fields():
+    merged = _merge_stats([
+        {'batches': 2, 'items': 5, 'max_batch_size': 8, 'enabled': True, 'hit_rate': 0.5, 'nested': {'hits': 1}},
+        {'batches': 3, 'items': 7, 'max_batch_size': 8, 'enabled': True, 'hit_rate': 0.2, 'nested': {'hits': 4}},
+    ])
+    assert merged == {'batches': 5, 'items': 12, 'max_batch_size': 16, 'enabled': True, 'nested': {'hits': 5}}
+
+
+def test_merge_skips_workers_without_a_section():
+    assert _merge_stats([None, {'items': 1}]) == {'items': 1}
+    assert _merge_stats([None, None]) is None
+
+
+def test_process_stats_are_aggregated_across_workers():
+    executor = _process_executor(_StatsPool({
+        0: {'cache': {'hits': 1, 'misses': 2}, 'audit': None},
+        1: {'cache': {'hits': 3, 'misses': 0}, 'audit': None},
+    }))
+    stats = asyncio.run(executor.pipeline_stats())
+    assert stats['cache']['total'] == {'hits': 4, 'misses': 2}
+    assert stats['cache']['workers'] == {0: {'hits': 1, 'misses': 2}, 1: {'hits': 3, 'misses': 0}}
+    assert stats['audit']['total'] is None
+
+
+def test_process_stats_are_none_before_any_worker_reports():
+    executor = _process_executor(_StatsPool({}))
+    assert asyncio.run(executor.pipeline_stats()) is None
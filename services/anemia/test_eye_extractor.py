@@ -0,0 +1,193 @@
+"""
+Tests for the eye extractor: fused ROI analysis and extract_many (src/eye_extractor.py)
+Run: python -m pytest -q test_eye_extractor.py
+"""
+
+import gc
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mediapipe")
+sys.path.append(str(Path(__file__).parent / "src"))
+from benchmark_extraction import crescent_mask, fused_step, reference_step, synthetic_rois
+from detectors import DetectorRegistry
+from eye_extractor import EyeExtractor
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return EyeExtractor()
+
+
+def test_fused_analysis_matches_the_reference_crop(extractor):
+    rois = synthetic_rois(count=20, seed=1)
+    accepted = 0
+    for roi in rois:
+        mask = crescent_mask(roi)
+        ref, new = reference_step(extractor, roi, mask), fused_step(extractor, roi, mask)
+        assert (ref is None) == (new is None)
+        if ref is not None:
+            accepted += 1
+            np.testing.assert_array_equal(ref, new)
+    assert accepted > 0
+
+
+def test_dark_roi_is_rejected_with_a_reason(extractor):
+    roi = np.full((120, 240, 3), 5, np.uint8)
+    stats = extractor._analyze_roi(roi, crescent_mask(roi))
+    assert stats['failure']
+    assert reference_step(extractor, roi, crescent_mask(roi)) is None
+
+
+def test_crop_is_tight_around_the_tissue(extractor):
+    roi = synthetic_rois(count=1, seed=3)[0]
+    stats = extractor._analyze_roi(roi, crescent_mask(roi))
+    if stats['failure']:
+        pytest.skip(f"synthetic ROI rejected: {stats['failure']}")
+    crop = extractor._crop_tissue(roi, stats)
+    assert crop.shape[0] <= roi.shape[0] and crop.shape[1] <= roi.shape[1]
+    gray = crop.max(axis=2)
+    assert gray[0].max() > 5 and gray[-1].max() > 5
+    assert gray[:, 0].max() > 5 and gray[:, -1].max() > 5
+
+
+class SlowFirstExtraction:
+    """extract_with_report stand-in: image 0 finishes last."""
+
+    def __call__(self, image, eye='left', debug=False, session_id=None):
+        time.sleep(0.3 if image[0, 0, 0] == 0 else 0.01)
+        return None, {'method': None, 'failure_reason': 'no_valid_region', 'timings_ms': {}}
+
+
+def tagged_images(count):
+    return [np.full((8, 8, 3), i, np.uint8) for i in range(count)]
+
+
+def test_extract_many_yields_in_order_or_as_completed(extractor, monkeypatch):
+    monkeypatch.setattr(extractor, "extract_with_report", SlowFirstExtraction())
+
+    ordered = [r['index'] for r in extractor.extract_many(tagged_images(6), workers=3, max_pending=6)]
+    assert ordered == list(range(6))
+
+    completed = [r['index'] for r in extractor.extract_many(tagged_images(6), ordered=False,
+                                                            workers=3, max_pending=6)]
+    assert sorted(completed) == list(range(6))
+    assert completed[-1] == 0
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_extract_many_bounds_images_in_flight(extractor, monkeypatch, ordered):
+    monkeypatch.setattr(extractor, "extract_with_report", SlowFirstExtraction())
+    taken = 0
+
+    def images():
+        nonlocal taken
+        for image in tagged_images(20):
+            taken += 1
+            yield image
+
+    received = 0
+    for _ in extractor.extract_many(images(), ordered=ordered, workers=2, max_pending=3):
+        assert taken - received <= 3
+        received += 1
+    assert received == taken == 20
+
+
+def test_extract_many_reports_unreadable_paths(extractor, tmp_path):
+    garbage = tmp_path / "garbage.jpg"
+    garbage.write_bytes(b"not an image")
+    paths = [tmp_path / "missing.jpg", garbage]
+
+    results = list(extractor.extract_many(paths, workers=2))
+    assert [r['source'] for r in results] == [str(p) for p in paths]
+    assert all(r['failure_reason'] == 'unreadable' and r['tissue'] is None for r in results)
+
+
+def test_extract_many_reuses_its_threads_and_detectors(extractor, monkeypatch):
+    def detect(image, eye='left', debug=False, session_id=None):
+        extractor.detectors.haar_eye()
+        return None, {'method': None, 'failure_reason': 'no_valid_region', 'timings_ms': {}}
+
+    monkeypatch.setattr(extractor, "extract_with_report", detect)
+    images = tagged_images(8)
+    list(extractor.extract_many(images, workers=2))
+    loads = extractor.detectors.stats()['haar_eye']['loads']
+    for _ in range(3):
+        list(extractor.extract_many(images, workers=2))
+    assert extractor.detectors.stats()['haar_eye']['loads'] == loads
+
+
+def test_detectors_of_finished_threads_are_not_counted():
+    registry = DetectorRegistry()
+    threads = [threading.Thread(target=registry.haar_eye) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+
+    stats = registry.stats()['haar_eye']
+    assert stats['loads'] == 3
+    assert stats['instances'] == 0
+
+    registry.haar_eye()
+    assert registry.stats()['haar_eye']['instances'] == 1
+
+
+def noise(height, width, low=0, high=256, seed=0):
+    return np.random.default_rng(seed).integers(low, high, (height, width, 3), dtype=np.uint8)
+
+
+def smooth_ramp(size=512):
+    """Left-to-right gradient: plenty of contrast, no edges (linear even after downscaling)."""
+    ramp = (np.arange(size) * 256 // size).astype(np.uint8)
+    return np.ascontiguousarray(np.broadcast_to(ramp[None, :, None], (size, size, 3)))
+
+
+@pytest.mark.parametrize("image, reason", [
+    (noise(400, 400, 0, 10), 'too_dark'),
+    (noise(400, 400, 248, 256), 'overexposed'),
+    (np.full((400, 400, 3), 128, np.uint8), 'low_contrast'),
+    (smooth_ramp(), 'too_blurry'),
+    (noise(400, 30), 'too_small'),
+], ids=['dark', 'overexposed', 'flat', 'blurred', 'tiny'])
+def test_hopeless_inputs_abort_before_any_strategy(extractor, image, reason):
+    assert not extractor.is_already_cropped(image)
+    tissue, report = extractor.extract_with_report(image)
+    assert tissue is None
+    assert report['failure_reason'] == reason
+    assert report['method'] is None and report['quality'] is not None
+    assert set(report['timings_ms']) == {'analysis', 'total'}
+
+
+@pytest.fixture
+def strategies_fail(extractor, monkeypatch):
+    """Every strategy and the fallback find nothing, so each one is tried in order."""
+    for name in ('_extract_lower_with_haar', '_extract_below_iris', '_extract_lower_lid_polygon',
+                 '_extract_lower_with_edges', '_lower_center_crop_fallback'):
+        monkeypatch.setattr(extractor, name, lambda *args, **kwargs: None)
+    return extractor
+
+
+def tried(report):
+    return tuple(name for name in report['timings_ms'] if name not in ('analysis', 'center_crop', 'total'))
+
+
+def test_wide_closeup_tries_closeup_strategies_first(strategies_fail):
+    image = noise(400, 640)
+    tissue, report = strategies_fail.extract_with_report(image)
+    assert tissue is None and report['failure_reason'] == 'no_valid_region'
+    assert report['profile'] == 'closeup'
+    assert tried(report) == EyeExtractor.CLOSEUP_ORDER
+
+
+def test_face_shaped_image_tries_face_strategies_first(strategies_fail):
+    image = noise(600, 450)
+    _, report = strategies_fail.extract_with_report(image)
+    assert report['profile'] == 'face'
+    assert tried(report) == EyeExtractor.FACE_ORDER
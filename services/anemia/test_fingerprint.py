@@ -0,0 +1,67 @@
+"""
+Tests for upload fingerprints and perceptual hashes (src/fingerprint.py)
+Run: python -m pytest -q test_fingerprint.py
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from fingerprint import (
+    UploadFingerprint, fingerprint_bytes, fingerprint_file, hamming_distance, perceptual_hash
+)
+
+
+def eye_like_image(seed=0, size=(480, 640)):
+    """Smooth synthetic scene with structure at several scales."""
+    rng = np.random.default_rng(seed)
+    h, w = size
+    yy, xx = np.mgrid[0:h, 0:w]
+    image = np.zeros((h, w, 3), np.float32)
+    for _ in range(6):
+        cy, cx, r = rng.uniform(0, h), rng.uniform(0, w), rng.uniform(40, 200)
+        colour = rng.uniform(0, 255, 3)
+        weight = np.exp(-((yy - cy) ** 2 + (xx - cx) ** 2) / (2 * r ** 2))[..., None]
+        image += weight * colour
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def test_chunked_upload_hash_matches_whole_bytes_and_file(tmp_path):
+    data = cv2.imencode(".jpg", eye_like_image())[1].tobytes()
+    fp = UploadFingerprint()
+    for i in range(0, len(data), 1000):
+        fp.update(data[i:i + 1000])
+    assert fp.size == len(data)
+    assert fp.hexdigest() == fingerprint_bytes(data)
+
+    path = tmp_path / "eye.jpg"
+    path.write_bytes(data)
+    assert fingerprint_file(path, chunk_size=777) == fingerprint_bytes(data)
+
+
+def test_perceptual_hash_is_64_bits_of_hex():
+    phash = perceptual_hash(eye_like_image())
+    assert len(phash) == 16 and int(phash, 16) >= 0
+
+
+def test_reencoded_and_resized_copies_are_near_duplicates():
+    image = eye_like_image()
+    reencoded = cv2.imdecode(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 60])[1], cv2.IMREAD_COLOR)
+    resized = cv2.resize(image, (320, 240), interpolation=cv2.INTER_AREA)
+    brighter = cv2.convertScaleAbs(image, alpha=1.0, beta=10)
+    reference = perceptual_hash(image)
+    for copy in (reencoded, resized, brighter):
+        assert hamming_distance(reference, perceptual_hash(copy)) <= 6
+
+
+def test_different_images_are_far_apart():
+    a, b = perceptual_hash(eye_like_image(seed=1)), perceptual_hash(eye_like_image(seed=2))
+    assert hamming_distance(a, b) > 10
+
+
+def test_grayscale_input_is_accepted():
+    gray = cv2.cvtColor(eye_like_image(), cv2.COLOR_BGR2GRAY)
+    assert perceptual_hash(gray) == perceptual_hash(eye_like_image())
@@ -0,0 +1,121 @@
+"""
+Tests for the compiled GradCAM heatmaps and ExplanationEngine (src/gradcam.py)
+Run: python -m pytest -q test_gradcam.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+sys.path.append(str(Path(__file__).parent / "src"))
+from config import INPUT_SIZE
+from gradcam import GradCAM, ExplanationEngine, VARIANTS
+
+LAYERS = ("conv2d_1", "conv2d_2")
+
+
+@pytest.fixture(scope="module")
+def model():
+    tf.keras.utils.set_random_seed(0)
+    inputs = tf.keras.Input((INPUT_SIZE, INPUT_SIZE, 3))
+    x = tf.keras.layers.Conv2D(4, 3, activation="relu", name=LAYERS[0])(inputs)
+    x = tf.keras.layers.MaxPooling2D()(x)
+    x = tf.keras.layers.Conv2D(8, 3, activation="relu", name=LAYERS[1])(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    return tf.keras.Model(inputs, tf.keras.layers.Dense(1, activation="sigmoid")(x))
+
+
+@pytest.fixture(scope="module")
+def gradcam(model):
+    return GradCAM(model, layer_name=LAYERS[-1])
+
+
+@pytest.fixture(scope="module")
+def images():
+    rng = np.random.default_rng(0)
+    return rng.uniform(0, 1, (5, INPUT_SIZE, INPUT_SIZE, 3)).astype(np.float32)
+
+
+def assert_maps_equal(actual, expected):
+    """uint8 maps; batched kernels may round a pixel the other way."""
+    assert np.abs(actual.astype(np.int16) - expected.astype(np.int16)).max() <= 1
+
+
+def test_batched_heatmaps_are_uint8_at_input_size(gradcam, images):
+    maps = gradcam.generate_heatmaps(images)
+    assert maps.dtype == np.uint8
+    assert maps.shape == (len(images), INPUT_SIZE, INPUT_SIZE)
+    assert maps.any()
+
+
+def test_batched_heatmaps_match_per_image_heatmaps(gradcam, images):
+    maps = gradcam.generate_heatmaps(images)
+    for image, heatmap in zip(images, maps):
+        single = gradcam.generate_heatmap(image[None])
+        assert single.dtype == np.uint8 and single.shape == (INPUT_SIZE, INPUT_SIZE)
+        assert_maps_equal(heatmap, single)
+
+
+def test_per_image_class_targets_match_single_calls(gradcam, images):
+    targets = np.array([0, 1, 0, 1, 1], np.int32)
+    maps = gradcam.generate_heatmaps(images, class_idx=targets)
+    for image, target, heatmap in zip(images, targets, maps):
+        assert_maps_equal(heatmap, gradcam.generate_heatmap(image[None], class_idx=int(target)))
+
+
+def test_fused_pass_matches_inference_and_heatmap(model, images, tmp_path):
+    from backends import KerasBackend
+
+    model.save(tmp_path / "model.keras")
+    backend = KerasBackend(tmp_path / "model.keras")
+    gradcam = GradCAM(backend.model, layer_name=LAYERS[-1])
+
+    out = gradcam.infer(images)
+    np.testing.assert_allclose(out['probability'], backend.predict(images), atol=1e-5)
+    assert out['heatmaps'].dtype == np.uint8
+    for image, heatmap in zip(images, out['heatmaps']):
+        assert_maps_equal(heatmap, gradcam.generate_heatmap(image[None]))
+
+    forward_only = gradcam.infer(images, heatmap=False)
+    assert forward_only['heatmaps'] is None
+    np.testing.assert_allclose(forward_only['probability'], out['probability'], atol=1e-5)
+
+
+def test_engine_explains_every_layer_and_variant_in_one_call(model, images):
+    engine = ExplanationEngine(model, layer_names=LAYERS, variants=tuple(VARIANTS))
+    out = engine.explain(images)
+
+    assert out['probability'].shape == (len(images),)
+    assert set(out['maps']) == set(LAYERS)
+    for layer in LAYERS:
+        assert set(out['maps'][layer]) == set(VARIANTS)
+        for maps in out['maps'][layer].values():
+            assert maps.dtype == np.uint8
+            assert maps.shape == (len(images), INPUT_SIZE, INPUT_SIZE)
+    assert set(out['timings_ms']) == {'gradients', *VARIANTS}
+
+
+def test_engine_defaults_to_every_conv_layer(model, images):
+    engine = ExplanationEngine(model, layer_names=None, variants=('gradcam',))
+    assert engine.layer_names == list(LAYERS)
+    assert set(engine.explain(images[0])['maps']) == set(LAYERS)
+
+
+def test_engine_gradcam_matches_gradcam_for_the_last_layer(model, gradcam, images):
+    engine = ExplanationEngine(model, layer_names=LAYERS, variants=('gradcam', 'gradcam++'))
+    out = engine.explain(images)
+    assert_maps_equal(out['maps'][LAYERS[-1]]['gradcam'], gradcam.generate_heatmaps(images))
+
+    targets = np.array([1, 0, 1, 0, 0], np.int32)
+    out = engine.explain(images, class_idx=targets)
+    assert_maps_equal(out['maps'][LAYERS[-1]]['gradcam'], gradcam.generate_heatmaps(images, class_idx=targets))
+
+
+def test_engine_rejects_unknown_layers_and_variants(model):
+    with pytest.raises(ValueError, match="Unknown layers"):
+        ExplanationEngine(model, layer_names=("conv2d_1", "no_such_layer"))
+    with pytest.raises(ValueError, match="Unknown explanation variants"):
+        ExplanationEngine(model, layer_names=LAYERS, variants=('gradcam', 'scorecam'))
@@ -0,0 +1,98 @@
+"""
+Tests for NetraAIPipeline.predict failure handling (src/pipeline.py)
+Run: python -m pytest -q test_pipeline.py
+"""
+
+import csv
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+pytest.importorskip("mediapipe")
+import audit_logger
+from audit_logger import AuditWriter
+from pipeline import NetraAIPipeline
+
+
+class FailingBackend:
+    name = "failing"
+
+    def predict(self, batch):
+        raise RuntimeError("backend exploded")
+
+
+class StaticBackend:
+    name = "static"
+
+    def __init__(self, prob):
+        self.prob = prob
+
+    def predict(self, batch):
+        return np.full(len(batch), self.prob, np.float32)
+
+
+class TissueExtractor:
+    """Skips detection: every image is already a 64x64 crop of tissue."""
+
+    def extract_with_report(self, image_bgr, eye='left', debug=False, session_id=None):
+        return image_bgr, {'method': "pre-cropped", 'failure_reason': None, 'timings_ms': {}}
+
+
+def make_pipeline(backend):
+    pipeline = NetraAIPipeline.__new__(NetraAIPipeline)
+    pipeline.backend = backend
+    pipeline.model = None
+    pipeline.extractor = TissueExtractor()
+    pipeline.enhancer = None
+    pipeline.batcher = None
+    pipeline.heatmap_batcher = None
+    pipeline.cache = None
+    return pipeline
+
+
+@pytest.fixture
+def audit_path(tmp_path, monkeypatch):
+    path = tmp_path / "audit.csv"
+    writer = AuditWriter(path=path, flush_interval=0.05, fsync_interval=0, key="test-key")
+    monkeypatch.setattr(audit_logger, "_writer", writer)
+    yield path
+    writer.close()
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def predict(pipeline):
+    image = np.full((64, 64, 3), 128, np.uint8)
+    return pipeline.predict(image, save_heatmap=False, save_original=False, save_cropped=False)
+
+
+def test_backend_error_returns_a_failure_and_is_audited(audit_path):
+    result = predict(make_pipeline(FailingBackend()))
+
+    assert result['success'] is False
+    assert "backend exploded" in result['error']
+    assert result['diagnosis'] == "INCONCLUSIVE"
+
+    assert audit_logger.flush(timeout=5)
+    rows = read_rows(audit_path)
+    assert len(rows) == 1
+    assert float(rows[0]['probability']) == 0.0
+    assert rows[0]['classification'] == "INCONCLUSIVE"
+
+
+def test_successful_prediction_audits_its_probability(audit_path):
+    result = predict(make_pipeline(StaticBackend(0.95)))
+
+    assert result['success'] is True
+    assert result['diagnosis'] == "ANEMIC"
+
+    assert audit_logger.flush(timeout=5)
+    rows = read_rows(audit_path)
+    assert len(rows) == 1
+    assert float(rows[0]['probability']) == pytest.approx(0.95, abs=1e-4)
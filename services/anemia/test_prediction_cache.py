@@ -0,0 +1,60 @@
+"""
+Tests for the prediction result cache (src/prediction_cache.py)
+Run: python -m pytest -q test_prediction_cache.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+from prediction_cache import PredictionCache
+
+
+def _result(prediction_id="p1", probability=0.9):
+    return {'prediction_id': prediction_id, 'probability': probability, 'diagnosis': "ANEMIC"}
+
+
+def test_hit_returns_a_copy_and_counts():
+    cache = PredictionCache(disk_dir=None)
+    key = PredictionCache.make_key("abc", "left", "v1")
+    assert cache.get(key) is None
+    cache.put(key, _result())
+
+    hit = cache.get(key)
+    hit['prediction_id'] = "changed"
+    assert cache.get(key)['prediction_id'] == "p1"
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1
+
+
+def test_key_separates_eye_and_model_version():
+    keys = {PredictionCache.make_key("abc", eye, version)
+            for eye in ("left", "right") for version in ("v1", "v2")}
+    assert len(keys) == 4
+
+
+def test_entries_expire_after_ttl():
+    cache = PredictionCache(ttl_seconds=0.05, disk_dir=None)
+    cache.put("k", _result())
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2, disk_dir=None)
+    cache.put("a", _result("a"))
+    cache.put("b", _result("b"))
+    cache.get("a")
+    cache.put("c", _result("c"))
+    assert cache.get("b") is None
+    assert cache.get("a")['prediction_id'] == "a"
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    PredictionCache(disk_dir=tmp_path).put("k", _result())
+    fresh = PredictionCache(disk_dir=tmp_path)
+    assert fresh.get("k")['prediction_id'] == "p1"
+    assert fresh.stats()['disk_hits'] == 1
@@ -0,0 +1,57 @@
+"""
+Tests for the supervised worker pool (src/worker_pool.py)
+Run: python -m pytest -q test_worker_pool.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "src"))
+import worker_pool
+from worker_pool import WorkerPool, WorkerCrashed
+
+
+def _crashing_worker(worker_id, generation, request_q, result_q, stats_interval):
+    """Worker that dies before loading its pipeline, every time."""
+    raise SystemExit(3)
+
+
+def _wait_for(condition, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def crashing_pool(monkeypatch):
+    monkeypatch.setattr(worker_pool, "_worker_main", _crashing_worker)
+    pool = WorkerPool(num_workers=1, health_interval=0.05, restart_backoff=0.2,
+                      restart_backoff_max=0.4, max_restarts=2)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def test_crash_loop_backs_off_then_gives_up(crashing_pool):
+    worker = lambda: crashing_pool.stats()['workers'][0]
+
+    assert _wait_for(lambda: worker()['failures'] == 1)
+    assert worker()['restarting_in'] is not None      # waiting out the backoff, not respawned yet
+    assert worker()['restarts'] == 0
+
+    assert _wait_for(lambda: worker()['given_up'])
+    assert worker()['restarts'] == 2
+    assert worker()['failures'] == 3
+    assert not crashing_pool.ready()
+
+
+def test_submit_fails_fast_when_every_worker_is_down(crashing_pool):
+    assert _wait_for(lambda: crashing_pool.stats()['workers'][0]['given_up'])
+    future = crashing_pool.submit("predict")
+    with pytest.raises(WorkerCrashed):
+        future.result(timeout=1)